@@ -0,0 +1,164 @@
+"""
+Versões assíncronas dos relatórios, para rodar sob ASGI (ver README).
+
+As views fazem as mesmas consultas das views síncronas (uma por relatório) com
+o ORM assíncrono do Django (aaggregate e `async for`). O ORM assíncrono ainda
+roda cada consulta em uma thread do sync_to_async, então não há paralelismo
+entre consultas: o ganho é o worker seguir atendendo outras requisições
+enquanto o banco responde. O cache de relatórios e o ETag/Last-Modified
+(core/watermarks.py) são os mesmos das views síncronas.
+"""
+import functools
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Sum, DecimalField
+from django.db.models.functions import Coalesce
+from django.http import HttpResponse
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.settings import api_settings
+
+from .cache import get_cached_report, report_cache_key
+from .models import ChangeWatermark, DailyRollup
+from . import snapshots
+from .renderers import dumps
+from .views import month_range, parse_date_range, DashboardView, TrendView
+from .watermarks import conditional_validators, is_not_modified, set_validators
+
+
+JSON_CONTENT_TYPE = 'application/json'
+
+
+def render(data, status=200):
+    # Mesmo JSON das views síncronas (Decimal vira número)
+    return HttpResponse(dumps(data), status=status, content_type=JSON_CONTENT_TYPE)
+
+
+def authenticate(request):
+    """Roda as autenticações configuradas no DRF sobre o HttpRequest do Django."""
+    for authentication_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        result = authentication_class().authenticate(request)
+        if result is not None:
+            return result[0]
+    return None
+
+
+def async_report(view):
+    """
+    Decorator das views assíncronas: aceita só GET, autentica com as classes
+    do DRF, responde 304 como o ConditionalGetMixin e guarda no cache de
+    relatórios as respostas 200.
+    """
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != 'GET':
+            return render({'detail': f'Método "{request.method}" não permitido.'}, status=405)
+        try:
+            user = await sync_to_async(authenticate)(request)
+        except AuthenticationFailed as exc:
+            return render({'detail': exc.detail}, status=401)
+        if user is None or not user.is_active:
+            return render({'detail': 'As credenciais de autenticação não foram fornecidas.'}, status=401)
+        request.user = user
+
+        watermark = await ChangeWatermark.objects.filter(user_id=user.pk).values_list('version', 'updated_at').afirst()
+        validators = conditional_validators(request, user.pk, watermark)
+        if is_not_modified(request, validators):
+            response = HttpResponse(status=304)
+            set_validators(response, validators)
+            return response
+
+        endpoint = getattr(request.resolver_match, 'url_name', None) or view.__name__
+        key = report_cache_key(user.pk, endpoint, request.GET, watermark)
+        content = await sync_to_async(get_cached_report)(key)
+        if content is not None:
+            response = HttpResponse(content, content_type=JSON_CONTENT_TYPE)
+        else:
+            response = await view(request, *args, **kwargs)
+            if response.status_code == 200:
+                await cache.aset(key, response.content, settings.REPORT_CACHE_TIMEOUT)
+        if response.status_code == 200:
+            set_validators(response, validators)
+        return response
+    return wrapper
+
+
+def requested_month(request):
+    now = timezone.now()
+    return month_range(
+        int(request.GET.get('year', now.year)),
+        int(request.GET.get('month', now.month)),
+    )
+
+
+@async_report
+async def monthly_summary(request):
+    """Versão assíncrona de MonthlySummaryView (mesmos parâmetros e formato)."""
+    try:
+        month_start, month_end = requested_month(request)
+    except (ValueError, TypeError):
+        return render({"error": "Parâmetros de ano e mês inválidos."}, status=400)
+
+    if month_start < snapshots.current_month():
+        snapshot, = await sync_to_async(snapshots.history)(request.user.pk, month_start, month_end)
+        return render(snapshots.summary(snapshot))
+
+    totals = await DailyRollup.objects.filter(
+        user=request.user,
+        day__gte=month_start,
+        day__lt=month_end
+    ).aaggregate(
+        receitas=Coalesce(Sum('income'), 0, output_field=DecimalField()),
+        despesas=Coalesce(Sum('expense'), 0, output_field=DecimalField()),
+    )
+    return render({
+        'receitas': totals['receitas'],
+        'despesas': abs(totals['despesas']),
+        'saldo': totals['receitas'] + totals['despesas'],
+    })
+
+
+@async_report
+async def dashboard(request):
+    """
+    Versão assíncrona de DashboardView: a mesma consulta agrupada e o mesmo
+    formato de resposta.
+    """
+    try:
+        month_start, month_end = requested_month(request)
+    except (ValueError, TypeError):
+        return render({"error": "Parâmetros de ano e mês inválidos."}, status=400)
+
+    buckets = DashboardView.buckets(request.user, month_start, month_end)
+    return render(DashboardView.summarize([item async for item in buckets]))
+
+
+@async_report
+async def trend(request):
+    """Versão assíncrona de TrendView (mesmos parâmetros e formato)."""
+    trunc = TrendView.truncs.get(request.GET.get('granularity', 'month'))
+    if trunc is None:
+        return render({"error": "Granularidade inválida. Use day, week ou month."}, status=400)
+    try:
+        start, end = parse_date_range(request.GET.get('start', ''), request.GET.get('end', ''))
+    except ValueError:
+        return render({"error": "Parâmetros de data inválidos."}, status=400)
+
+    data = (
+        DailyRollup.objects.filter(user=request.user, day__gte=start, day__lt=end)
+        .annotate(period=trunc('day'))
+        .values('period')
+        .annotate(receita=Sum('income'), despesa=Sum('expense'))
+        .order_by('period')
+    )
+    return render([
+        {
+            'period': item['period'],
+            'receita': item['receita'],
+            'despesa': abs(item['despesa']),
+            'saldo': item['receita'] + item['despesa'],
+        }
+        async for item in data
+    ])
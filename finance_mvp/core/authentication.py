@@ -0,0 +1,171 @@
+"""
+Autenticação JWT sem consulta ao banco por requisição.
+
+O JWTAuthentication do simplejwt busca a linha do usuário em toda requisição.
+`StatelessJWTAuthentication` monta um StatelessUser a partir do id da claim do
+token já verificado e de um status (username, is_active, is_staff,
+is_superuser) guardado no cache do Django por AUTH_CACHE_TTL segundos. No
+caminho comum a autenticação não faz nenhuma consulta ao banco. Os signals de
+User apagam o status a cada alteração, então com um cache compartilhado
+(REDIS_URL) uma desativação ou mudança de permissão vale na hora em todos os
+workers; com o cache em memória de cada processo, só no próprio processo, e
+nos demais em até AUTH_CACHE_TTL segundos.
+
+Os serializers de refresh e de blacklist usam o mesmo cache para o status do
+usuário e guardam o resultado da consulta à blacklist: tokens na blacklist
+ficam em cache até expirar, os demais por AUTH_CACHE_TTL segundos. O
+blacklist de um token grava o resultado no cache na hora.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction as db_transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt import serializers as jwt_serializers
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from .models import StatelessUser
+
+
+MISSING = object()
+
+STATUS_KEY = 'auth-status:{user_id}'
+BLACKLIST_KEY = 'auth-blacklist:{jti}'
+
+
+def _cache_set(key, value, ttl):
+    if ttl > 0:
+        cache.set(key, value, ttl)
+
+
+def get_user_status(user_id):
+    """(username, is_active, is_staff, is_superuser) do usuário, ou None se ele não existir."""
+    key = STATUS_KEY.format(user_id=user_id)
+    status = cache.get(key, MISSING)
+    if status is MISSING:
+        status = (
+            User.objects.filter(**{api_settings.USER_ID_FIELD: user_id})
+            .values_list('username', 'is_active', 'is_staff', 'is_superuser')
+            .first()
+        )
+        _cache_set(key, status, settings.AUTH_CACHE_TTL)
+    return status
+
+
+def forget_user(user_id):
+    """
+    Apaga o status em cache do usuário. Repetido após o commit, para descartar
+    o status lido por requisições concorrentes antes de a alteração ficar visível.
+    """
+    key = STATUS_KEY.format(user_id=user_id)
+    cache.delete(key)
+    db_transaction.on_commit(lambda: cache.delete(key))
+
+
+def stateless_user(user_id, status):
+    username, is_active, is_staff, is_superuser = status
+    user = StatelessUser(
+        id=user_id,
+        username=username,
+        is_active=is_active,
+        is_staff=is_staff,
+        is_superuser=is_superuser,
+    )
+    # Instância "vinda do banco", para ser usada em filtros e chaves estrangeiras
+    user._state.adding = False
+    user._state.db = DEFAULT_DB_ALIAS
+    return user
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication que não lê o usuário do banco (ver docstring do módulo)."""
+
+    def get_user(self, validated_token):
+        if api_settings.CHECK_REVOKE_TOKEN:
+            # A verificação compara o hash da senha, que não fica em cache
+            return super().get_user(validated_token)
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        status = get_user_status(user_id)
+        if status is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if api_settings.CHECK_USER_IS_ACTIVE and not status[1]:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return stateless_user(user_id, status)
+
+
+class CachedRefreshToken(RefreshToken):
+    """RefreshToken com a consulta à blacklist em cache."""
+
+    def remaining_lifetime(self):
+        return self.payload['exp'] - time.time()
+
+    def check_blacklist(self):
+        jti = self.payload[api_settings.JTI_CLAIM]
+        key = BLACKLIST_KEY.format(jti=jti)
+        blacklisted = cache.get(key, MISSING)
+        if blacklisted is MISSING:
+            blacklisted = BlacklistedToken.objects.filter(token__jti=jti).exists()
+            ttl = self.remaining_lifetime() if blacklisted else settings.AUTH_CACHE_TTL
+            _cache_set(key, blacklisted, ttl)
+        if blacklisted:
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self):
+        # Igual ao do simplejwt, mas o dono do token vem do cache de status
+        jti = self.payload[api_settings.JTI_CLAIM]
+        user_id = self.payload.get(api_settings.USER_ID_CLAIM)
+        exists = user_id is not None and get_user_status(user_id) is not None
+        token, _created = OutstandingToken.objects.get_or_create(
+            jti=jti,
+            defaults={
+                "user_id": user_id if exists else None,
+                "created_at": self.current_time,
+                "token": str(self),
+                "expires_at": datetime_from_epoch(self.payload["exp"]),
+            },
+        )
+        result = BlacklistedToken.objects.get_or_create(token=token)
+        _cache_set(BLACKLIST_KEY.format(jti=jti), True, self.remaining_lifetime())
+        return result
+
+
+class TokenRefreshSerializer(jwt_serializers.TokenRefreshSerializer):
+    token_class = CachedRefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+
+        user_id = refresh.payload.get(api_settings.USER_ID_CLAIM)
+        if user_id:
+            status = get_user_status(user_id)
+            if status is None or (api_settings.CHECK_USER_IS_ACTIVE and not status[1]):
+                raise AuthenticationFailed(self.error_messages["no_active_account"], "no_active_account")
+
+        data = {"access": str(refresh.access_token)}
+
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                refresh.blacklist()
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            refresh.outstand()
+            data["refresh"] = str(refresh)
+
+        return data
+
+
+class TokenBlacklistSerializer(jwt_serializers.TokenBlacklistSerializer):
+    token_class = CachedRefreshToken
@@ -0,0 +1,180 @@
+"""
+Saldo acumulado (reports/balance/).
+
+O saldo de um dia é o saldo de abertura do período mais a soma acumulada das
+movimentações do período, calculada no banco com uma função de janela sobre os
+agregados diários. O saldo de abertura vem do BalanceCheckpoint do mês (soma
+de todo o histórico anterior), então o custo depende do número de dias
+exibidos e não do tamanho do histórico.
+
+Os checkpoints são criados na primeira leitura e apagados a cada escrita que
+altera um dia anterior a eles (`invalidate`); a leitura seguinte recalcula só
+os meses que faltam a partir do checkpoint válido mais recente. Como em
+core/snapshots.py, a leitura que grava checkpoints compara a marca d'água do
+usuário antes e depois e desfaz os seus se houve uma escrita no meio.
+
+Só são gravados checkpoints até o último mês com movimentação e nunca depois
+do mês corrente: a partir daí o saldo de abertura não muda e é devolvido sem
+ser gravado, então uma leitura de um período distante no futuro não cria uma
+linha por mês.
+"""
+import datetime
+from decimal import Decimal
+
+from django.db import transaction as db_transaction
+from django.db.models import F, Max, Sum, Window
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import BalanceCheckpoint, ChangeWatermark, DailyRollup
+
+
+ZERO = Decimal('0.00')
+
+
+def first_of_month(day):
+    return day.replace(day=1)
+
+
+def next_month(month):
+    return datetime.date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def _delete_after(user_id, day):
+    BalanceCheckpoint.objects.filter(user_id=user_id, month__gt=day).delete()
+
+
+def invalidate(user_id, day):
+    """
+    Descarta os saldos de abertura que dependem de `day`. Repetido após o
+    commit, para descartar checkpoints gravados por leituras concorrentes que
+    ainda não viam a escrita.
+    """
+    _delete_after(user_id, day)
+    db_transaction.on_commit(lambda: _delete_after(user_id, day))
+
+
+def clear(user_id):
+    BalanceCheckpoint.objects.filter(user_id=user_id).delete()
+
+
+def month_opening_balance(user_id, month):
+    """Saldo antes do dia 1 de `month`, criando os checkpoints que faltarem."""
+    checkpoint = (
+        BalanceCheckpoint.objects
+        .filter(user_id=user_id, month__lte=month)
+        .order_by('-month')
+        .values_list('month', 'balance')
+        .first()
+    )
+    if checkpoint is not None and checkpoint[0] == month:
+        return checkpoint[1]
+
+    watermark = ChangeWatermark.objects.filter(user_id=user_id).values_list('version', flat=True)
+    before = watermark.first()
+
+    # Movimentação de cada mês entre o último checkpoint e `month`
+    rollups = DailyRollup.objects.filter(user_id=user_id, day__lt=month)
+    if checkpoint is not None:
+        rollups = rollups.filter(day__gte=checkpoint[0])
+    nets = {
+        item['period']: item['income_total'] + item['expense_total']
+        for item in (
+            rollups.annotate(period=TruncMonth('day'))
+            .values('period')
+            .annotate(income_total=Sum('income'), expense_total=Sum('expense'))
+            .order_by()
+        )
+    }
+
+    if checkpoint is not None:
+        current, balance = checkpoint
+    elif nets:
+        current, balance = min(nets), ZERO
+    else:
+        current, balance = month, ZERO
+
+    # Último mês que vale a pena gravar: depois dele o saldo só se repete
+    last_day = DailyRollup.objects.filter(user_id=user_id).aggregate(last=Max('day'))['last']
+    store_until = min(first_of_month(last_day), first_of_month(timezone.localdate())) if last_day else None
+    last_net = max(nets, default=None)
+
+    created = []
+    while True:
+        if (
+            store_until is not None and current <= store_until
+            and (checkpoint is None or current != checkpoint[0])
+        ):
+            created.append(BalanceCheckpoint(user_id=user_id, month=current, balance=balance))
+        if current == month:
+            break
+        if (last_net is None or current > last_net) and (store_until is None or current >= store_until):
+            # Sem movimentação até `month` nem checkpoint a gravar: o saldo é o mesmo
+            break
+        balance += nets.get(current, ZERO)
+        current = next_month(current)
+
+    if not created:
+        return balance
+    BalanceCheckpoint.objects.bulk_create(created, batch_size=1000, ignore_conflicts=True)
+    if watermark.first() != before:
+        # Calculados antes de uma escrita concorrente: podem estar defasados
+        BalanceCheckpoint.objects.filter(user_id=user_id, month__in=[item.month for item in created]).delete()
+    return balance
+
+
+def opening_balance(user_id, day):
+    """Saldo acumulado de todas as transações anteriores a `day`."""
+    month = first_of_month(day)
+    balance = month_opening_balance(user_id, month)
+    if day > month:
+        partial = DailyRollup.objects.filter(user_id=user_id, day__gte=month, day__lt=day).aggregate(
+            income_total=Sum('income'), expense_total=Sum('expense')
+        )
+        balance += (partial['income_total'] or ZERO) + (partial['expense_total'] or ZERO)
+    return balance
+
+
+def daily_balance(user_id, start, end):
+    """
+    Série diária de [start, end): receitas, despesas e saldo ao final de cada
+    dia. Dias sem movimentação repetem o saldo do dia anterior.
+    """
+    opening = opening_balance(user_id, start)
+
+    # Uma linha por balde com os totais do dia e o acumulado até o fim do dia
+    # (o frame padrão da janela inclui os outros baldes do mesmo dia)
+    rows = (
+        DailyRollup.objects.filter(user_id=user_id, day__gte=start, day__lt=end)
+        .annotate(
+            day_income=Window(Sum('income'), partition_by=[F('day')]),
+            day_expense=Window(Sum('expense'), partition_by=[F('day')]),
+            running=Window(Sum(F('income') + F('expense')), order_by=F('day').asc()),
+        )
+        .values_list('day', 'day_income', 'day_expense', 'running')
+        .order_by('day')
+    )
+    days = {day: (income, expense, running) for day, income, expense, running in rows}
+
+    series = []
+    balance = opening
+    day = start
+    while day < end:
+        income, expense, running = days.get(day, (ZERO, ZERO, None))
+        if running is not None:
+            balance = opening + running
+        series.append({
+            'date': day,
+            'receita': income,
+            'despesa': abs(expense),
+            'saldo': balance,
+        })
+        day += datetime.timedelta(days=1)
+
+    return {
+        'start': start,
+        'end': end,
+        'opening_balance': opening,
+        'closing_balance': balance,
+        'series': series,
+    }
@@ -0,0 +1,281 @@
+"""
+Benchmark das rotas da API (core/urls.py).
+
+Cada rota nomeada tem um cenário em SCENARIOS que monta a requisição a partir
+dos dados de um usuário (veja o comando seed_synthetic). As requisições passam
+pelo stack completo (middlewares, autenticação JWT, views) com o cliente de
+testes do Django, dentro de uma transação desfeita ao final: rotas de escrita
+também são medidas sem alterar o banco.
+
+`run_suite` mede latência (p50/p95/p99) e número de consultas SQL por rota e
+`check_budgets` compara o resultado com os limites de core/benchmark_budgets.json.
+"""
+import json
+import os
+import statistics
+import time
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction as db_transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, get_resolver, reverse
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import authentication, sync, watermarks
+from .models import Budget, Category, Job, Transaction
+
+
+BUDGETS_PATH = os.path.join(os.path.dirname(__file__), 'benchmark_budgets.json')
+
+BENCHMARK_PASSWORD = 'benchmark-pass'
+
+# Rotas que não podem ser medidas, com o motivo
+SKIPPED = {
+    'needs-vs-wants': 'a view usa campos que não existem em Transaction (type, purchase_type, amount)',
+}
+
+REPORT_MONTH = {'year': 2025, 'month': 3}
+
+
+class BenchmarkContext:
+    """Dados do usuário usados pelos cenários."""
+
+    def __init__(self, user):
+        self.user = user
+        self.category_id = Category.objects.filter(user=user).values_list('pk', flat=True).first()
+        self.transaction_id = Transaction.objects.filter(user=user).values_list('pk', flat=True).first()
+        latest = Transaction.objects.filter(user=user).order_by('-date').values_list('date', flat=True).first()
+        if latest is not None:
+            self.month = {'year': latest.year, 'month': latest.month}
+        else:
+            self.month = REPORT_MONTH
+
+
+def get(params=None, **extra):
+    return dict(method='get', params=params or {}, **extra)
+
+
+def post(data, **extra):
+    return dict(method='post', data=data, **extra)
+
+
+def refresh_token(ctx):
+    return str(RefreshToken.for_user(ctx.user))
+
+
+def import_file(ctx):
+    content = 'data;valor;descricao\n' + ''.join(
+        f'2025-03-{day:02d};-{day}0,00;Benchmark {day}\n' for day in range(1, 29)
+    )
+    return SimpleUploadedFile('extrato.csv', content.encode(), content_type='text/csv')
+
+
+def budget_detail(ctx):
+    # Criado dentro da transação da medição, que é desfeita em seguida
+    budget, _ = Budget.objects.get_or_create(
+        user=ctx.user, category=None, year=ctx.month['year'], month=ctx.month['month'],
+        defaults={'amount_limit': 1000},
+    )
+    return get(kwargs={'pk': budget.pk})
+
+
+def job_detail(ctx):
+    # Também desfeito junto com a transação da medição
+    job = Job.objects.create(user=ctx.user, task='rebuild_rollups', run_at=timezone.now())
+    return get(kwargs={'pk': job.pk})
+
+
+def sync_since(ctx):
+    # Sync de um cliente em dia: 20 transações alteradas desde o último cursor
+    since = timezone.now()
+    recent = list(Transaction.objects.filter(user=ctx.user).order_by('-date', '-id').values_list('pk', flat=True)[:20])
+    Transaction.objects.filter(pk__in=recent).update(updated_at=timezone.now())
+    return get({'since': sync.encode_cursor(sync.Cursor(since, 0, None))})
+
+
+# nome da rota -> função(ctx) que descreve a requisição
+SCENARIOS = {
+    'api-root': lambda ctx: get(),
+    'category-list': lambda ctx: get(),
+    'category-detail': lambda ctx: get(kwargs={'pk': ctx.category_id}),
+    'transaction-list': lambda ctx: get(),
+    'transaction-detail': lambda ctx: get(kwargs={'pk': ctx.transaction_id}),
+    'transaction-bulk': lambda ctx: post([
+        {'value': '-10.00', 'date': f"{ctx.month['year']}-{ctx.month['month']:02d}-{day:02d}",
+         'category': ctx.category_id}
+        for day in range(1, 29)
+    ], format='json'),
+    'transaction-import-file': lambda ctx: post({'file': import_file(ctx)}, format='multipart'),
+    'transaction-search': lambda ctx: get({'q': 'uber'}),
+    'transaction-export': lambda ctx: get({'format': 'csv', 'start': f"{ctx.month['year']}-{ctx.month['month']:02d}-01"}),
+    'budget-list': lambda ctx: get(),
+    'budget-detail': budget_detail,
+    'job-list': lambda ctx: get(),
+    'job-detail': job_detail,
+    'user-list': lambda ctx: get(),
+    'user-detail': lambda ctx: get(kwargs={'pk': ctx.user.pk}),
+    'token_obtain_pair': lambda ctx: post(
+        {'username': ctx.user.username, 'password': BENCHMARK_PASSWORD},
+        format='json', anonymous=True, credentials=True
+    ),
+    'token_refresh': lambda ctx: post({'refresh': refresh_token(ctx)}, format='json', anonymous=True),
+    'token_blacklist': lambda ctx: post({'refresh': refresh_token(ctx)}, format='json', anonymous=True),
+    'sync': sync_since,
+    'monthly-summary': lambda ctx: get(),
+    'monthly-history': lambda ctx: get(),
+    'expenses-by-category': lambda ctx: get(),
+    'incomes-by-category': lambda ctx: get(),
+    'emotional-spending': lambda ctx: get(),
+    'monthly-flow': lambda ctx: get(ctx.month),
+    'category-expenses': lambda ctx: get(ctx.month),
+    'emotional-expenses': lambda ctx: get(ctx.month),
+    'dashboard': lambda ctx: get(ctx.month),
+    'trend': lambda ctx: get({'start': f"{ctx.month['year'] - 1}-01-01", 'end': f"{ctx.month['year'] + 1}-01-01"}),
+    'pivot': lambda ctx: get({'dimensions': 'category,sign,month', 'measures': 'sum,count,avg'}),
+    'balance': lambda ctx: get({'start': f"{ctx.month['year'] - 1}-01-01", 'end': f"{ctx.month['year']}-01-01"}),
+    'report-cache-stats': lambda ctx: get(staff=True),
+    'async-monthly-summary': lambda ctx: get(),
+    'async-dashboard': lambda ctx: get(ctx.month),
+    'async-trend': lambda ctx: get({'start': f"{ctx.month['year'] - 1}-01-01", 'end': f"{ctx.month['year'] + 1}-01-01"}),
+}
+
+
+def route_names(urlconf='core.urls'):
+    """Nomes de todas as rotas de `urlconf`, na ordem em que aparecem."""
+    names = []
+
+    def collect(patterns):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                collect(pattern.url_patterns)
+            elif pattern.name and pattern.name not in names:
+                names.append(pattern.name)
+
+    collect(get_resolver(urlconf).url_patterns)
+    return names
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def _host():
+    # O cliente de testes precisa de um Host aceito por ALLOWED_HOSTS
+    for host in settings.ALLOWED_HOSTS:
+        host = host.strip()
+        if host and host != '*' and not host.startswith('.'):
+            return host
+    return 'localhost'
+
+
+def run_suite(user, iterations=20, names=None, warm=False, urlconf='core.urls'):
+    """
+    Mede as rotas informadas (padrão: todas) para o usuário. Com warm=False o
+    cache de relatórios do usuário é invalidado antes de cada requisição.
+    Retorna {rota: {'status', 'queries', 'p50', 'p95', 'p99'}} (latências em ms).
+    """
+    all_names = route_names(urlconf)
+    names = [name for name in (names or all_names) if name not in SKIPPED]
+    missing = [name for name in names if name not in SCENARIOS]
+    if missing:
+        raise ValueError(f"Rotas sem cenário de benchmark: {', '.join(missing)}")
+
+    ctx = BenchmarkContext(user)
+    # Mede o caminho comum, com o status do usuário já no cache da autenticação
+    authentication.get_user_status(user.pk)
+    client = Client(HTTP_HOST=_host())
+    results = {}
+    for name in names:
+        latencies = []
+        queries = 0
+        status_code = None
+        for _ in range(iterations):
+            with db_transaction.atomic():
+                spec = SCENARIOS[name](ctx)
+                headers = {}
+                promoted = spec.get('staff') and not user.is_staff
+                if promoted:
+                    # Desfeito junto com a transação
+                    type(user).objects.filter(pk=user.pk).update(is_staff=True)
+                    authentication.forget_user(user.pk)
+                if spec.get('credentials'):
+                    account = type(user).objects.get(pk=user.pk)
+                    account.set_password(BENCHMARK_PASSWORD)
+                    account.save(update_fields=['password'])
+                if not spec.get('anonymous'):
+                    headers['HTTP_AUTHORIZATION'] = f'Bearer {RefreshToken.for_user(user).access_token}'
+                if not warm:
+                    # Nova marca d'água (desfeita junto com a transação): cache de relatórios frio
+                    watermarks.touch(user.pk)
+
+                url = reverse(name, kwargs=spec.get('kwargs'))
+                if spec['method'] == 'get':
+                    args = (url, spec['params'])
+                else:
+                    args = (url, spec['data'])
+                    if spec.get('format') == 'json':
+                        headers['content_type'] = 'application/json'
+
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    response = getattr(client, spec['method'])(*args, **headers)
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+                    latencies.append((time.perf_counter() - started) * 1000)
+                queries = max(queries, len(captured))
+                status_code = response.status_code
+                db_transaction.set_rollback(True)
+            if promoted:
+                # O status em cache ainda diz staff
+                authentication.forget_user(user.pk)
+
+        results[name] = {
+            'status': status_code,
+            'queries': queries,
+            'p50': statistics.median(latencies),
+            'p95': percentile(latencies, 0.95),
+            'p99': percentile(latencies, 0.99),
+        }
+    return results
+
+
+def load_budgets(path=BUDGETS_PATH):
+    with open(path, encoding='utf-8') as budget_file:
+        return json.load(budget_file)
+
+
+def save_budgets(results, path=BUDGETS_PATH):
+    budgets = {
+        name: {'queries': result['queries'], 'p95_ms': round(result['p95'], 1)}
+        for name, result in results.items()
+    }
+    with open(path, 'w', encoding='utf-8') as budget_file:
+        json.dump(budgets, budget_file, indent=2, ensure_ascii=False)
+        budget_file.write('\n')
+
+
+def check_budgets(results, budgets, latency_tolerance=None):
+    """
+    Lista as regressões: status de erro, rota sem orçamento, mais consultas que
+    o orçamento e (se latency_tolerance for informado) p95 acima de
+    p95_ms * latency_tolerance.
+    """
+    problems = []
+    for name, result in results.items():
+        if result['status'] >= 400:
+            problems.append(f"{name}: status {result['status']}")
+        budget = budgets.get(name)
+        if budget is None:
+            problems.append(f'{name}: sem orçamento em {os.path.basename(BUDGETS_PATH)}')
+            continue
+        if result['queries'] > budget['queries']:
+            problems.append(f"{name}: {result['queries']} consultas (orçamento: {budget['queries']})")
+        if latency_tolerance and result['p95'] > budget['p95_ms'] * latency_tolerance:
+            problems.append(
+                f"{name}: p95 de {result['p95']:.1f}ms (referência: {budget['p95_ms']}ms x {latency_tolerance})"
+            )
+    return problems
@@ -0,0 +1,125 @@
+"""
+Total gasto por orçamento (Budget.spent).
+
+Cada despesa gravada em Transaction soma (ou subtrai) o valor nos orçamentos
+do mês que ela afeta: o da categoria e o geral (`category` nulo), com um único
+UPDATE. Os caminhos que recalculam o DailyRollup (bulk, imports, rebuild)
+recalculam também os orçamentos a partir dele. Assim `check_limit` lê apenas
+as linhas de orçamento do mês, sem somar transações.
+"""
+import datetime
+from decimal import Decimal
+
+from django.db import transaction as db_transaction
+from django.db.models import F, Q, Sum
+from rest_framework import serializers
+
+from .models import Budget, DailyRollup
+
+
+ZERO = Decimal('0.00')
+
+LIMIT_EXCEEDED = 'Limite do orçamento excedido'
+
+
+def month_days(year, month):
+    # Intervalo [dia 1, dia 1 do mês seguinte) para usar o índice de `day`
+    start = datetime.date(year, month, 1)
+    return Q(day__gte=start, day__lt=datetime.date(year + month // 12, month % 12 + 1, 1))
+
+
+def affected(user_id, day, category_id):
+    """Orçamentos do mês de `day` que contam uma despesa da categoria."""
+    return Budget.objects.filter(user_id=user_id, year=day.year, month=day.month).filter(
+        Q(category__isnull=True) | Q(category_id=category_id)
+    )
+
+
+def apply_expense(user_id, day, category_id, amount):
+    """Soma `amount` (positivo = gasto) aos orçamentos afetados."""
+    affected(user_id, day, category_id).update(spent=F('spent') + amount)
+
+
+def spent_by_month(user_id, months):
+    """
+    Gasto por (ano, mês, categoria) a partir do DailyRollup; a chave com
+    categoria None traz o total do mês (inclusive as despesas sem categoria).
+    """
+    condition = Q()
+    for year, month in months:
+        condition |= month_days(year, month)
+    rows = (
+        DailyRollup.objects.filter(condition, user_id=user_id, expense__lt=0)
+        .values('day__year', 'day__month', 'category_id')
+        .annotate(total=Sum('expense'))
+        .order_by()
+    )
+    by_category, by_month = {}, {}
+    for row in rows:
+        key = (row['day__year'], row['day__month'])
+        if row['category_id'] is not None:
+            by_category[(*key, row['category_id'])] = -row['total']
+        by_month[(*key, None)] = by_month.get((*key, None), ZERO) - row['total']
+    return {**by_category, **by_month}
+
+
+def refresh(user_id, days=None):
+    """
+    Recalcula o gasto dos orçamentos do usuário nos meses de `days` (todos,
+    se omitido).
+    """
+    queryset = Budget.objects.filter(user_id=user_id)
+    if days is not None:
+        months = {(day.year, day.month) for day in days}
+        if not months:
+            return
+        condition = Q()
+        for year, month in months:
+            condition |= Q(year=year, month=month)
+        queryset = queryset.filter(condition)
+
+    budgets = list(queryset)
+    if not budgets:
+        return
+    spent = spent_by_month(user_id, {(budget.year, budget.month) for budget in budgets})
+    for budget in budgets:
+        budget.spent = spent.get((budget.year, budget.month, budget.category_id), ZERO)
+    Budget.objects.bulk_update(budgets, ['spent'], batch_size=1000)
+
+
+def refresh_budget(budget):
+    """
+    Calcula o gasto de um orçamento recém-criado ou alterado, na mesma
+    transação que o gravou. A linha do orçamento é travada antes da soma: uma
+    despesa concorrente ou já está nos agregados lidos ou espera a trava e
+    soma o valor por cima do total gravado aqui.
+    """
+    with db_transaction.atomic():
+        Budget.objects.select_for_update().filter(pk=budget.pk).values_list('pk').first()
+        queryset = DailyRollup.objects.filter(
+            month_days(budget.year, budget.month), user_id=budget.user_id, expense__lt=0
+        )
+        if budget.category_id is not None:
+            queryset = queryset.filter(category_id=budget.category_id)
+        total = queryset.aggregate(total=Sum('expense'))['total']
+        budget.spent = -total if total else ZERO
+        Budget.objects.filter(pk=budget.pk).update(spent=budget.spent)
+
+
+def check_limit(user_id, day, category_id, value):
+    """
+    Recusa uma nova despesa que ultrapasse algum orçamento do mês. Uma
+    consulta, com as linhas de orçamento travadas até o fim da transação.
+    """
+    if value >= 0:
+        return
+    rows = (
+        affected(user_id, day, category_id)
+        .select_for_update(of=('self',))
+        .values_list('category__name', 'amount_limit', 'spent')
+    )
+    for name, amount_limit, spent in rows:
+        if spent - value > amount_limit:
+            raise serializers.ValidationError({
+                "error": f"{LIMIT_EXCEEDED} ({name or 'Geral'}): gasto de R$ {spent} de R$ {amount_limit}."
+            })
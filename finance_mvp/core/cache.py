@@ -0,0 +1,83 @@
+"""
+Cache dos relatórios por usuário.
+
+As respostas dos relatórios ficam guardadas sob uma chave que inclui a marca
+d'água do usuário (ChangeWatermark, core/watermarks.py), já lida do banco para
+o ETag. Cada escrita em Transaction/Category incrementa a marca d'água, então
+as respostas antigas daquele usuário deixam de ser usadas em todos os workers,
+mesmo com um cache em memória por processo, e expiram sozinhas.
+"""
+import functools
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework.response import Response
+
+
+HITS_KEY = 'report-cache:hits'
+MISSES_KEY = 'report-cache:misses'
+
+
+def _count(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key)
+
+
+def cache_stats():
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': hits / total if total else 0.0,
+    }
+
+
+def get_cached_report(key):
+    """Busca uma resposta guardada, contabilizando acerto ou falha."""
+    data = cache.get(key)
+    _count(HITS_KEY if data is not None else MISSES_KEY)
+    return data
+
+
+def report_cache_key(user_id, endpoint, params, watermark):
+    """
+    `watermark`: (version, updated_at) do ChangeWatermark do usuário (None:
+    nenhuma escrita ainda). O updated_at distingue um usuário novo de um
+    apagado que tinha o mesmo id e a mesma versão.
+    """
+    version, updated_at = watermark or (0, None)
+    stamp = int(updated_at.timestamp() * 1_000_000) if updated_at else 0
+    query = '&'.join(f'{key}={value}' for key, value in sorted(params.lists()))
+    digest = hashlib.md5(f'{timezone.localdate()}|{query}'.encode()).hexdigest()
+    return f'report:{user_id}:{version}.{stamp}:{endpoint}:{digest}'
+
+
+def cached_report(view_method):
+    """
+    Decorator para o `get` das views de relatório com ConditionalGetMixin:
+    guarda `response.data` das respostas 200 com a chave (usuário, endpoint,
+    parâmetros, marca d'água lida pelo mixin).
+    """
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        if getattr(self, 'validators', None) is None:
+            return view_method(self, request, *args, **kwargs)
+        endpoint = getattr(request.resolver_match, 'url_name', None) or type(self).__name__
+        key = report_cache_key(request.user.pk, endpoint, request.query_params, self.watermark)
+
+        data = get_cached_report(key)
+        if data is not None:
+            return Response(data)
+
+        response = view_method(self, request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, settings.REPORT_CACHE_TIMEOUT)
+        return response
+    return wrapper
@@ -0,0 +1,271 @@
+"""
+Importação de extratos bancários (CSV e OFX).
+
+Os arquivos são lidos como fluxo: cada parser gera uma linha por vez e
+`TransactionImporter` grava em lotes de tamanho fixo, então a memória usada não
+depende do tamanho do arquivo.
+"""
+import csv
+import datetime
+import io
+import re
+from decimal import Decimal, InvalidOperation
+
+from django.db import connection, transaction as db_transaction
+from django.utils import timezone
+
+from . import rollups
+from .models import Transaction, Category
+
+
+CSV_COLUMNS = {
+    'date': ('date', 'data'),
+    'value': ('value', 'valor', 'amount'),
+    'description': ('description', 'descricao', 'descrição', 'historico', 'histórico', 'memo'),
+    'category': ('category', 'categoria'),
+    'emotional_trigger': ('emotional_trigger', 'gatilho', 'gatilho emocional'),
+}
+
+EMOTIONAL_TRIGGERS = {choice for choice, _ in Transaction.EMOTIONAL_TRIGGER_CHOICES}
+
+MAX_REPORTED_ERRORS = 100
+
+
+class ImportRowError(ValueError):
+    pass
+
+
+def parse_value(raw):
+    """Aceita '1234.56', '-1.234,56', 'R$ 10,00' e afins."""
+    text = (raw or '').strip().replace('R$', '').replace(' ', '')
+    if ',' in text and '.' in text:
+        # O último separador é o decimal
+        if text.rfind(',') > text.rfind('.'):
+            text = text.replace('.', '').replace(',', '.')
+        else:
+            text = text.replace(',', '')
+    elif ',' in text:
+        text = text.replace(',', '.')
+    try:
+        value = Decimal(text)
+    except InvalidOperation:
+        raise ImportRowError(f'Valor inválido: {raw!r}')
+    if not value.is_finite() or abs(value) >= Decimal('1e8'):
+        raise ImportRowError(f'Valor inválido: {raw!r}')
+    return value.quantize(Decimal('0.01'))
+
+
+def parse_date(raw):
+    """Aceita 'YYYY-MM-DD', 'DD/MM/YYYY' e o formato OFX 'YYYYMMDD[hhmmss...]'."""
+    text = (raw or '').strip()
+    for pattern, fmt in (
+        (r'\d{4}-\d{2}-\d{2}$', '%Y-%m-%d'),
+        (r'\d{2}/\d{2}/\d{4}$', '%d/%m/%Y'),
+    ):
+        if re.match(pattern, text):
+            try:
+                return datetime.datetime.strptime(text, fmt).date()
+            except ValueError:
+                break
+    match = re.match(r'(\d{8})', text)
+    if match:
+        try:
+            return datetime.datetime.strptime(match.group(1), '%Y%m%d').date()
+        except ValueError:
+            pass
+    raise ImportRowError(f'Data inválida: {raw!r}')
+
+
+def parse_csv(stream):
+    """Gera (número da linha, dict) para cada linha de um CSV com cabeçalho."""
+    header = stream.readline()
+    if not header:
+        return
+    try:
+        dialect = csv.Sniffer().sniff(header, delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+
+    try:
+        names = next(csv.reader([header], dialect))
+    except csv.Error as exc:
+        raise ImportRowError(f'Linha 1: CSV malformado ({exc})')
+    columns = {}
+    for index, name in enumerate(names):
+        name = name.strip().lower()
+        for field, aliases in CSV_COLUMNS.items():
+            if name in aliases:
+                columns[field] = index
+
+    missing = {'date', 'value'} - columns.keys()
+    if missing:
+        raise ImportRowError(f"Colunas obrigatórias ausentes: {', '.join(sorted(missing))}")
+
+    reader = csv.reader(stream, dialect)
+    line = 1
+    while True:
+        line += 1
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as exc:
+            # Aspas sem fechamento, campo acima do limite do módulo csv etc.
+            raise ImportRowError(f'Linha {line}: CSV malformado ({exc})')
+        if not any(cell.strip() for cell in row):
+            continue
+        yield line, {
+            field: row[index] if index < len(row) else ''
+            for field, index in columns.items()
+        }
+
+
+OFX_TAG = re.compile(r'<(/?[A-Z0-9.]+)>([^<]*)')
+
+
+def parse_ofx(stream, chunk_size=64 * 1024):
+    """
+    Gera (número da transação, dict) para cada <STMTTRN> de um arquivo OFX
+    (SGML ou XML), lendo o arquivo em pedaços.
+    """
+    buffer = ''
+    record = None
+    number = 0
+    while True:
+        chunk = stream.read(chunk_size)
+        buffer += chunk
+        # Sem mais dados, processa o que sobrou; senão guarda a última tag,
+        # que pode estar incompleta
+        cut = len(buffer) if not chunk else buffer.rfind('<')
+        for match in OFX_TAG.finditer(buffer, 0, max(cut, 0)):
+            tag, value = match.group(1), match.group(2).strip()
+            if tag == 'STMTTRN':
+                record = {}
+            elif tag == '/STMTTRN' and record is not None:
+                number += 1
+                yield number, {
+                    'date': record.get('DTPOSTED', ''),
+                    'value': record.get('TRNAMT', ''),
+                    'description': record.get('MEMO') or record.get('NAME', ''),
+                }
+                record = None
+            elif record is not None and not tag.startswith('/'):
+                record[tag] = value
+        if not chunk:
+            return
+        buffer = buffer[max(cut, 0):]
+
+
+PARSERS = {
+    'csv': parse_csv,
+    'ofx': parse_ofx,
+}
+
+
+def guess_format(filename):
+    return 'ofx' if filename.lower().endswith(('.ofx', '.qfx')) else 'csv'
+
+
+class TransactionImporter:
+    """
+    Converte as linhas dos parsers em Transaction e grava em lotes de
+    `chunk_size` (COPY no PostgreSQL, bulk_create nos demais bancos).
+    `progress` é chamado após cada lote com o resumo parcial.
+    """
+
+    def __init__(self, user, chunk_size=1000, progress=None, use_copy=None):
+        self.user = user
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.use_copy = connection.vendor == 'postgresql' if use_copy is None else use_copy
+        self.categories = {
+            name.lower(): pk
+            for pk, name in Category.objects.filter(user=user).values_list('pk', 'name')
+        }
+        self.imported = 0
+        self.skipped = 0
+        self.chunks = 0
+        self.errors = []
+
+    def category_id(self, name):
+        name = (name or '').strip()
+        if not name:
+            return None
+        key = name.lower()
+        if key not in self.categories:
+            self.categories[key] = Category.objects.create(user=self.user, name=name[:100]).pk
+        return self.categories[key]
+
+    def build(self, row):
+        trigger = (row.get('emotional_trigger') or '').strip() or None
+        if trigger is not None and trigger not in EMOTIONAL_TRIGGERS:
+            raise ImportRowError(f'Gatilho emocional inválido: {trigger!r}')
+        return Transaction(
+            user=self.user,
+            value=parse_value(row.get('value')),
+            date=parse_date(row.get('date')),
+            description=(row.get('description') or '').strip() or None,
+            category_id=self.category_id(row.get('category')),
+            emotional_trigger=trigger,
+        )
+
+    def run(self, rows):
+        batch = []
+        for line, row in rows:
+            try:
+                batch.append(self.build(row))
+            except ImportRowError as exc:
+                self.skipped += 1
+                if len(self.errors) < MAX_REPORTED_ERRORS:
+                    self.errors.append({'line': line, 'error': str(exc)})
+            if len(batch) >= self.chunk_size:
+                self.write(batch)
+                batch = []
+        if batch:
+            self.write(batch)
+        return self.summary()
+
+    def write(self, batch):
+        with db_transaction.atomic():
+            if self.use_copy:
+                self.copy(batch)
+            else:
+                Transaction.objects.bulk_create(batch, batch_size=self.chunk_size)
+            rollups.refresh_days(self.user.pk, {obj.date for obj in batch})
+        self.imported += len(batch)
+        self.chunks += 1
+        if self.progress:
+            self.progress(self.summary())
+
+    def copy(self, batch):
+        """Grava o lote com COPY ... FROM STDIN (somente PostgreSQL)."""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        # O COPY não passa pelo auto_now de updated_at
+        now = timezone.now().isoformat()
+        for obj in batch:
+            writer.writerow([
+                obj.user_id, obj.value, obj.date.isoformat(), obj.description,
+                obj.emotional_trigger, obj.category_id, now,
+            ])
+        buffer.seek(0)
+        sql = (
+            f'COPY {Transaction._meta.db_table} '
+            '(user_id, value, date, description, emotional_trigger, category_id, updated_at) '
+            'FROM STDIN WITH (FORMAT csv)'
+        )
+        with connection.cursor() as cursor:
+            raw = cursor.cursor
+            if hasattr(raw, 'copy_expert'):  # psycopg2
+                raw.copy_expert(sql, buffer)
+            else:  # psycopg 3
+                with raw.copy(sql) as copy:
+                    copy.write(buffer.getvalue())
+
+    def summary(self):
+        return {
+            'imported': self.imported,
+            'skipped': self.skipped,
+            'chunks': self.chunks,
+            'errors': self.errors,
+        }
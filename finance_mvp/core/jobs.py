@@ -0,0 +1,199 @@
+"""
+Fila de jobs em background guardada no próprio banco, sem broker externo.
+
+`enqueue` grava um Job (dentro de uma transação, o job só fica visível para os
+workers depois do commit). O comando `run_workers` (core/workers.py) chama
+`claim`, que pega os jobs prontos com SELECT ... FOR UPDATE SKIP LOCKED: vários
+comandos podem rodar ao mesmo tempo, em máquinas diferentes, sem disputar o
+mesmo job. Cada job roda em um processo do pool com `execute`.
+
+Uma falha volta o job para a fila com espera crescente (JOBS_RETRY_DELAY,
+dobrando a cada tentativa) até `max_attempts`; `JobError` é uma falha
+definitiva, com mensagem para o usuário, e não é repetida. O job que passa do
+`timeout` tem o processo encerrado e conta como falha. Se o próprio
+`run_workers` cair, o job fica em execução até `locked_until` (timeout +
+JOBS_LEASE_GRACE) e então é recuperado por `recover_expired`. Como um processo
+encerrado não chega aos `finally` da tarefa, o `cleanup` registrado com ela
+roda no processo que marca o job como falho.
+
+As tarefas são funções registradas com `@task` (core/tasks.py) que recebem um
+JobContext e devolvem um resultado serializável em JSON.
+"""
+import datetime
+import json
+import os
+import tempfile
+import traceback
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import Job
+
+
+Task = namedtuple('Task', 'name func timeout max_attempts cleanup', defaults=(None,))
+
+TASKS = {}
+
+
+class JobError(Exception):
+    """Falha definitiva de uma tarefa; a mensagem vai para `Job.error`."""
+
+
+def task(name, timeout=None, max_attempts=None, cleanup=None):
+    """
+    Registra a função como tarefa `name` (prazo e tentativas padrão
+    opcionais). `cleanup(payload)` é chamada quando o job falha de vez.
+    """
+    def register(func):
+        TASKS[name] = Task(name, func, timeout, max_attempts, cleanup)
+        return func
+    return register
+
+
+def enqueue(name, payload=None, user=None, timeout=None, max_attempts=None, run_at=None):
+    """Coloca a tarefa `name` na fila e devolve o Job criado."""
+    if name not in TASKS:
+        raise ValueError(f'Tarefa desconhecida: {name}')
+    registered = TASKS[name]
+    return Job.objects.create(
+        user=user,
+        task=name,
+        payload=payload or {},
+        timeout=timeout or registered.timeout or settings.JOBS_DEFAULT_TIMEOUT,
+        max_attempts=max_attempts or registered.max_attempts or settings.JOBS_MAX_ATTEMPTS,
+        run_at=run_at or timezone.now(),
+    )
+
+
+def save_upload(upload, suffix=''):
+    """Grava um arquivo enviado em JOBS_DIR e devolve o caminho, para o payload."""
+    os.makedirs(settings.JOBS_DIR, exist_ok=True)
+    handle, path = tempfile.mkstemp(dir=settings.JOBS_DIR, suffix=suffix)
+    with os.fdopen(handle, 'wb') as target:
+        for chunk in upload.chunks():
+            target.write(chunk)
+    return path
+
+
+def claim(limit, worker=''):
+    """
+    Marca até `limit` jobs prontos como em execução e devolve uma lista de
+    (id, tentativa, timeout). A tentativa identifica a execução nas demais
+    funções, para que uma execução vencida não sobrescreva a seguinte.
+    """
+    if limit < 1:
+        return []
+    now = timezone.now()
+    claimed = []
+    with db_transaction.atomic():
+        candidates = list(
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status=Job.QUEUED, run_at__lte=now)
+            .order_by('run_at', 'id')
+            .values_list('id', 'attempts', 'timeout')[:limit]
+        )
+        for job_id, attempts, timeout in candidates:
+            # O filtro por status protege os bancos sem SKIP LOCKED (SQLite)
+            updated = Job.objects.filter(pk=job_id, status=Job.QUEUED, attempts=attempts).update(
+                status=Job.RUNNING,
+                attempts=attempts + 1,
+                started_at=now,
+                locked_until=now + datetime.timedelta(seconds=timeout + settings.JOBS_LEASE_GRACE),
+                worker=worker[:100],
+                progress=0,
+                message='',
+            )
+            if updated:
+                claimed.append((job_id, attempts + 1, timeout))
+    return claimed
+
+
+def running(job_id, attempt):
+    return Job.objects.filter(pk=job_id, status=Job.RUNNING, attempts=attempt)
+
+
+def to_json(value):
+    # Decimal vira número e datas viram ISO 8601, como nas respostas da API
+    return json.loads(json.dumps(value, cls=JSONEncoder))
+
+
+def finish(job_id, attempt, result):
+    return bool(running(job_id, attempt).update(
+        status=Job.SUCCEEDED,
+        result=to_json(result),
+        error='',
+        progress=100,
+        finished_at=timezone.now(),
+        locked_until=None,
+    ))
+
+
+def fail(job_id, attempt, error, retry=True):
+    """
+    Registra a falha da tentativa: volta para a fila com espera crescente ou,
+    sem tentativas restantes (ou com retry=False), marca o job como falho e
+    chama o `cleanup` da tarefa.
+    """
+    job = running(job_id, attempt).values('max_attempts', 'task', 'payload').first()
+    if job is None:
+        return False
+    now = timezone.now()
+    if retry and attempt < job['max_attempts']:
+        delay = settings.JOBS_RETRY_DELAY * 2 ** (attempt - 1)
+        changes = {'status': Job.QUEUED, 'run_at': now + datetime.timedelta(seconds=delay)}
+    else:
+        changes = {'status': Job.FAILED, 'finished_at': now}
+    if not running(job_id, attempt).update(error=error, locked_until=None, **changes):
+        return False
+    registered = TASKS.get(job['task'])
+    if changes['status'] == Job.FAILED and registered and registered.cleanup:
+        registered.cleanup(job['payload'])
+    return True
+
+
+def recover_expired():
+    """Trata como falha os jobs em execução cujo prazo venceu (worker interrompido)."""
+    expired = Job.objects.filter(status=Job.RUNNING, locked_until__lt=timezone.now())
+    recovered = 0
+    for job_id, attempt in expired.values_list('id', 'attempts'):
+        recovered += fail(job_id, attempt, 'Prazo de execução vencido: o worker foi interrompido.')
+    return recovered
+
+
+class JobContext:
+    """O que a tarefa recebe: o job, o payload, o usuário e o registro de progresso."""
+
+    def __init__(self, job):
+        self.job = job
+        self.payload = job.payload
+        self.user = job.user
+        self.reported = None
+
+    def progress(self, percent, message=''):
+        """Grava o progresso (0 a 100); só escreve no banco quando ele muda."""
+        state = (max(0, min(100, int(percent))), message[:200])
+        if state == self.reported:
+            return
+        self.reported = state
+        running(self.job.pk, self.job.attempts).update(progress=state[0], message=state[1])
+
+
+def execute(job_id, attempt):
+    """Executa a tentativa `attempt` de um job já marcado por `claim`."""
+    job = running(job_id, attempt).select_related('user').first()
+    if job is None:
+        return
+    try:
+        if job.task not in TASKS:
+            raise JobError(f'Tarefa desconhecida: {job.task}')
+        result = TASKS[job.task].func(JobContext(job))
+    except JobError as exc:
+        fail(job_id, attempt, str(exc), retry=False)
+    except Exception:
+        fail(job_id, attempt, traceback.format_exc(limit=5))
+    else:
+        finish(job_id, attempt, result)
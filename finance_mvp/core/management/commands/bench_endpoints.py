@@ -0,0 +1,68 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+
+from core import benchmarks
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks every route in core/urls.py (p50/p95/p99 latency and SQL query count) '
+        'and fails when a query budget or latency baseline from core/benchmark_budgets.json regresses'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Username whose data is used (default: the user with most transactions)')
+        parser.add_argument('--iterations', type=int, default=20, help='Requests per route (default: 20)')
+        parser.add_argument('--route', action='append', dest='routes', help='Only this route name (repeatable)')
+        parser.add_argument('--warm', action='store_true', help='Keep the report cache between requests')
+        parser.add_argument('--budgets', default=benchmarks.BUDGETS_PATH, help='Budget file (JSON)')
+        parser.add_argument('--latency-tolerance', type=float, default=1.5,
+                            help='Fail when p95 exceeds the baseline times this factor (0 disables, default: 1.5)')
+        parser.add_argument('--write-baseline', action='store_true',
+                            help='Write the measured query counts and p95 latencies as the new budgets')
+
+    def handle(self, *args, **options):
+        users = User.objects.annotate(total=Count('transaction')).order_by('-total')
+        if options['user']:
+            users = users.filter(username=options['user'])
+        user = users.first()
+        if user is None:
+            raise CommandError('Usuário não encontrado (veja o comando seed_synthetic)')
+        if options['iterations'] < 1:
+            raise CommandError('--iterations deve ser positivo')
+
+        try:
+            results = benchmarks.run_suite(
+                user,
+                iterations=options['iterations'],
+                names=options['routes'],
+                warm=options['warm'],
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(f"{'rota':<26} {'status':>6} {'queries':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<26} {result['status']:>6} {result['queries']:>7} "
+                f"{result['p50']:>9.1f} {result['p95']:>9.1f} {result['p99']:>9.1f}"
+            )
+        for name, reason in benchmarks.SKIPPED.items():
+            self.stdout.write(f'{name:<26} ignorada: {reason}')
+
+        if options['write_baseline']:
+            benchmarks.save_budgets(results, options['budgets'])
+            self.stdout.write(self.style.SUCCESS(f"Orçamentos gravados em {options['budgets']}"))
+            return
+
+        problems = benchmarks.check_budgets(
+            results,
+            benchmarks.load_budgets(options['budgets']),
+            latency_tolerance=options['latency_tolerance'] or None,
+        )
+        if problems:
+            raise CommandError('Regressões encontradas:\n  ' + '\n  '.join(problems))
+        self.stdout.write(self.style.SUCCESS('Nenhuma regressão'))
@@ -0,0 +1,114 @@
+import http.client
+import statistics
+import threading
+import time
+from urllib.parse import urlsplit
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import AccessToken
+
+User = get_user_model()
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures HTTP throughput and latency of one or more running endpoints, '
+        'e.g. the same report served by the WSGI and by the ASGI deployment'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='+', help='Full URLs to benchmark, one after the other')
+        parser.add_argument('--user', help='Username used to mint a JWT access token')
+        parser.add_argument('--token', help='JWT access token (instead of --user)')
+        parser.add_argument('--concurrency', type=int, default=20, help='Concurrent keep-alive connections (default: 20)')
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds per URL (default: 10)')
+        parser.add_argument('--timeout', type=float, default=30.0, help='Per-request timeout in seconds (default: 30)')
+
+    def handle(self, *args, **options):
+        token = options['token']
+        if not token and options['user']:
+            user = User.objects.filter(username=options['user']).first()
+            if user is None:
+                raise CommandError(f"Usuário '{options['user']}' não encontrado")
+            token = str(AccessToken.for_user(user))
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+
+        results = []
+        for url in options['urls']:
+            stats = self.run(url, headers, options['concurrency'], options['duration'], options['timeout'])
+            results.append((url, stats))
+            self.stdout.write(
+                f"{url}\n"
+                f"  {stats['requests']} requisições ({stats['errors']} erros) em {stats['elapsed']:.1f}s: "
+                f"{stats['throughput']:,.1f} req/s\n"
+                f"  latência p50={stats['p50']:.1f}ms p95={stats['p95']:.1f}ms p99={stats['p99']:.1f}ms"
+            )
+
+        if len(results) > 1:
+            baseline = results[0][1]['throughput'] or 1
+            for url, stats in results[1:]:
+                self.stdout.write(self.style.SUCCESS(
+                    f"{url}: {stats['throughput'] / baseline:.2f}x a vazão de {results[0][0]}"
+                ))
+
+    def run(self, url, headers, concurrency, duration, timeout):
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            raise CommandError(f'URL inválida: {url}')
+        connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        target = parts.path + (f'?{parts.query}' if parts.query else '')
+
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+        deadline = time.perf_counter() + duration
+
+        def worker():
+            # Uma conexão keep-alive por worker, como um cliente real
+            connection = connection_class(parts.hostname, parts.port, timeout=timeout)
+            own_latencies = []
+            own_errors = 0
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                try:
+                    connection.request('GET', target, headers=headers)
+                    response = connection.getresponse()
+                    response.read()
+                    if response.status != 200:
+                        own_errors += 1
+                        continue
+                except (OSError, http.client.HTTPException):
+                    own_errors += 1
+                    connection.close()
+                    continue
+                own_latencies.append((time.perf_counter() - started) * 1000)
+            connection.close()
+            with lock:
+                latencies.extend(own_latencies)
+                errors.append(own_errors)
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        if not latencies:
+            raise CommandError(f'Nenhuma resposta 200 de {url}')
+        return {
+            'requests': len(latencies),
+            'errors': sum(errors),
+            'elapsed': elapsed,
+            'throughput': len(latencies) / elapsed,
+            'p50': statistics.median(latencies),
+            'p95': percentile(latencies, 0.95),
+            'p99': percentile(latencies, 0.99),
+        }
@@ -0,0 +1,79 @@
+import json
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.utils.text import compress_string
+from rest_framework.renderers import JSONRenderer
+
+from core import renderers
+from core.models import Transaction
+from core.pivot import pivot
+from core.serializers import TransactionListSerializer
+from finance_mvp import compression
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks response rendering: DRF JSONRenderer versus the orjson renderer (and MessagePack, gzip and brotli sizes)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Username whose data is rendered (default: the user with most rows)')
+        parser.add_argument('--rows', type=int, default=5000, help='Transactions in the list payload (default: 5000)')
+        parser.add_argument('--repeat', type=int, default=20, help='Renders per variant and payload (default: 20)')
+
+    def handle(self, *args, **options):
+        if renderers.orjson is None:
+            raise CommandError('orjson não está instalado: o FastJSONRenderer usa o JSONRenderer do DRF')
+
+        users = User.objects.annotate(total=Count('transaction')).order_by('-total')
+        if options['user']:
+            users = users.filter(username=options['user'])
+        user = users.first()
+        if user is None or not user.total:
+            raise CommandError('Nenhuma transação encontrada para o benchmark (veja o comando seed_synthetic)')
+
+        rows = (
+            Transaction.objects.filter(user=user).order_by('-date', '-id')
+            .values(*TransactionListSerializer.columns)[:options['rows']]
+        )
+        payloads = {
+            # Listagem: valores já convertidos em string pelo serializer
+            'listagem': TransactionListSerializer().serialize(rows),
+            # Relatório: Decimal e date convertidos pelo renderer
+            'pivot': pivot(user, ['day', 'category'], ['sum', 'count']),
+        }
+
+        variants = [('DRF', JSONRenderer().render), ('orjson', renderers.FastJSONRenderer().render)]
+        if renderers.msgpack is not None:
+            variants.append(('msgpack', renderers.MessagePackRenderer().render))
+
+        for name, data in payloads.items():
+            expected = JSONRenderer().render(data)
+            if json.loads(renderers.FastJSONRenderer().render(data)) != json.loads(expected):
+                raise CommandError(f'{name}: o FastJSONRenderer produziu JSON diferente do DRF')
+
+            self.stdout.write(f'{name} ({len(expected) / 1024:,.0f} KB em JSON)')
+            results = {}
+            for variant, render in variants:
+                started = time.perf_counter()
+                for _ in range(options['repeat']):
+                    size = len(render(data))
+                elapsed = (time.perf_counter() - started) / options['repeat']
+                results[variant] = elapsed
+                self.stdout.write(f'{variant:>16}: {elapsed * 1000:8.2f} ms {size / 1024:10,.0f} KB')
+
+            self.write_compressed('gzip', lambda: compress_string(expected), len(expected))
+            if compression.brotli is not None:
+                quality = settings.COMPRESSION_BROTLI_QUALITY
+                self.write_compressed('brotli', lambda: compression.brotli.compress(expected, quality=quality), len(expected))
+            self.stdout.write(self.style.SUCCESS(f"Ganho: {results['DRF'] / results['orjson']:.1f}x"))
+
+    def write_compressed(self, name, compress, original):
+        started = time.perf_counter()
+        size = len(compress())
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'{name:>16}: {elapsed * 1000:8.2f} ms {size / 1024:10,.0f} KB ({size / original:.0%})')
@@ -0,0 +1,56 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from rest_framework.renderers import JSONRenderer
+
+from core.models import Transaction
+from core.serializers import TransactionSerializer, TransactionListSerializer
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks the transaction list read path: DRF ModelSerializer versus the values()-based fast path'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Username whose transactions are listed (default: the user with most rows)')
+        parser.add_argument('--rows', type=int, default=5000, help='Rows listed per iteration (default: 5000)')
+        parser.add_argument('--repeat', type=int, default=5, help='Iterations per variant (default: 5)')
+
+    def handle(self, *args, **options):
+        users = User.objects.annotate(total=Count('transaction')).order_by('-total')
+        if options['user']:
+            users = users.filter(username=options['user'])
+        user = users.first()
+        if user is None or not user.total:
+            raise CommandError('Nenhuma transação encontrada para o benchmark (veja o comando seed_synthetic)')
+
+        base = Transaction.objects.filter(user=user).order_by('-date', '-id')[:options['rows']]
+        renderer = JSONRenderer()
+
+        def drf_serializer():
+            # Caminho anterior: instâncias de modelo sem select_related + ModelSerializer
+            return renderer.render(TransactionSerializer(base, many=True).data)
+
+        def fast_path():
+            rows = base.values(*TransactionListSerializer.columns)
+            return renderer.render(TransactionListSerializer().serialize(rows))
+
+        if drf_serializer() != fast_path():
+            raise CommandError('As duas serializações produziram JSON diferente')
+
+        results = {}
+        for name, func in (('ModelSerializer', drf_serializer), ('fast path', fast_path)):
+            rows = 0
+            started = time.perf_counter()
+            for _ in range(options['repeat']):
+                rows += func().count(b'"id":')
+            elapsed = time.perf_counter() - started
+            results[name] = rows / elapsed
+            self.stdout.write(f'{name:>16}: {results[name]:12,.0f} linhas/s')
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Ganho: {results['fast path'] / results['ModelSerializer']:.1f}x"
+        ))
@@ -0,0 +1,47 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core.importers import PARSERS, ImportRowError, TransactionImporter, guess_format
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Imports a bank statement (CSV or OFX) into a user account, streaming it in fixed-size chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Path to the CSV or OFX file')
+        parser.add_argument('--user', required=True, help='Username that will own the transactions')
+        parser.add_argument('--format', choices=sorted(PARSERS), help='File format (default: guessed from the extension)')
+        parser.add_argument('--encoding', default='utf-8-sig', help='File encoding (default: utf-8-sig)')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Rows written per chunk (default: 1000)')
+        parser.add_argument('--no-copy', action='store_true', help='Use bulk_create even on PostgreSQL')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f'Usuário "{options["user"]}" não encontrado')
+
+        parse = PARSERS[options['format'] or guess_format(options['path'])]
+        importer = TransactionImporter(
+            user,
+            chunk_size=options['chunk_size'],
+            progress=self.report,
+            use_copy=False if options['no_copy'] else None,
+        )
+
+        try:
+            with open(options['path'], encoding=options['encoding'], newline='') as stream:
+                summary = importer.run(parse(stream))
+        except (OSError, UnicodeDecodeError, ImportRowError) as exc:
+            raise CommandError(f'Falha ao importar: {exc}')
+
+        for error in summary['errors']:
+            self.stdout.write(self.style.WARNING(f"Linha {error['line']}: {error['error']}"))
+        self.stdout.write(self.style.SUCCESS(
+            f"{summary['imported']} transação(ões) importada(s), {summary['skipped']} ignorada(s)"
+        ))
+
+    def report(self, summary):
+        self.stdout.write(f"Lote {summary['chunks']}: {summary['imported']} importadas, {summary['skipped']} ignoradas")
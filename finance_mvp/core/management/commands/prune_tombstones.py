@@ -0,0 +1,13 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import sync
+
+
+class Command(BaseCommand):
+    help = 'Deletes sync tombstones older than SYNC_TOMBSTONE_DAYS (clients with older cursors get a full resync)'
+
+    def handle(self, *args, **options):
+        days = settings.SYNC_TOMBSTONE_DAYS
+        deleted = sync.prune(days)
+        self.stdout.write(self.style.SUCCESS(f'{deleted} tombstone(s) com mais de {days} dias apagada(s)'))
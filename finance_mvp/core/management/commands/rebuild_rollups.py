@@ -0,0 +1,38 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core import rollups
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the per-user daily rollup table from raw transactions, or checks it for drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='users', default=[],
+                            help='Username to process (may be repeated). Defaults to every user.')
+        parser.add_argument('--check', action='store_true',
+                            help='Only compare the rollups with the transactions, without writing.')
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('pk')
+        if options['users']:
+            users = users.filter(username__in=options['users'])
+        user_ids = list(users.values_list('pk', flat=True))
+
+        if options['check']:
+            total = 0
+            for user_id in user_ids:
+                for bucket, expected, actual in rollups.find_drift(user_id):
+                    total += 1
+                    self.stdout.write(self.style.WARNING(
+                        f'Divergência em {bucket}: esperado {expected}, encontrado {actual}'
+                    ))
+            if total:
+                raise CommandError(f'{total} balde(s) divergente(s) encontrados')
+            self.stdout.write(self.style.SUCCESS(f'Agregados consistentes para {len(user_ids)} usuário(s)'))
+            return
+
+        rollups.rebuild(user_ids)
+        self.stdout.write(self.style.SUCCESS(f'Agregados reconstruídos para {len(user_ids)} usuário(s)'))
@@ -0,0 +1,33 @@
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.workers import WorkerPool
+
+
+class Command(BaseCommand):
+    help = 'Runs queued background jobs in a process pool until interrupted'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=settings.JOBS_WORKERS,
+                            help='Worker processes (default: JOBS_WORKERS). 0 runs jobs in this process, without timeouts.')
+        parser.add_argument('--poll-interval', type=float, default=settings.JOBS_POLL_INTERVAL,
+                            help='Seconds between queue checks when idle (default: JOBS_POLL_INTERVAL)')
+        parser.add_argument('--burst', action='store_true', help='Exit once the queue is empty')
+        parser.add_argument('--max-jobs', type=int, help='Exit after starting this many jobs')
+
+    def handle(self, *args, **options):
+        if options['processes'] < 0:
+            raise CommandError('--processes deve ser zero ou positivo')
+
+        pool = WorkerPool(options['processes'], options['poll_interval'], log=self.stdout.write)
+        # O sinal deixa os jobs em andamento terminarem
+        previous = {signum: signal.signal(signum, pool.stop) for signum in (signal.SIGTERM, signal.SIGINT)}
+        try:
+            self.stdout.write(f"Workers iniciados ({options['processes']} processo(s)); aguardando jobs")
+            started = pool.run(burst=options['burst'], max_jobs=options['max_jobs'])
+        finally:
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+        self.stdout.write(self.style.SUCCESS(f'{started} job(s) executado(s)'))
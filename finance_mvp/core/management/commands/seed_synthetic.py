@@ -0,0 +1,199 @@
+import datetime
+import math
+import random
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction as db_transaction
+from django.utils import timezone
+
+from core.importers import TransactionImporter
+from core.models import Category, Transaction
+
+User = get_user_model()
+
+# (nome, valor mediano, peso na frequência de despesas, pesos dos gatilhos emocionais)
+CATEGORY_PROFILES = [
+    ('Mercado', 180, 20, {'Necessidade Básica': 80, 'Conforto/Compulsão': 10, 'Impulso Emocional': 10}),
+    ('Restaurantes', 70, 14, {'Prazer/Entretenimento': 50, 'Pressão Social/Status': 20, 'Conforto/Compulsão': 20, 'Necessidade Básica': 10}),
+    ('Transporte', 35, 16, {'Necessidade Básica': 90, 'Planejamento/Objetivo': 10}),
+    ('Moradia', 1500, 1, {'Necessidade Básica': 95, 'Planejamento/Objetivo': 5}),
+    ('Contas', 220, 3, {'Necessidade Básica': 100}),
+    ('Saúde', 150, 3, {'Necessidade Básica': 85, 'Planejamento/Objetivo': 15}),
+    ('Lazer', 90, 8, {'Prazer/Entretenimento': 60, 'Curiosidade/Exploração': 20, 'Pressão Social/Status': 20}),
+    ('Compras', 160, 8, {'Impulso Emocional': 45, 'Pressão Social/Status': 25, 'Conforto/Compulsão': 20, 'Necessidade Básica': 10}),
+    ('Educação', 300, 2, {'Planejamento/Objetivo': 80, 'Curiosidade/Exploração': 20}),
+    ('Assinaturas', 40, 3, {'Prazer/Entretenimento': 50, 'Conforto/Compulsão': 30, 'Curiosidade/Exploração': 20}),
+    ('Viagens', 900, 1, {'Prazer/Entretenimento': 50, 'Planejamento/Objetivo': 30, 'Pressão Social/Status': 20}),
+    ('Presentes', 120, 2, {'Pressão Social/Status': 50, 'Planejamento/Objetivo': 30, 'Impulso Emocional': 20}),
+]
+
+# Descrições por categoria, como aparecem nos extratos (usadas pela busca)
+MERCHANTS = {
+    'Mercado': ['Supermercado Extra', 'Carrefour', 'Pão de Açúcar', 'Atacadão', 'Hortifruti'],
+    'Restaurantes': ['iFood *Pedido', 'Outback', 'Madero', 'Padaria Real', 'Burger King'],
+    'Transporte': ['UBER *TRIP', '99 *Corrida', 'Posto Shell', 'Posto Ipiranga', 'Metrô Recarga'],
+    'Moradia': ['Aluguel', 'Condomínio'],
+    'Contas': ['Enel Energia', 'Sabesp', 'Vivo Fibra', 'Claro Celular'],
+    'Saúde': ['Drogasil', 'Droga Raia', 'Consulta Médica', 'Laboratório Fleury'],
+    'Lazer': ['Cinemark', 'Ingresso.com', 'Steam Games', 'Parque Ibirapuera'],
+    'Compras': ['Amazon Marketplace', 'Mercado Livre', 'Shopee', 'Renner', 'Magazine Luiza'],
+    'Educação': ['Udemy', 'Alura', 'Livraria Cultura', 'Mensalidade Faculdade'],
+    'Assinaturas': ['Netflix.com', 'Spotify', 'Amazon Prime', 'Disney Plus'],
+    'Viagens': ['Latam Airlines', 'Gol Linhas Aéreas', 'Booking.com', 'Airbnb'],
+    'Presentes': ['Boticário', 'Floricultura', 'Americanas'],
+}
+
+INCOME_CATEGORY = 'Salário'
+IMPULSIVE_TRIGGERS = ('Impulso Emocional', 'Conforto/Compulsão', 'Prazer/Entretenimento')
+
+
+def money(value):
+    return Decimal(f'{value:.2f}')
+
+
+def day_weight(day):
+    """
+    Peso relativo de um dia na distribuição das despesas: mais gastos no fim
+    de semana, nos dias após o pagamento e em dezembro.
+    """
+    weight = 1.0
+    if day.weekday() >= 5:
+        weight *= 1.5
+    if day.day <= 10:
+        weight *= 1.3
+    if day.month == 12:
+        weight *= 1.4
+    return weight
+
+
+class Command(BaseCommand):
+    help = (
+        'Generates synthetic users, categories and transactions for benchmarks '
+        '(monthly salary, log-normal expenses, weekday/payday/seasonal date skew '
+        'and per-category emotional-trigger distributions)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10, help='Number of users (default: 10)')
+        parser.add_argument('--transactions', type=int, default=10000, help='Transactions per user (default: 10000)')
+        parser.add_argument('--categories', type=int, default=len(CATEGORY_PROFILES),
+                            help=f'Expense categories per user, at most {len(CATEGORY_PROFILES)}')
+        parser.add_argument('--days', type=int, default=730, help='History length in days, ending today (default: 730)')
+        parser.add_argument('--prefix', default='synthetic', help="Username prefix (default: 'synthetic')")
+        parser.add_argument('--password', default='synthetic-pass', help='Password of the generated users')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows per write batch (default: 5000)')
+        parser.add_argument('--replace', action='store_true', help='Delete existing users with the same prefix first')
+        parser.add_argument('--no-copy', action='store_true', help='Use bulk_create even on PostgreSQL')
+
+    def handle(self, *args, **options):
+        if not 1 <= options['categories'] <= len(CATEGORY_PROFILES):
+            raise CommandError(f'--categories deve estar entre 1 e {len(CATEGORY_PROFILES)}')
+        if options['days'] < 1 or options['transactions'] < 0 or options['users'] < 1:
+            raise CommandError('--users e --days devem ser positivos e --transactions não negativo')
+
+        prefix = options['prefix']
+        existing = User.objects.filter(username__startswith=prefix)
+        if existing.exists():
+            if not options['replace']:
+                raise CommandError(f"Já existem usuários com o prefixo '{prefix}' (use --replace)")
+            existing.delete()
+
+        end = timezone.localdate()
+        days = [end - datetime.timedelta(days=offset) for offset in range(options['days'] - 1, -1, -1)]
+        cum_weights = []
+        total = 0.0
+        for day in days:
+            total += day_weight(day)
+            cum_weights.append(total)
+
+        started = time.perf_counter()
+        imported = 0
+        for index in range(options['users']):
+            rng = random.Random(f"{options['seed']}:{index}")
+            user = User.objects.create_user(username=f'{prefix}{index:05d}', password=options['password'])
+            profiles = CATEGORY_PROFILES[:options['categories']]
+            with db_transaction.atomic():
+                categories = {
+                    name: Category.objects.create(user=user, name=name)
+                    for name in [INCOME_CATEGORY] + [profile[0] for profile in profiles]
+                }
+
+            importer = TransactionImporter(
+                user,
+                chunk_size=options['chunk_size'],
+                use_copy=False if options['no_copy'] else None,
+            )
+            rows = self.generate(rng, user, days, cum_weights, profiles, categories, options['transactions'])
+            batch = []
+            for obj in rows:
+                batch.append(obj)
+                if len(batch) >= options['chunk_size']:
+                    importer.write(batch)
+                    batch = []
+            if batch:
+                importer.write(batch)
+
+            imported += importer.imported
+            self.stdout.write(f'{user.username}: {importer.imported} transações')
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"{options['users']} usuários e {imported} transações em {elapsed:.1f}s "
+            f"({imported / elapsed if elapsed else 0:,.0f} linhas/s)"
+        ))
+
+    def generate(self, rng, user, days, cum_weights, profiles, categories, count):
+        """Gera as transações de um usuário em ordem de data."""
+        salary = money(rng.lognormvariate(math.log(4500), 0.5))
+        paydays = [day for day in days if day.day == 5]
+        incomes = min(count, len(paydays))
+        # Usuários diferentes têm hábitos diferentes: o quanto gastam por
+        # impulso no fim de semana e o peso de cada categoria
+        impulsiveness = rng.uniform(0.0, 0.5)
+        category_weights = [frequency * rng.uniform(0.5, 1.5) for _, _, frequency, _ in profiles]
+
+        expense_days = sorted(rng.choices(days, cum_weights=cum_weights, k=count - incomes))
+        paydays = paydays[len(paydays) - incomes:]
+
+        def expense(day):
+            name, median, _, triggers = rng.choices(profiles, weights=category_weights)[0]
+            value = money(rng.lognormvariate(math.log(median), 0.6))
+            if day.weekday() >= 5 and rng.random() < impulsiveness:
+                trigger = rng.choice(IMPULSIVE_TRIGGERS)
+            else:
+                trigger = rng.choices(list(triggers), weights=list(triggers.values()))[0]
+            # Uma parte das despesas fica sem categoria ou sem gatilho
+            category = categories[name] if rng.random() > 0.05 else None
+            if rng.random() < 0.05:
+                trigger = None
+            return Transaction(
+                user=user,
+                value=-value,
+                date=day,
+                description=rng.choice(MERCHANTS[name]),
+                category_id=category.pk if category else None,
+                emotional_trigger=trigger,
+            )
+
+        income_index = 0
+        for day in expense_days:
+            while income_index < len(paydays) and paydays[income_index] <= day:
+                yield self.income(user, paydays[income_index], salary, categories)
+                income_index += 1
+            yield expense(day)
+        for payday in paydays[income_index:]:
+            yield self.income(user, payday, salary, categories)
+
+    def income(self, user, day, salary, categories):
+        return Transaction(
+            user=user,
+            value=salary,
+            date=day,
+            description=INCOME_CATEGORY,
+            category_id=categories[INCOME_CATEGORY].pk,
+            emotional_trigger='Planejamento/Objetivo',
+        )
@@ -0,0 +1,73 @@
+import datetime
+import multiprocessing
+import os
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.models import Max, Min
+
+from core import workers
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Stores the summary of every closed month for all users, processing user-id ranges in parallel'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=os.cpu_count(),
+                            help='Worker processes (default: number of CPUs). 0 or 1 runs in this process.')
+        parser.add_argument('--range-size', type=int, default=500,
+                            help='User ids per range, each processed with one query (default: 500)')
+        parser.add_argument('--since', help='Only months from YYYY-MM on')
+        parser.add_argument('--rebuild', action='store_true', help='Recompute snapshots that already exist')
+
+    def handle(self, *args, **options):
+        if options['range_size'] < 1:
+            raise CommandError('--range-size deve ser positivo')
+        self.verbosity = options['verbosity']
+        since = None
+        if options['since']:
+            try:
+                since = datetime.datetime.strptime(options['since'], '%Y-%m').date()
+            except ValueError:
+                raise CommandError('--since deve estar no formato YYYY-MM')
+
+        bounds = User.objects.aggregate(first=Min('pk'), last=Max('pk'))
+        if bounds['first'] is None:
+            self.stdout.write('Nenhum usuário encontrado')
+            return
+        size = options['range_size']
+        ranges = [
+            (first_id, min(first_id + size, bounds['last'] + 1), since, options['rebuild'])
+            for first_id in range(bounds['first'], bounds['last'] + 1, size)
+        ]
+
+        started = time.monotonic()
+        processes = min(options['processes'] or 1, len(ranges))
+        if processes > 1 and connection.vendor == 'sqlite':
+            # Um escritor por vez: os processos ficariam esperando o lock do arquivo
+            self.stdout.write(self.style.WARNING('SQLite não aceita escritas em paralelo; usando 1 processo'))
+            processes = 1
+        if processes <= 1:
+            total = self.collect(map(workers.snapshot_range, ranges))
+        else:
+            # Os processos filhos abrem as próprias conexões
+            connections.close_all()
+            with multiprocessing.get_context().Pool(processes, initializer=workers.setup_child) as pool:
+                total = self.collect(pool.imap_unordered(workers.snapshot_range, ranges))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{total} snapshot(s) gravado(s) em {len(ranges)} faixa(s) de usuários '
+            f'com {processes} processo(s) em {time.monotonic() - started:.1f}s'
+        ))
+
+    def collect(self, results):
+        total = 0
+        for first_id, last_id, written in results:
+            total += written
+            if self.verbosity >= 2:
+                self.stdout.write(f'Usuários {first_id}-{last_id - 1}: {written} snapshot(s)')
+        return total
@@ -0,0 +1,67 @@
+# Generated by Django 5.1.7 on 2026-10-18 08:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum, Count, Case, When, F, Value, DecimalField
+from django.db.models.functions import Coalesce
+
+
+def populate_rollups(apps, schema_editor):
+    Transaction = apps.get_model('core', 'Transaction')
+    DailyRollup = apps.get_model('core', 'DailyRollup')
+
+    data = (
+        Transaction.objects
+        .annotate(trigger=Coalesce('emotional_trigger', Value('')))
+        .values('user_id', 'date', 'category_id', 'trigger')
+        .annotate(
+            income_total=Coalesce(Sum(Case(When(value__gt=0, then=F('value')), default=Value(0), output_field=DecimalField())), Value(0), output_field=DecimalField()),
+            expense_total=Coalesce(Sum(Case(When(value__lt=0, then=F('value')), default=Value(0), output_field=DecimalField())), Value(0), output_field=DecimalField()),
+            total_count=Count('id'),
+        )
+        .order_by()
+    )
+    DailyRollup.objects.bulk_create(
+        (
+            DailyRollup(
+                user_id=item['user_id'],
+                day=item['date'],
+                category_id=item['category_id'],
+                emotional_trigger=item['trigger'],
+                income=item['income_total'],
+                expense=item['expense_total'],
+                count=item['total_count'],
+            )
+            for item in data
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_delete_budget'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('emotional_trigger', models.CharField(blank=True, default='', max_length=30)),
+                ('income', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('expense', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('count', models.IntegerField(default=0)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='core.category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'day', 'category', 'emotional_trigger'), name='unique_daily_rollup_bucket')],
+            },
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
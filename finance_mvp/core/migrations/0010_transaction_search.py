@@ -0,0 +1,63 @@
+from django.db import migrations
+
+
+POSTGRESQL_FORWARD = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE EXTENSION IF NOT EXISTS btree_gin',
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS core_txn_description_fts_idx ON core_transaction "
+    "USING gin (user_id, to_tsvector('portuguese', coalesce(description, '')))",
+    'CREATE INDEX CONCURRENTLY IF NOT EXISTS core_txn_description_trgm_idx ON core_transaction '
+    'USING gin (user_id, description gin_trgm_ops)',
+]
+POSTGRESQL_BACKWARD = [
+    'DROP INDEX CONCURRENTLY IF EXISTS core_txn_description_trgm_idx',
+    'DROP INDEX CONCURRENTLY IF EXISTS core_txn_description_fts_idx',
+]
+
+# Tabela FTS5 de conteúdo externo: guarda só o índice e lê a descrição de
+# core_transaction; os triggers a mantêm em dia inclusive no bulk_create
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS core_transaction_fts USING fts5("
+    "description, content='core_transaction', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS core_transaction_fts_insert AFTER INSERT ON core_transaction BEGIN "
+    "INSERT INTO core_transaction_fts(rowid, description) VALUES (new.id, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS core_transaction_fts_delete AFTER DELETE ON core_transaction BEGIN "
+    "INSERT INTO core_transaction_fts(core_transaction_fts, rowid, description) "
+    "VALUES ('delete', old.id, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS core_transaction_fts_update AFTER UPDATE OF description ON core_transaction BEGIN "
+    "INSERT INTO core_transaction_fts(core_transaction_fts, rowid, description) "
+    "VALUES ('delete', old.id, old.description); "
+    "INSERT INTO core_transaction_fts(rowid, description) VALUES (new.id, new.description); END",
+    "INSERT INTO core_transaction_fts(core_transaction_fts) VALUES ('rebuild')",
+]
+SQLITE_BACKWARD = [
+    'DROP TRIGGER IF EXISTS core_transaction_fts_update',
+    'DROP TRIGGER IF EXISTS core_transaction_fts_delete',
+    'DROP TRIGGER IF EXISTS core_transaction_fts_insert',
+    'DROP TABLE IF EXISTS core_transaction_fts',
+]
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        vendor = schema_editor.connection.vendor
+        for sql in statements.get(vendor, []):
+            schema_editor.execute(sql)
+    return operation
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY não roda dentro de transação; assim a tabela
+    # não fica travada para escrita enquanto os índices são montados
+    atomic = False
+
+    dependencies = [
+        ('core', '0009_statelessuser'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run({'postgresql': POSTGRESQL_FORWARD, 'sqlite': SQLITE_FORWARD}),
+            run({'postgresql': POSTGRESQL_BACKWARD, 'sqlite': SQLITE_BACKWARD}),
+        ),
+    ]
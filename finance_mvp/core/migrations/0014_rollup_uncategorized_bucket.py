@@ -0,0 +1,51 @@
+# Generated by Django 5.1.7 on 2026-10-18 10:07
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_uncategorized_buckets(apps, schema_editor):
+    """Junta os baldes "Sem Categoria" repetidos antes de criar a constraint."""
+    DailyRollup = apps.get_model('core', 'DailyRollup')
+
+    duplicates = (
+        DailyRollup.objects.filter(category__isnull=True)
+        .values('user_id', 'day', 'emotional_trigger')
+        .annotate(
+            rows=Count('id'), keep=Min('id'),
+            total_income=Sum('income'), total_expense=Sum('expense'),
+            total_count=Sum('count'), total_expense_count=Sum('expense_count'),
+        )
+        .filter(rows__gt=1)
+        .order_by()
+    )
+    for group in duplicates:
+        DailyRollup.objects.filter(pk=group['keep']).update(
+            income=group['total_income'],
+            expense=group['total_expense'],
+            count=group['total_count'],
+            expense_count=group['total_expense_count'],
+        )
+        DailyRollup.objects.filter(
+            user_id=group['user_id'],
+            day=group['day'],
+            category__isnull=True,
+            emotional_trigger=group['emotional_trigger'],
+        ).exclude(pk=group['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_sync_tracking'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_uncategorized_buckets, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='dailyrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('category__isnull', True)), fields=('user', 'day', 'emotional_trigger'), name='unique_daily_rollup_uncategorized'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.1.7 on 2026-10-18 11:02
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def populate_income_count(apps, schema_editor):
+    Transaction = apps.get_model('core', 'Transaction')
+    DailyRollup = apps.get_model('core', 'DailyRollup')
+
+    incomes = (
+        Transaction.objects
+        .annotate(trigger=Coalesce('emotional_trigger', Value('')))
+        .filter(
+            user_id=OuterRef('user_id'),
+            date=OuterRef('day'),
+            trigger=OuterRef('emotional_trigger'),
+            value__gt=0,
+        )
+        .order_by()
+        .values('user_id')
+        .annotate(total=Count('id'))
+        .values('total')
+    )
+    # Baldes sem categoria à parte: NULL = NULL não casa na subconsulta
+    DailyRollup.objects.filter(category__isnull=False).update(
+        income_count=Coalesce(Subquery(incomes.filter(category_id=OuterRef('category_id'))), 0)
+    )
+    DailyRollup.objects.filter(category__isnull=True).update(
+        income_count=Coalesce(Subquery(incomes.filter(category__isnull=True)), 0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_rollup_uncategorized_bucket'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailyrollup',
+            name='income_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(populate_income_count, migrations.RunPython.noop),
+    ]
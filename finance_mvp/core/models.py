@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction as db_transaction
 from django.contrib.auth.models import User
 from django.db.models import UniqueConstraint, Q
 import datetime
@@ -7,9 +7,34 @@ import datetime
 
 from django.contrib.auth.models import User
 
+class StatelessUser(User):
+    """
+    Usuário montado a partir das claims do JWT e do status em cache, sem ler a
+    linha de auth_user (core/authentication.py). Só id, username e os flags
+    is_active/is_staff/is_superuser são preenchidos, por isso não pode ser salvo.
+    """
+
+    class Meta:
+        proxy = True
+
+    def save(self, *args, **kwargs):
+        raise TypeError("StatelessUser não pode ser salvo; carregue o User do banco.")
+
+    def delete(self, *args, **kwargs):
+        raise TypeError("StatelessUser não pode ser removido; carregue o User do banco.")
+
+
 class Category(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     name = models.CharField(max_length=100)
+    # Última alteração, para o sync incremental (core/sync.py)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'name'], name='core_category_user_name_idx'),
+            models.Index(fields=['user', 'updated_at'], name='core_category_user_updated_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.user.username})"
@@ -47,5 +72,254 @@ class Transaction (models.Model):
         blank = True
     )
 
+    # Última alteração, para o sync incremental (core/sync.py). Escritas em
+    # lote (bulk_update, update, COPY) precisam preencher o campo elas mesmas.
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Listagem (ordenada por -date) e filtros por período
+            models.Index(fields=['user', '-date', '-id'], name='core_txn_user_date_idx'),
+            # Sync incremental: alterações de um usuário desde um instante
+            models.Index(fields=['user', 'updated_at', 'id'], name='core_txn_user_updated_idx'),
+            # Índices parciais para as consultas de despesas e receitas; `value`
+            # fica no índice para que as somas não precisem ler a tabela
+            models.Index(
+                fields=['user', 'date', 'value'],
+                condition=Q(value__lt=0),
+                name='core_txn_user_expense_idx'
+            ),
+            models.Index(
+                fields=['user', 'date', 'value'],
+                condition=Q(value__gt=0),
+                name='core_txn_user_income_idx'
+            ),
+        ]
+
     def __str__(self):
         return f"{self.user.username} - {self.value} ({self.date})"
+
+    def save(self, *args, **kwargs):
+        # Garante que o agregado diário (DailyRollup) seja atualizado na mesma
+        # transação do banco que a escrita da transação (ver core/signals.py)
+        with db_transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with db_transaction.atomic():
+            return super().delete(*args, **kwargs)
+
+
+class DailyRollup(models.Model):
+    """
+    Agregado diário das transações de um usuário por categoria e gatilho emocional.
+
+    Mantido incrementalmente a cada escrita em Transaction (core/rollups.py) e
+    usado pelas views de relatório no lugar das transações brutas.
+    `emotional_trigger` vazio representa transações sem gatilho. `count` conta
+    todas as transações do balde, `expense_count` só as despesas e
+    `income_count` só as receitas (valor positivo; transações de valor zero
+    entram apenas em `count`).
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    day = models.DateField()
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True
+    )
+    emotional_trigger = models.CharField(max_length=30, blank=True, default='')
+
+    income = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    expense = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.IntegerField(default=0)
+    expense_count = models.IntegerField(default=0)
+    income_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(
+                fields=['user', 'day', 'category', 'emotional_trigger'],
+                name='unique_daily_rollup_bucket'
+            ),
+            # Na constraint acima NULLs são distintos e não impedem baldes "Sem
+            # Categoria" repetidos. Índice parcial em vez de nulls_distinct=False,
+            # que o SQLite ignora e que exige PostgreSQL 15
+            UniqueConstraint(
+                fields=['user', 'day', 'emotional_trigger'],
+                condition=Q(category__isnull=True),
+                name='unique_daily_rollup_uncategorized'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.day} ({self.count})"
+
+
+class Budget(models.Model):
+    """
+    Limite de gastos de um usuário em um mês, para uma categoria ou, com
+    `category` nulo, para todas as despesas do mês.
+
+    `spent` é o total gasto no mês (positivo), mantido incrementalmente a cada
+    escrita em Transaction (core/budgets.py), para que a verificação do limite
+    não precise somar as transações.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True
+    )
+    amount_limit = models.DecimalField(max_digits=10, decimal_places=2)
+    month = models.IntegerField()
+    year = models.IntegerField()
+    spent = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(fields=['user', 'category', 'year', 'month'], name='unique_budget'),
+            # NULL não conflita com NULL na restrição acima
+            UniqueConstraint(
+                fields=['user', 'year', 'month'],
+                condition=Q(category__isnull=True),
+                name='unique_general_budget'
+            ),
+        ]
+
+    def __str__(self):
+        name = self.category.name if self.category_id else 'Geral'
+        return f"{name} - {self.month:02d}/{self.year} ({self.user.username}): {self.amount_limit}"
+
+
+class BalanceCheckpoint(models.Model):
+    """
+    Saldo de abertura de um mês: soma de todas as transações do usuário com
+    data anterior a `month` (sempre o dia 1). Calculado sob demanda e apagado
+    quando uma escrita altera um dia anterior ao mês (core/balances.py).
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    month = models.DateField()
+    balance = models.DecimalField(max_digits=16, decimal_places=2)
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(fields=['user', 'month'], name='unique_balance_checkpoint'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.month}: {self.balance}"
+
+
+class MonthlySnapshot(models.Model):
+    """
+    Resumo de um mês fechado (anterior ao corrente) de um usuário: receitas,
+    despesas (negativas, como no DailyRollup) e número de transações. Gravado
+    pelo comando `snapshot_months` ou na primeira leitura e apagado quando uma
+    escrita altera o mês (core/snapshots.py).
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    month = models.DateField()
+    income = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    expense = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(fields=['user', 'month'], name='unique_monthly_snapshot'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.month:%m/%Y}: {self.income + self.expense}"
+
+
+class ChangeWatermark(models.Model):
+    """
+    Marca d'água de alterações por usuário: `version` é incrementada a cada
+    escrita em Transaction/Category e serve de ETag/Last-Modified (core/watermarks.py).
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True)
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.user_id} v{self.version}"
+
+
+class Tombstone(models.Model):
+    """
+    Registro da exclusão de uma Transaction ou Category, para que o sync
+    incremental (core/sync.py) avise os clientes. Apagado depois de
+    SYNC_TOMBSTONE_DAYS dias pelo comando `prune_tombstones`.
+    """
+    TRANSACTION = 'transaction'
+    CATEGORY = 'category'
+    MODEL_CHOICES = [
+        (TRANSACTION, 'Transação'),
+        (CATEGORY, 'Categoria'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    model = models.CharField(max_length=20, choices=MODEL_CHOICES)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'deleted_at'], name='core_tombstone_user_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.model} #{self.object_id} ({self.deleted_at:%d/%m/%Y %H:%M})"
+
+
+class Job(models.Model):
+    """
+    Tarefa em background da fila guardada no banco (core/jobs.py), executada
+    pelo comando `run_workers`. `attempts` conta as execuções iniciadas;
+    `locked_until` é o prazo da execução atual, depois do qual outro worker
+    considera o job abandonado.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Na fila'),
+        (RUNNING, 'Em execução'),
+        (SUCCEEDED, 'Concluído'),
+        (FAILED, 'Falhou'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
+    task = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+
+    progress = models.PositiveSmallIntegerField(default=0)
+    message = models.CharField(max_length=200, blank=True, default='')
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    timeout = models.PositiveIntegerField(default=600)
+
+    run_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    worker = models.CharField(max_length=100, blank=True, default='')
+
+    class Meta:
+        indexes = [
+            # Busca dos jobs prontos (status = queued, run_at <= agora) e dos abandonados
+            models.Index(fields=['status', 'run_at'], name='core_job_status_run_at_idx'),
+            models.Index(fields=['user', '-id'], name='core_job_user_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.task} #{self.pk} ({self.status})"
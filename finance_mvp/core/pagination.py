@@ -0,0 +1,210 @@
+"""
+Paginação da listagem de transações.
+
+O modo padrão continua sendo o PageNumberPagination global. Dois modos
+opcionais evitam o custo que cresce com o histórico do usuário:
+
+* ?cursor=... (ou ?pagination=cursor): paginação por chave (keyset) em
+  (date, id), sem COUNT(*) e sem OFFSET;
+* ?count=estimate: paginação por número de página com contagem limitada
+  (ou estimada pelo planejador no PostgreSQL).
+"""
+import base64
+import binascii
+import datetime
+import json
+
+from django.core.paginator import Paginator, Page, InvalidPage
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def _field(item, name):
+    # Aceita instâncias de modelo ou dicionários vindos de .values()
+    return item[name] if isinstance(item, dict) else getattr(item, name)
+
+
+def estimate_count(queryset):
+    """Estimativa de linhas do planejador do PostgreSQL (None nos demais bancos)."""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPage(Page):
+    def has_next(self):
+        return self.has_more
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator que nunca roda um COUNT(*) completo: conta no máximo `count_cap`
+    linhas e, acima disso, usa a estimativa do banco. Se há próxima página é
+    decidido buscando uma linha a mais.
+    """
+    count_cap = 1000
+
+    @cached_property
+    def count(self):
+        # A ordem não muda a contagem limitada e obrigaria a ordenar todas as linhas
+        capped = self.object_list.order_by()[:self.count_cap + 1].count()
+        if capped <= self.count_cap:
+            self.count_is_exact = True
+            return capped
+        self.count_is_exact = False
+        return max(estimate_count(self.object_list) or 0, capped)
+
+    def validate_number(self, number):
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise InvalidPage('Página inválida.')
+        if number < 1:
+            raise InvalidPage('Página inválida.')
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise InvalidPage('Página vazia.')
+        page = EstimatedCountPage(rows[:self.per_page], number, self)
+        page.has_more = len(rows) > self.per_page
+        return page
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginação por chave em (date, id) decrescentes. O cursor codifica a última
+    posição vista e a direção; cada página é uma busca por intervalo no índice
+    (user, -date, -id), com custo constante em qualquer profundidade.
+    """
+    cursor_query_param = 'cursor'
+
+    def __init__(self, page_size):
+        self.page_size = page_size
+
+    def encode_cursor(self, direction, item):
+        raw = f"{direction}:{_field(item, 'date').isoformat()}:{_field(item, 'id')}"
+        cursor = base64.urlsafe_b64encode(raw.encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            direction, day, pk = base64.urlsafe_b64decode(encoded.encode()).decode().split(':')
+            if direction not in ('n', 'p'):
+                raise ValueError(direction)
+            return direction, datetime.date.fromisoformat(day), int(pk)
+        except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+            raise NotFound('Cursor inválido.')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        cursor = self.decode_cursor(request)
+
+        if cursor is None:
+            direction = 'n'
+            rows = list(queryset.order_by('-date', '-id')[:self.page_size + 1])
+        elif cursor[0] == 'n':
+            direction, day, pk = cursor
+            rows = list(
+                queryset
+                .filter(Q(date__lt=day) | Q(date=day, id__lt=pk), date__lte=day)
+                .order_by('-date', '-id')[:self.page_size + 1]
+            )
+        else:
+            direction, day, pk = cursor
+            rows = list(
+                queryset
+                .filter(Q(date__gt=day) | Q(date=day, id__gt=pk), date__gte=day)
+                .order_by('date', 'id')[:self.page_size + 1]
+            )
+
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if direction == 'p':
+            rows.reverse()
+            self.has_next = cursor is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = cursor is not None
+
+        self.rows = rows
+        return rows
+
+    def get_next_link(self):
+        if not (self.has_next and self.rows):
+            return None
+        return self.encode_cursor('n', self.rows[-1])
+
+    def get_previous_link(self):
+        if not (self.has_previous and self.rows):
+            return None
+        return self.encode_cursor('p', self.rows[0])
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+
+class TransactionPagination(PageNumberPagination):
+    """
+    PageNumberPagination padrão, com os modos opcionais de cursor
+    (?cursor= ou ?pagination=cursor) e de contagem estimada (?count=estimate).
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        self.estimated = request.query_params.get('count') == 'estimate'
+
+        if 'cursor' in request.query_params or request.query_params.get('pagination') == 'cursor':
+            self.keyset = KeysetPagination(self.get_page_size(request))
+            return self.keyset.paginate_queryset(queryset, request, view)
+
+        self.django_paginator_class = EstimatedCountPaginator if self.estimated else Paginator
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        response = super().get_paginated_response(data)
+        if self.estimated:
+            response.data['count_is_exact'] = self.page.paginator.count_is_exact
+        return response
+
+
+class SearchPagination(PageNumberPagination):
+    """
+    Paginação dos resultados da busca, que vêm ordenados por relevância: por
+    número de página, com a contagem limitada do EstimatedCountPaginator.
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    django_paginator_class = EstimatedCountPaginator
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        response.data['count_is_exact'] = self.page.paginator.count_is_exact
+        return response
@@ -0,0 +1,221 @@
+"""
+Motor de pivot dos relatórios (reports/pivot/).
+
+Agrupa os agregados diários (DailyRollup) por qualquer combinação das dimensões
+category, emotional_trigger, sign e uma granularidade de tempo (day, week ou
+month), calculando as medidas sum, count e avg em uma única consulta agrupada.
+A dimensão sign separa receitas e despesas de cada grupo a partir das colunas
+income/expense e income_count/expense_count do agregado, sem consulta extra.
+Transações de valor zero entram no total sem sign, mas não em income nem
+expense.
+
+O resultado é colunar: uma lista por dimensão e por medida, todas do mesmo
+tamanho. Despesas aparecem com valor negativo.
+"""
+import datetime
+from decimal import Decimal
+
+from django.db.models import Q, Sum
+from django.db.models.functions import TruncDay, TruncWeek, TruncMonth
+
+from .models import DailyRollup
+
+
+TIME_DIMENSIONS = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+DIMENSIONS = ('category', 'emotional_trigger', 'sign', *TIME_DIMENSIONS)
+MEASURES = ('sum', 'count', 'avg')
+SIGNS = ('income', 'expense')
+NONE = 'none'
+
+UNCATEGORIZED = 'Sem Categoria'
+CENTS = Decimal('0.01')
+
+
+class PivotError(ValueError):
+    pass
+
+
+def _list(params, name):
+    # Aceita ?x=a,b e ?x=a&x=b
+    values = []
+    for raw in params.getlist(name):
+        values.extend(value.strip() for value in raw.split(',') if value.strip())
+    return values
+
+
+def _date(raw, name):
+    try:
+        return datetime.datetime.strptime(raw, '%Y-%m-%d').date()
+    except ValueError:
+        raise PivotError(f'Data inválida em {name}: use YYYY-MM-DD.')
+
+
+def parse_params(params):
+    """Converte os parâmetros da requisição nos argumentos de `pivot`."""
+    dimensions = _list(params, 'dimensions')
+    measures = _list(params, 'measures') or ['sum']
+
+    unknown = [name for name in dimensions if name not in DIMENSIONS]
+    if unknown:
+        raise PivotError(f"Dimensão inválida: {', '.join(unknown)}. Use {', '.join(DIMENSIONS)}.")
+    if len(set(dimensions)) != len(dimensions):
+        raise PivotError('Dimensões repetidas.')
+    if len([name for name in dimensions if name in TIME_DIMENSIONS]) > 1:
+        raise PivotError('Use no máximo uma granularidade de tempo (day, week ou month).')
+
+    unknown = [name for name in measures if name not in MEASURES]
+    if unknown:
+        raise PivotError(f"Medida inválida: {', '.join(unknown)}. Use {', '.join(MEASURES)}.")
+
+    start = _date(params['start'], 'start') if params.get('start') else None
+    end = _date(params['end'], 'end') if params.get('end') else None
+    if start and end and start >= end:
+        raise PivotError('start deve ser anterior a end.')
+
+    categories = []
+    for value in _list(params, 'category'):
+        if value == NONE:
+            categories.append(None)
+            continue
+        try:
+            categories.append(int(value))
+        except ValueError:
+            raise PivotError(f'Categoria inválida: {value!r}.')
+
+    triggers = ['' if value == NONE else value for value in _list(params, 'emotional_trigger')]
+
+    sign = params.get('sign') or None
+    if sign is not None and sign not in SIGNS:
+        raise PivotError('sign deve ser income ou expense.')
+
+    top = None
+    if params.get('top'):
+        try:
+            top = int(params['top'])
+        except ValueError:
+            top = 0
+        if top < 1:
+            raise PivotError('top deve ser um inteiro positivo.')
+
+    sort = params.get('sort') or measures[0]
+    if sort not in measures:
+        raise PivotError('sort deve ser uma das medidas pedidas.')
+
+    return {
+        'dimensions': dimensions,
+        'measures': measures,
+        'start': start,
+        'end': end,
+        'categories': categories,
+        'triggers': triggers,
+        'sign': sign,
+        'top': top,
+        'sort': sort,
+    }
+
+
+def pivot(user, dimensions, measures, start=None, end=None, categories=(), triggers=(),
+          sign=None, top=None, sort=None):
+    """
+    Calcula o cubo pedido para o usuário. `end` é exclusivo; `categories` aceita
+    None (sem categoria) e `triggers` aceita '' (sem gatilho). Com `top`, só os
+    N grupos de maior valor absoluto de `sort` são retornados.
+    """
+    queryset = DailyRollup.objects.filter(user=user)
+    if start:
+        queryset = queryset.filter(day__gte=start)
+    if end:
+        queryset = queryset.filter(day__lt=end)
+    if categories:
+        condition = Q(category_id__in=[pk for pk in categories if pk is not None])
+        if None in categories:
+            condition |= Q(category__isnull=True)
+        queryset = queryset.filter(condition)
+    if triggers:
+        queryset = queryset.filter(emotional_trigger__in=triggers)
+    if sign == 'expense':
+        queryset = queryset.filter(expense_count__gt=0)
+    elif sign == 'income':
+        queryset = queryset.filter(income_count__gt=0)
+
+    group_by = []
+    time_dimension = next((name for name in dimensions if name in TIME_DIMENSIONS), None)
+    if time_dimension:
+        queryset = queryset.annotate(period=TIME_DIMENSIONS[time_dimension]('day'))
+        group_by.append('period')
+    if 'category' in dimensions:
+        group_by += ['category_id', 'category__name']
+    if 'emotional_trigger' in dimensions:
+        group_by.append('emotional_trigger')
+
+    totals = {
+        'income_total': Sum('income'),
+        'expense_total': Sum('expense'),
+        'count_total': Sum('count'),
+        'expense_count_total': Sum('expense_count'),
+        'income_count_total': Sum('income_count'),
+    }
+    if group_by:
+        rows = queryset.values(*group_by).annotate(**totals).order_by(*group_by)
+    else:
+        row = queryset.aggregate(**totals)
+        rows = [row] if row['count_total'] else []
+
+    if sign:
+        signs = [sign]
+    elif 'sign' in dimensions:
+        signs = list(SIGNS)
+    else:
+        signs = [None]
+
+    records = []
+    for row in rows:
+        for row_sign in signs:
+            if row_sign is None:
+                total = row['income_total'] + row['expense_total']
+                count = row['count_total']
+            elif row_sign == 'income':
+                total = row['income_total']
+                count = row['income_count_total']
+            else:
+                total = row['expense_total']
+                count = row['expense_count_total']
+            if not count:
+                continue
+            records.append({
+                **row,
+                'sign': row_sign,
+                'sum': total,
+                'count': count,
+                'avg': (total / count).quantize(CENTS),
+            })
+
+    if top:
+        sort = sort or measures[0]
+        records.sort(key=lambda record: abs(record[sort]), reverse=True)
+        records = records[:top]
+
+    columns = {}
+    for name in dimensions:
+        if name in TIME_DIMENSIONS:
+            columns[name] = [record['period'] for record in records]
+        elif name == 'category':
+            columns['category'] = [record['category_id'] for record in records]
+            columns['category_name'] = [record['category__name'] or UNCATEGORIZED for record in records]
+        elif name == 'emotional_trigger':
+            columns[name] = [record['emotional_trigger'] or None for record in records]
+        else:
+            columns[name] = [record['sign'] for record in records]
+    for name in measures:
+        columns[name] = [record[name] for record in records]
+
+    return {
+        'dimensions': dimensions,
+        'measures': measures,
+        'rows': len(records),
+        'columns': columns,
+    }
@@ -0,0 +1,96 @@
+"""
+Renderers da API.
+
+`FastJSONRenderer` é o renderer JSON padrão (REST_FRAMEWORK em settings.py):
+gera o mesmo JSON do JSONRenderer do DRF, mas com o orjson (só a grafia de
+floats muito grandes muda: 1e16 em vez de 1e+16). Os tipos que o orjson não
+conhece (Decimal, lazy strings) passam pelo encoder do DRF, então Decimal
+continua virando número, e as datas saem no mesmo formato ISO 8601. Sem o
+orjson instalado, ou quando ele não consegue (inteiro acima de 64 bits, chave
+que não é string, indentação pedida no Accept), a resposta sai pelo próprio
+JSONRenderer do DRF.
+
+`MessagePackRenderer` responde `Accept: application/msgpack` (ou
+?format=msgpack) quando o pacote msgpack está instalado, com os mesmos valores
+do JSON.
+
+A exportação de transações devolve um StreamingHttpResponse montado na própria
+view; CSVRenderer e NDJSONRenderer existem para que a negociação de conteúdo do
+DRF aceite ?format=csv|ndjson e para formatar eventuais respostas de erro.
+"""
+import json
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+# Conversão dos tipos não nativos, a mesma do JSONRenderer do DRF
+encode_default = JSONEncoder().default
+
+
+def dumps(data):
+    """JSON compacto em bytes, igual ao do JSONRenderer do DRF (orjson se instalado)."""
+    return FastJSONRenderer().render(data)
+
+
+class FastJSONRenderer(JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if orjson is None or self.ensure_ascii or not self.compact or indent is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            # Com OPT_UTC_Z as datas saem como no DRF (isoformat, 'Z' no UTC)
+            ret = orjson.dumps(data, default=encode_default, option=orjson.OPT_UTC_Z)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Como o DRF, escapa U+2028 e U+2029 para o JSON ser JavaScript válido
+        if b'\xe2\x80' in ret:
+            ret = ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+        return ret
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=encode_default, use_bin_type=True, datetime=False)
+
+
+class CSVRenderer(BaseRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            return '\n'.join(f'{key},{value}' for key, value in data.items()).encode(self.charset)
+        return str(data or '').encode(self.charset)
+
+
+class NDJSONRenderer(BaseRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return (json.dumps(data, ensure_ascii=False, default=str) + '\n').encode(self.charset)
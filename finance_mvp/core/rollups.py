@@ -0,0 +1,213 @@
+"""
+Manutenção do agregado diário (DailyRollup) usado pelos relatórios.
+
+Cada escrita em Transaction aplica um delta no balde
+(user, day, category, emotional_trigger) correspondente; `refresh_days` e
+`rebuild` recalculam os baldes a partir das transações brutas para os
+caminhos que não passam pelos signals (bulk, imports, correções manuais).
+"""
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction as db_transaction
+from django.db.models import Sum, Count, Case, When, F, Q, Value, DecimalField
+from django.db.models.functions import Coalesce
+
+from . import balances, budgets, snapshots, watermarks
+from .models import Transaction, DailyRollup
+
+
+ZERO = Decimal('0.00')
+# (income, expense, count, expense_count, income_count) de um balde vazio
+EMPTY = (ZERO, ZERO, 0, 0, 0)
+
+_date_field = Transaction._meta.get_field('date')
+_value_field = Transaction._meta.get_field('value')
+
+
+def bucket_for(user_id, day, category_id, emotional_trigger):
+    return (user_id, _date_field.to_python(day), category_id, emotional_trigger or '')
+
+
+def split_value(value):
+    """Separa o valor de uma transação em (receita, despesa)."""
+    value = _value_field.to_python(value)
+    if value < 0:
+        return ZERO, value
+    return value, ZERO
+
+
+def apply_delta(bucket, income, expense, count, expense_count, income_count):
+    """
+    Soma (income, expense, count, expense_count, income_count) ao balde
+    informado, criando ou removendo a linha quando necessário. Deve ser chamado
+    dentro de uma transação.
+
+    A linha do balde fica travada (select_for_update) até o commit. Se duas
+    escritas tentam criar o mesmo balde ao mesmo tempo, a perdedora recebe
+    IntegrityError da constraint única e atualiza a linha criada pela outra.
+    """
+    user_id, day, category_id, emotional_trigger = bucket
+    lookup = DailyRollup.objects.filter(
+        user_id=user_id,
+        day=day,
+        category_id=category_id,
+        emotional_trigger=emotional_trigger,
+    ).select_for_update().values_list('pk', 'count')
+    row = lookup.first()
+
+    if row is None:
+        # Nada a decrementar (ex: o balde já foi removido em cascata)
+        if count <= 0:
+            return
+        try:
+            with db_transaction.atomic():
+                DailyRollup.objects.create(
+                    user_id=user_id,
+                    day=day,
+                    category_id=category_id,
+                    emotional_trigger=emotional_trigger,
+                    income=income,
+                    expense=expense,
+                    count=count,
+                    expense_count=expense_count,
+                    income_count=income_count,
+                )
+            return
+        except IntegrityError:
+            # Criado por uma escrita concorrente
+            row = lookup.first()
+            if row is None:
+                raise
+
+    pk, current_count = row
+    if current_count + count <= 0:
+        DailyRollup.objects.filter(pk=pk).delete()
+    else:
+        DailyRollup.objects.filter(pk=pk).update(
+            income=F('income') + income,
+            expense=F('expense') + expense,
+            count=F('count') + count,
+            expense_count=F('expense_count') + expense_count,
+            income_count=F('income_count') + income_count,
+        )
+
+
+def apply_transaction(user_id, day, category_id, emotional_trigger, value, sign=1):
+    """Aplica (sign=1) ou remove (sign=-1) uma transação do agregado."""
+    income, expense = split_value(value)
+    bucket = bucket_for(user_id, day, category_id, emotional_trigger)
+    balances.invalidate(user_id, bucket[1])
+    snapshots.invalidate(user_id, [bucket[1]])
+    if expense < 0:
+        budgets.apply_expense(user_id, bucket[1], category_id, -expense * sign)
+    apply_delta(
+        bucket,
+        income * sign,
+        expense * sign,
+        sign,
+        sign if expense < 0 else 0,
+        sign if income > 0 else 0,
+    )
+
+
+def aggregate_transactions(queryset):
+    """Agrupa um queryset de Transaction nos mesmos baldes do DailyRollup."""
+    return (
+        queryset
+        .annotate(trigger=Coalesce('emotional_trigger', Value('')))
+        .values('user_id', 'date', 'category_id', 'trigger')
+        .annotate(
+            income_total=Coalesce(
+                Sum(Case(When(value__gt=0, then=F('value')), default=Value(0), output_field=DecimalField())),
+                Value(0), output_field=DecimalField()
+            ),
+            expense_total=Coalesce(
+                Sum(Case(When(value__lt=0, then=F('value')), default=Value(0), output_field=DecimalField())),
+                Value(0), output_field=DecimalField()
+            ),
+            total_count=Count('id'),
+            expense_count=Count('id', filter=Q(value__lt=0)),
+            income_count=Count('id', filter=Q(value__gt=0)),
+        )
+        .order_by()
+    )
+
+
+def _rollups_from(queryset):
+    return [
+        DailyRollup(
+            user_id=item['user_id'],
+            day=item['date'],
+            category_id=item['category_id'],
+            emotional_trigger=item['trigger'],
+            income=item['income_total'],
+            expense=item['expense_total'],
+            count=item['total_count'],
+            expense_count=item['expense_count'],
+            income_count=item['income_count'],
+        )
+        for item in aggregate_transactions(queryset)
+    ]
+
+
+def refresh_days(user_id, days):
+    """Recalcula os baldes de um usuário para os dias informados."""
+    days = {_date_field.to_python(day) for day in days}
+    if not days:
+        return
+    with db_transaction.atomic():
+        DailyRollup.objects.filter(user_id=user_id, day__in=days).delete()
+        DailyRollup.objects.bulk_create(
+            _rollups_from(Transaction.objects.filter(user_id=user_id, date__in=days)),
+            batch_size=1000,
+        )
+        balances.invalidate(user_id, min(days))
+        snapshots.invalidate(user_id, days)
+        budgets.refresh(user_id, days)
+        watermarks.touch(user_id)
+
+
+def rebuild(user_ids, batch_size=1000):
+    """Reconstrói do zero o agregado dos usuários informados."""
+    for user_id in user_ids:
+        with db_transaction.atomic():
+            DailyRollup.objects.filter(user_id=user_id).delete()
+            DailyRollup.objects.bulk_create(
+                _rollups_from(Transaction.objects.filter(user_id=user_id)),
+                batch_size=batch_size,
+            )
+            balances.clear(user_id)
+            snapshots.clear(user_id)
+            budgets.refresh(user_id)
+            watermarks.touch(user_id)
+
+
+def find_drift(user_id):
+    """
+    Compara o agregado de um usuário com as transações brutas.
+    Retorna a lista de baldes divergentes como (bucket, esperado, atual).
+    """
+    expected = {
+        (item['user_id'], item['date'], item['category_id'], item['trigger']):
+            (item['income_total'], item['expense_total'], item['total_count'], item['expense_count'],
+             item['income_count'])
+        for item in aggregate_transactions(Transaction.objects.filter(user_id=user_id))
+    }
+
+    actual = {}
+    rows = DailyRollup.objects.filter(user_id=user_id).values_list(
+        'user_id', 'day', 'category_id', 'emotional_trigger', 'income', 'expense', 'count', 'expense_count',
+        'income_count',
+    )
+    for user, day, category_id, trigger, *totals in rows:
+        key = (user, day, category_id, trigger)
+        previous = actual.get(key, EMPTY)
+        actual[key] = tuple(total + value for total, value in zip(previous, totals))
+
+    drift = []
+    for key in expected.keys() | actual.keys():
+        want = expected.get(key, EMPTY)
+        got = actual.get(key, EMPTY)
+        if want != got:
+            drift.append((key, want, got))
+    return drift
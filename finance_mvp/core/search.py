@@ -0,0 +1,79 @@
+"""
+Busca textual na descrição das transações (filtro ?search= e transactions/search/).
+
+No PostgreSQL a busca combina o full-text em português (tsvector, com
+websearch_to_tsquery) com a similaridade de palavras por trigramas (pg_trgm), que
+acha termos com erros de digitação ("uber" em "UBER *TRIP", "mercdo" em
+"Mercado"). As duas expressões têm índices GIN com o user_id na frente
+(btree_gin), criados na migração 0010, então a busca lê só as linhas do
+usuário que casam. A relevância é ts_rank + word_similarity.
+
+No SQLite (desenvolvimento) a busca usa a tabela FTS5 core_transaction_fts,
+mantida por triggers, com casamento por prefixo de cada termo e relevância
+pelo bm25. Nos demais bancos cai em icontains, sem relevância.
+"""
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+
+TEXT_SEARCH_CONFIG = 'portuguese'
+FTS_TABLE = 'core_transaction_fts'
+MAX_QUERY_LENGTH = 200
+
+_tsvector = f"to_tsvector('{TEXT_SEARCH_CONFIG}', coalesce(\"core_transaction\".\"description\", ''))"
+_tsquery = f"websearch_to_tsquery('{TEXT_SEARCH_CONFIG}', %s)"
+
+_terms = re.compile(r'\w+', re.UNICODE)
+
+
+def normalize(text):
+    return ' '.join((text or '').split())[:MAX_QUERY_LENGTH]
+
+
+def fts5_query(text):
+    """Termos da busca como prefixos entre aspas (sem operadores do FTS5)."""
+    return ' '.join(f'"{term}"*' for term in _terms.findall(text))
+
+
+def search(queryset, text):
+    """
+    Filtra um queryset de Transaction pelo texto e anota `rank` (maior = mais
+    relevante). Não altera a ordenação.
+    """
+    text = normalize(text)
+    vendor = connections[queryset.db].vendor
+
+    if vendor == 'postgresql':
+        condition = RawSQL(
+            f'({_tsvector} @@ {_tsquery} OR %s <%% "core_transaction"."description")',
+            (text, text),
+            output_field=BooleanField(),
+        )
+        rank = RawSQL(
+            f'ts_rank({_tsvector}, {_tsquery}) + word_similarity(%s, coalesce("core_transaction"."description", \'\'))',
+            (text, text),
+            output_field=FloatField(),
+        )
+        return queryset.filter(condition).annotate(rank=rank)
+
+    if vendor == 'sqlite':
+        match = fts5_query(text)
+        if not match:
+            return queryset.none().annotate(rank=Value(0.0, output_field=FloatField()))
+        # Junção com a tabela FTS5 partindo do MATCH. O `+ 0` impede o
+        # planejador de inverter a junção (varrer as transações do usuário e
+        # refazer a busca por rowid em cada uma), o que acontece no COUNT(*).
+        return queryset.extra(
+            tables=[FTS_TABLE],
+            where=[f'"core_transaction"."id" = {FTS_TABLE}.rowid + 0', f'{FTS_TABLE} MATCH %s'],
+            params=[match],
+            select={'rank': f'-bm25({FTS_TABLE})'},
+        )
+
+    condition = Q()
+    for term in text.split():
+        condition &= Q(description__icontains=term)
+    return queryset.filter(condition).annotate(rank=Value(0.0, output_field=FloatField()))
@@ -1,6 +1,11 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Transaction, Category
+import calendar
+import datetime
+
+from .models import Transaction, Category, Budget, Job
+from .pivot import PivotError, parse_params as parse_pivot_params
+from .tasks import query_dict
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -46,4 +51,142 @@ class TransactionSerializer (serializers.ModelSerializer):
         fields = ['id', 'value', 'date', 'description', 'category', 'category_name', 'emotional_trigger']
         read_only_fields= ['id']
 
-        
+
+class BudgetSerializer(serializers.ModelSerializer):
+    """
+    Orçamento mensal. `category` nulo limita todas as despesas do mês; `spent`
+    vem do total mantido incrementalmente (core/budgets.py).
+    """
+    category = serializers.PrimaryKeyRelatedField(
+        queryset=Category.objects.all(),
+        allow_null=True,
+        required=False
+    )
+    category_name = serializers.SerializerMethodField()
+    limit = serializers.DecimalField(source='amount_limit', max_digits=10, decimal_places=2, read_only=True)
+    month = serializers.IntegerField(min_value=1, max_value=12)
+    year = serializers.IntegerField(min_value=1900, max_value=9999)
+    start_date = serializers.SerializerMethodField()
+    end_date = serializers.SerializerMethodField()
+    remaining = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Budget
+        fields = [
+            'id', 'category', 'category_name', 'amount_limit', 'limit', 'month', 'year',
+            'start_date', 'end_date', 'spent', 'remaining',
+        ]
+        read_only_fields = ['id', 'spent']
+
+    def get_category_name(self, obj):
+        return obj.category.name if obj.category_id else 'Geral'
+
+    def get_start_date(self, obj):
+        return datetime.date(obj.year, obj.month, 1)
+
+    def get_end_date(self, obj):
+        return datetime.date(obj.year, obj.month, calendar.monthrange(obj.year, obj.month)[1])
+
+    def get_remaining(self, obj):
+        return self.fields['spent'].to_representation(obj.amount_limit - obj.spent)
+
+    def validate_amount_limit(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("O limite deve ser maior que zero.")
+        return value
+
+    def validate(self, attrs):
+        user = self.context['request'].user
+        category = attrs.get('category', getattr(self.instance, 'category', None))
+        if category is not None and category.user_id != user.pk:
+            raise serializers.ValidationError({'category': "Categoria não encontrada."})
+
+        year = attrs.get('year', getattr(self.instance, 'year', None))
+        month = attrs.get('month', getattr(self.instance, 'month', None))
+        existing = Budget.objects.filter(user=user, category=category, year=year, month=month)
+        if self.instance is not None:
+            existing = existing.exclude(pk=self.instance.pk)
+        if existing.exists():
+            raise serializers.ValidationError({"error": "Já existe um orçamento para esta categoria neste mês."})
+        return attrs
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """
+    Job em background (core/jobs.py). Na criação só `task` e `payload` são
+    informados; os demais campos acompanham a execução.
+    """
+    # Tarefas que podem ser enfileiradas pela API (a importação usa transactions/import/)
+    API_TASKS = ['pivot', 'rebuild_rollups']
+
+    task = serializers.ChoiceField(choices=API_TASKS)
+    payload = serializers.DictField(required=False, default=dict)
+
+    class Meta:
+        model = Job
+        fields = [
+            'id', 'task', 'payload', 'status', 'progress', 'message', 'result', 'error',
+            'attempts', 'max_attempts', 'created_at', 'started_at', 'finished_at',
+        ]
+        read_only_fields = [
+            'id', 'status', 'progress', 'message', 'result', 'error',
+            'attempts', 'max_attempts', 'created_at', 'started_at', 'finished_at',
+        ]
+
+    def to_representation(self, instance):
+        # O caminho do arquivo enviado não é exposto
+        data = super().to_representation(instance)
+        data['payload'] = {name: value for name, value in data['payload'].items() if name != 'path'}
+        return data
+
+    def validate(self, attrs):
+        if attrs['task'] == 'pivot':
+            try:
+                parse_pivot_params(query_dict(attrs['payload']))
+            except PivotError as exc:
+                raise serializers.ValidationError({"error": str(exc)})
+        return attrs
+
+
+class TransactionBulkSerializer(serializers.ModelSerializer):
+    """
+    Item das operações em lote. A categoria chega como id e a posse dela é
+    validada na view para o lote inteiro (uma consulta por lote).
+    """
+    id = serializers.IntegerField(required=False)
+    category = serializers.IntegerField(allow_null=True, required=False)
+
+    class Meta:
+        model = Transaction
+        fields = ['id', 'value', 'date', 'description', 'category', 'emotional_trigger']
+
+
+class TransactionListSerializer:
+    """
+    Serialização da listagem de transações a partir de linhas de .values().
+
+    Os conversores dos campos são resolvidos uma única vez (reaproveitando os
+    campos do TransactionSerializer), evitando o maquinário do DRF por linha.
+    A saída é idêntica à do TransactionSerializer.
+    """
+    columns = ('id', 'value', 'date', 'description', 'category_id', 'category__name', 'emotional_trigger')
+
+    def __init__(self):
+        fields = TransactionSerializer().fields
+        self.value = fields['value'].to_representation
+        self.date = fields['date'].to_representation
+
+    def to_representation(self, row):
+        return {
+            'id': row['id'],
+            'value': self.value(row['value']),
+            'date': self.date(row['date']),
+            'description': row['description'],
+            'category': row['category_id'],
+            'category_name': row['category__name'],
+            'emotional_trigger': row['emotional_trigger'],
+        }
+
+    def serialize(self, rows):
+        to_representation = self.to_representation
+        return [to_representation(row) for row in rows]
@@ -0,0 +1,150 @@
+import threading
+from contextlib import contextmanager
+
+from django.db.models import QuerySet
+from django.db.models.signals import pre_save, post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from django.contrib.auth.models import User
+
+from .models import Transaction, Category, DailyRollup, Tombstone
+from . import authentication, rollups, sync, watermarks
+
+
+_state = threading.local()
+
+
+@contextmanager
+def bulk_write():
+    """
+    Desliga a manutenção linha a linha feita pelos signals de Transaction.
+    Quem usa é responsável por chamar rollups.refresh_days ao final do lote
+    (e sync.record_deleted, se apagar transações).
+    """
+    previous = getattr(_state, 'bulk', False)
+    _state.bulk = True
+    try:
+        yield
+    finally:
+        _state.bulk = previous
+
+
+def in_bulk_write():
+    return getattr(_state, 'bulk', False)
+
+
+def deleting_user(origin):
+    """
+    Indica se a exclusão veio em cascata da remoção do próprio usuário; nesse
+    caso agregados e marcas d'água também serão removidos e não devem ser
+    recriados pelos signals.
+    """
+    if isinstance(origin, QuerySet):
+        return origin.model is User
+    return isinstance(origin, User)
+
+
+@receiver(pre_save, sender=Transaction)
+def remember_previous_transaction(sender, instance, raw=False, **kwargs):
+    # Guarda o estado gravado antes da atualização para desfazê-lo no agregado
+    instance._rollup_previous = None
+    if raw or instance.pk is None or in_bulk_write():
+        return
+    instance._rollup_previous = (
+        Transaction.objects.select_for_update()
+        .filter(pk=instance.pk)
+        .values_list('user_id', 'date', 'category_id', 'emotional_trigger', 'value')
+        .first()
+    )
+
+
+@receiver(post_save, sender=Transaction)
+def update_rollup_on_save(sender, instance, raw=False, **kwargs):
+    if raw or in_bulk_write():
+        return
+    previous = getattr(instance, '_rollup_previous', None)
+    if previous is not None:
+        rollups.apply_transaction(*previous, sign=-1)
+    rollups.apply_transaction(
+        instance.user_id,
+        instance.date,
+        instance.category_id,
+        instance.emotional_trigger,
+        instance.value,
+    )
+    instance._rollup_previous = None
+
+
+@receiver(post_delete, sender=Transaction)
+def update_rollup_on_delete(sender, instance, origin=None, **kwargs):
+    if in_bulk_write() or deleting_user(origin):
+        return
+    rollups.apply_transaction(
+        instance.user_id,
+        instance.date,
+        instance.category_id,
+        instance.emotional_trigger,
+        instance.value,
+        sign=-1,
+    )
+
+
+@receiver(pre_delete, sender=Category)
+def merge_category_rollups(sender, instance, origin=None, **kwargs):
+    # As transações da categoria passam a ficar "Sem Categoria" (SET_NULL),
+    # então os baldes dela são somados aos baldes sem categoria.
+    if deleting_user(origin):
+        return
+    buckets = DailyRollup.objects.filter(category=instance).values_list(
+        'pk', 'user_id', 'day', 'emotional_trigger', 'income', 'expense', 'count', 'expense_count', 'income_count'
+    )
+    for pk, user_id, day, trigger, *totals in list(buckets):
+        DailyRollup.objects.filter(pk=pk).delete()
+        rollups.apply_delta((user_id, day, None, trigger), *totals)
+
+
+@receiver(pre_save, sender=Category)
+def remember_previous_category_name(sender, instance, raw=False, **kwargs):
+    instance._previous_name = None
+    if not raw and instance.pk is not None:
+        instance._previous_name = Category.objects.filter(pk=instance.pk).values_list('name', flat=True).first()
+
+
+@receiver(post_save, sender=Category)
+def touch_renamed_category_transactions(sender, instance, created=False, raw=False, **kwargs):
+    # As transações trazem category_name no sync, então mudam junto
+    previous = getattr(instance, '_previous_name', None)
+    if not raw and not created and previous is not None and previous != instance.name:
+        sync.touch_category_transactions(instance.pk)
+
+
+@receiver(pre_delete, sender=Category)
+def touch_deleted_category_transactions(sender, instance, origin=None, **kwargs):
+    # As transações ficam sem categoria (SET_NULL), sem passar pelo save()
+    if not deleting_user(origin):
+        sync.touch_category_transactions(instance.pk)
+
+
+@receiver(post_delete, sender=Transaction)
+@receiver(post_delete, sender=Category)
+def record_tombstone(sender, instance, origin=None, **kwargs):
+    if in_bulk_write() or deleting_user(origin):
+        return
+    model = Tombstone.TRANSACTION if sender is Transaction else Tombstone.CATEGORY
+    sync.record_deleted(instance.user_id, model, [instance.pk])
+
+
+@receiver(post_save, sender=Transaction)
+@receiver(post_delete, sender=Transaction)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def touch_watermark(sender, instance, raw=False, origin=None, **kwargs):
+    # Invalida o cache de relatórios e muda o ETag das respostas do usuário
+    if not raw and not in_bulk_write() and not deleting_user(origin):
+        watermarks.touch(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_cached_user_status(sender, instance, **kwargs):
+    # Desativações e mudanças de permissão valem na hora neste processo
+    authentication.forget_user(instance.pk)
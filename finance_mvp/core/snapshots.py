@@ -0,0 +1,169 @@
+"""
+Resumo mensal (receitas, despesas, saldo) dos meses fechados.
+
+Os meses anteriores ao corrente ficam em MonthlySnapshot: o comando
+`snapshot_months` grava à noite os que faltam, em paralelo por faixas de id de
+usuário, e uma leitura que não encontra o snapshot calcula os meses que faltam
+a partir do DailyRollup e grava os que têm transações; os meses sem
+transações só são preenchidos com zeros na resposta. Uma escrita em mês
+fechado apaga o snapshot dele (`invalidate`). Assim ler um mês fechado com
+movimentação é uma busca por chave.
+
+Quem grava snapshots compara a marca d'água dos usuários (ChangeWatermark)
+antes do cálculo e depois da gravação e apaga o que gravou para quem teve uma
+escrita no meio: um snapshot nunca fica com dados anteriores a ela.
+"""
+from decimal import Decimal
+
+from django.db import transaction as db_transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .balances import next_month
+from .models import ChangeWatermark, DailyRollup, MonthlySnapshot
+
+
+ZERO = Decimal('0.00')
+
+
+def current_month():
+    return timezone.now().date().replace(day=1)
+
+
+def month_range(start, end):
+    """Meses (dia 1) de `start` até antes de `end`."""
+    months = []
+    while start < end:
+        months.append(start)
+        start = next_month(start)
+    return months
+
+
+def invalidate(user_id, days):
+    """Apaga os snapshots dos meses fechados de `days`; repetido após o commit."""
+    until = current_month()
+    months = {day.replace(day=1) for day in days if day < until}
+    if not months:
+        return
+
+    def delete():
+        MonthlySnapshot.objects.filter(user_id=user_id, month__in=months).delete()
+
+    delete()
+    db_transaction.on_commit(delete)
+
+
+def clear(user_id):
+    MonthlySnapshot.objects.filter(user_id=user_id).delete()
+
+
+def monthly_totals(rollups):
+    """Receitas, despesas e contagem por (usuário, mês) de um queryset de DailyRollup."""
+    return (
+        rollups
+        .annotate(period=TruncMonth('day'))
+        .values('user_id', 'period')
+        .annotate(income_total=Sum('income'), expense_total=Sum('expense'), count_total=Sum('count'))
+        .order_by()
+    )
+
+
+def versions(watermarks):
+    return dict(watermarks.values_list('user_id', 'version'))
+
+
+def store(snapshots, watermarks, before):
+    """
+    Grava os snapshots novos e desfaz os dos usuários cuja marca d'água mudou
+    desde `before`. Devolve quantos ficaram gravados.
+    """
+    MonthlySnapshot.objects.bulk_create(snapshots, batch_size=1000, ignore_conflicts=True)
+    changed = {user_id for user_id, version in versions(watermarks).items() if before.get(user_id) != version}
+    stale = [snapshot for snapshot in snapshots if snapshot.user_id in changed]
+    for user_id in changed:
+        months = [snapshot.month for snapshot in stale if snapshot.user_id == user_id]
+        MonthlySnapshot.objects.filter(user_id=user_id, month__in=months).delete()
+    return len(snapshots) - len(stale)
+
+
+def snapshot_users(first_id, last_id, since=None, rebuild=False):
+    """
+    Grava os snapshots que faltam dos meses fechados dos usuários com id em
+    [first_id, last_id) (a partir do mês `since`, se informado): uma consulta
+    agrupada no DailyRollup e uma inserção em lote. Com `rebuild`, recalcula
+    também os que já existem.
+    """
+    until = current_month()
+    rollups = DailyRollup.objects.filter(user_id__gte=first_id, user_id__lt=last_id, day__lt=until)
+    stored = MonthlySnapshot.objects.filter(user_id__gte=first_id, user_id__lt=last_id, month__lt=until)
+    if since:
+        rollups = rollups.filter(day__gte=since)
+        stored = stored.filter(month__gte=since)
+    watermarks = ChangeWatermark.objects.filter(user_id__gte=first_id, user_id__lt=last_id)
+
+    if rebuild:
+        stored.delete()
+        existing = set()
+    else:
+        existing = set(stored.values_list('user_id', 'month'))
+    before = versions(watermarks)
+    snapshots = [
+        MonthlySnapshot(
+            user_id=row['user_id'],
+            month=row['period'],
+            income=row['income_total'],
+            expense=row['expense_total'],
+            count=row['count_total'],
+        )
+        for row in monthly_totals(rollups)
+        if (row['user_id'], row['period']) not in existing
+    ]
+    return store(snapshots, watermarks, before)
+
+
+def history(user_id, start, end):
+    """
+    Snapshots dos meses fechados em [start, end) de um usuário, um por mês.
+    Os que faltam são calculados com uma consulta; só os meses com transações
+    são gravados, os demais voltam zerados sem ir para o banco.
+    """
+    months = month_range(start, min(end, current_month()))
+    if not months:
+        return []
+    found = {
+        snapshot.month: snapshot
+        for snapshot in MonthlySnapshot.objects.filter(user_id=user_id, month__gte=months[0], month__lte=months[-1])
+    }
+    missing = [month for month in months if month not in found]
+    if missing:
+        watermarks = ChangeWatermark.objects.filter(user_id=user_id)
+        before = versions(watermarks)
+        rollups = DailyRollup.objects.filter(user_id=user_id, day__gte=missing[0], day__lt=next_month(missing[-1]))
+        totals = {row['period']: row for row in monthly_totals(rollups)}
+        snapshots = []
+        for month in missing:
+            row = totals.get(month)
+            if row is None:
+                found[month] = MonthlySnapshot(user_id=user_id, month=month, income=ZERO, expense=ZERO, count=0)
+                continue
+            snapshots.append(MonthlySnapshot(
+                user_id=user_id,
+                month=month,
+                income=row['income_total'],
+                expense=row['expense_total'],
+                count=row['count_total'],
+            ))
+        if snapshots:
+            store(snapshots, watermarks, before)
+            found.update((snapshot.month, snapshot) for snapshot in snapshots)
+    return [found[month] for month in months]
+
+
+def summary(snapshot):
+    """Mesmo formato de monthly-summary."""
+    return {
+        'receitas': snapshot.income,
+        'despesas': abs(snapshot.expense),
+        'saldo': snapshot.income + snapshot.expense,
+    }
@@ -0,0 +1,127 @@
+"""
+Sync incremental de transações e categorias (rota sync/).
+
+Transaction e Category têm `updated_at` (auto_now, indexado por usuário) e as
+exclusões ficam em Tombstone. O cliente guarda o `cursor` da última resposta e
+recebe no próximo `sync/?since=<cursor>` só o que foi criado, alterado ou
+apagado desde então. Sem cursor (ou com um cursor mais antigo que
+SYNC_TOMBSTONE_DAYS, cujas exclusões já foram descartadas) a resposta traz
+`reset`: o cliente descarta o que tem e recebe tudo.
+
+As transações vêm em páginas de SYNC_PAGE_SIZE, na ordem (updated_at, id); com
+`has_more` o cliente pede a próxima página com o cursor recebido. Categorias e
+exclusões vêm só na primeira página. O cursor final recua SYNC_OVERLAP segundos
+a partir do início da sincronização: uma escrita cujo `updated_at` foi gerado
+antes da leitura, mas cujo commit veio depois, entra na próxima sincronização.
+Por isso um mesmo item pode chegar mais de uma vez, e o cliente deve aplicar as
+alterações por id e as exclusões por último.
+"""
+import datetime
+from collections import namedtuple
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Category, Tombstone, Transaction
+from .serializers import TransactionListSerializer
+
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+MICROSECOND = datetime.timedelta(microseconds=1)
+
+# `since` e `after_id`: última transação entregue; `started`: início da
+# sincronização em andamento (None no cursor final)
+Cursor = namedtuple('Cursor', 'since after_id started')
+
+
+class SyncError(Exception):
+    pass
+
+
+def _micros(moment):
+    return (moment - EPOCH) // MICROSECOND if moment else 0
+
+
+def encode_cursor(cursor):
+    return f'{_micros(cursor.since)}.{cursor.after_id}.{_micros(cursor.started)}'
+
+
+def decode_cursor(text):
+    try:
+        since, after_id, started = (int(part) for part in text.split('.'))
+        if min(since, after_id, started) < 0:
+            raise ValueError
+        return Cursor(EPOCH + since * MICROSECOND, after_id, EPOCH + started * MICROSECOND if started else None)
+    except (ValueError, OverflowError):
+        raise SyncError('Cursor inválido.')
+
+
+def record_deleted(user_id, model, ids):
+    """Grava as tombstones de objetos apagados por escritas em lote."""
+    now = timezone.now()
+    Tombstone.objects.bulk_create(
+        [Tombstone(user_id=user_id, model=model, object_id=pk, deleted_at=now) for pk in ids],
+        batch_size=1000,
+    )
+
+
+def touch_category_transactions(category_id):
+    """As transações da categoria mudam de category_name (ou ficam sem categoria)."""
+    Transaction.objects.filter(category_id=category_id).update(updated_at=timezone.now())
+
+
+def prune(days):
+    """Apaga as tombstones com mais de `days` dias."""
+    deleted, _ = Tombstone.objects.filter(deleted_at__lt=timezone.now() - datetime.timedelta(days=days)).delete()
+    return deleted
+
+
+def changes(user_id, cursor=None, limit=None):
+    """Alterações do usuário desde `cursor` (None: tudo), no formato da rota sync/."""
+    limit = limit or settings.SYNC_PAGE_SIZE
+    now = timezone.now()
+    expired = now - datetime.timedelta(days=settings.SYNC_TOMBSTONE_DAYS)
+    reset = cursor is None or (cursor.started is None and cursor.since < expired)
+    if reset:
+        cursor = Cursor(None, 0, None)
+    first_page = cursor.started is None
+    started = cursor.started or now
+
+    transactions = Transaction.objects.filter(user_id=user_id)
+    if cursor.since is not None:
+        transactions = transactions.filter(updated_at__gte=cursor.since)
+        if cursor.after_id:
+            transactions = transactions.exclude(updated_at=cursor.since, id__lte=cursor.after_id)
+    rows = list(
+        transactions.order_by('updated_at', 'id')
+        .values(*TransactionListSerializer.columns, 'updated_at')[:limit + 1]
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    categories = []
+    deleted = {Tombstone.TRANSACTION: [], Tombstone.CATEGORY: []}
+    if first_page:
+        queryset = Category.objects.filter(user_id=user_id)
+        if cursor.since is not None:
+            queryset = queryset.filter(updated_at__gte=cursor.since)
+            tombstones = Tombstone.objects.filter(user_id=user_id, deleted_at__gte=cursor.since)
+            for model, object_id in tombstones.order_by('id').values_list('model', 'object_id'):
+                deleted[model].append(object_id)
+        categories = list(queryset.order_by('id').values('id', 'name'))
+
+    if has_more:
+        next_cursor = Cursor(rows[-1]['updated_at'], rows[-1]['id'], started)
+    else:
+        next_cursor = Cursor(started - datetime.timedelta(seconds=settings.SYNC_OVERLAP), 0, None)
+    return {
+        'cursor': encode_cursor(next_cursor),
+        'has_more': has_more,
+        'reset': reset,
+        'transactions': TransactionListSerializer().serialize(rows),
+        'categories': categories,
+        'deleted': {
+            'transactions': deleted[Tombstone.TRANSACTION],
+            'categories': deleted[Tombstone.CATEGORY],
+        },
+    }
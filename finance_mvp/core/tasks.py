@@ -0,0 +1,72 @@
+"""
+Tarefas da fila de jobs (core/jobs.py). Registradas ao carregar o app, em
+todos os processos (web e workers).
+"""
+import codecs
+import os
+
+from django.http import QueryDict
+
+from . import rollups
+from .importers import PARSERS, ImportRowError, TransactionImporter
+from .jobs import JobError, task
+from .pivot import PivotError, parse_params as parse_pivot_params, pivot
+
+
+def query_dict(payload):
+    """Payload {nome: valor ou lista} no formato dos parâmetros da requisição."""
+    params = QueryDict(mutable=True)
+    for name, value in payload.items():
+        params.setlist(name, [str(item) for item in value] if isinstance(value, list) else [str(value)])
+    return params
+
+
+def remove_upload(payload):
+    """Apaga o arquivo enviado para o job, se ainda existir."""
+    path = payload.get('path')
+    if path and os.path.exists(path):
+        os.remove(path)
+
+
+# Sem novas tentativas: os lotes já gravados seriam importados de novo. O
+# cleanup apaga o arquivo quando o processo é encerrado antes do `finally`.
+@task('import_transactions', max_attempts=1, cleanup=remove_upload)
+def import_transactions(context):
+    """
+    Importa o arquivo salvo em payload['path'] (formato e codificação no
+    payload) e o apaga ao final. O progresso é a fração do arquivo já lida.
+    """
+    path = context.payload['path']
+    try:
+        size = os.path.getsize(path) or 1
+        with open(path, 'rb') as raw:
+            stream = codecs.getreader(context.payload.get('encoding') or 'utf-8-sig')(raw)
+
+            def report(summary):
+                context.progress(100 * raw.tell() / size, f"{summary['imported']} importadas, {summary['skipped']} ignoradas")
+
+            importer = TransactionImporter(context.user, progress=report)
+            try:
+                return importer.run(PARSERS[context.payload.get('format') or 'csv'](stream))
+            except (ImportRowError, UnicodeDecodeError) as exc:
+                summary = importer.summary()
+                raise JobError(f"Falha ao importar: {exc} ({summary['imported']} importadas antes do erro)")
+    finally:
+        remove_upload(context.payload)
+
+
+@task('rebuild_rollups')
+def rebuild_rollups(context):
+    """Reconstrói os agregados diários (e saldos e orçamentos) do dono do job."""
+    rollups.rebuild([context.job.user_id])
+    return {'users': 1}
+
+
+@task('pivot')
+def pivot_report(context):
+    """reports/pivot/ em background; o payload tem os mesmos parâmetros da rota."""
+    try:
+        options = parse_pivot_params(query_dict(context.payload))
+    except PivotError as exc:
+        raise JobError(str(exc))
+    return pivot(context.job.user_id, **options)
@@ -1,11 +1,40 @@
 # Importação de libs e bibliotecas
-from django.test import TestCase
-from core.models import Transaction, Budget, Category
+import csv
+import datetime
+import gzip
+import json
+import os
+import re
+import subprocess
+import tempfile
+import unittest
+from unittest import mock
+from asgiref.sync import iscoroutinefunction
+from django.test import TestCase, override_settings
+from core.models import Transaction, Budget, Category, DailyRollup, ChangeWatermark, BalanceCheckpoint, Job, MonthlySnapshot, Tombstone
+from core import authentication, balances, benchmarks, jobs, renderers, rollups, snapshots, sync, watermarks
+from core.cache import cache_stats
+from core.pagination import EstimatedCountPaginator
+from core.importers import ImportRowError, TransactionImporter, parse_csv, parse_ofx
+from core.serializers import TransactionSerializer
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, connection, transaction as db_transaction
+from django.db.models import F, QuerySet
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework.test import APIClient
 from datetime import date
+from decimal import Decimal
+from io import StringIO
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from finance_mvp import compression, db, health, metrics, profiling
 
 # Create your tests here.
 
@@ -31,7 +60,7 @@ class TransactionAPITest(TestCase):
 
         # pegar token
         resp = self.client.post(
-            '/api/login/',
+            '/api/token/',
             {'username': 'teste', 'password': '123456'},
             format='json'
         )
@@ -82,7 +111,7 @@ class APITestCase(TestCase):
 
         # Fazer login e pegar token
         resp = self.client.post(
-            '/api/login/',
+            '/api/token/',
             {'username': 'teste', 'password': '123456'},
             format='json'
         )
@@ -91,7 +120,7 @@ class APITestCase(TestCase):
 
     def test_create_transaction(self):
         # Autenticar
-        self.client.credentials(HTTP_AUTHORIZATION='Bearer' + self.token)
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.token)
 
         data = {
             'value': -150.0,
@@ -119,13 +148,14 @@ class APITestCase(TestCase):
         # Agora listar
         resp = self.client.get('/api/transactions/')
         self.assertEqual(resp.status_code, 200)
-        self.assertEqual(len(resp.data), 1)
-        self.assertEqual(float(resp.data[0]['value']), -100.0)
+        self.assertEqual(resp.data['count'], 1)
+        self.assertEqual(float(resp.data['results'][0]['value']), -100.0)
 
     def test_exceed_budget(self):
         """"
         Deve bloquear despesa que ultrapassa o limite
         """
+        self.client.credentials(HTTP_AUTHORIZATION = 'Bearer ' + self.token)
 
         # cria o budget
         self.client.post('/api/budgets/', {
@@ -143,6 +173,129 @@ class APITestCase(TestCase):
         self.assertEqual(resp.status_code, 400)
         self.assertIn('Limite do orçamento excedido', str(resp.data))
 
+class BudgetAPITestCase(TestCase):
+    """
+    O gasto dos orçamentos é mantido a cada escrita, e a verificação do limite
+    não soma transações
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='orcamento', password='12345678')
+        self.client.force_authenticate(self.user)
+        self.mercado = Category.objects.create(user=self.user, name='Mercado')
+        self.lazer = Category.objects.create(user=self.user, name='Lazer')
+        Transaction.objects.create(user=self.user, value=-120, date=date(2025, 3, 2), category=self.mercado)
+        Transaction.objects.create(user=self.user, value=-30, date=date(2025, 3, 5), category=self.lazer)
+        Transaction.objects.create(user=self.user, value=2000, date=date(2025, 3, 5), category=self.mercado)
+        Transaction.objects.create(user=self.user, value=-999, date=date(2025, 4, 1), category=self.mercado)
+
+    def create_budget(self, amount_limit, category=None):
+        resp = self.client.post('/api/budgets/', {
+            'amount_limit': amount_limit, 'category': category and category.pk, 'month': 3, 'year': 2025,
+        }, format='json')
+        self.assertEqual(resp.status_code, 201, resp.data)
+        return resp.data
+
+    def spent(self):
+        return dict(Budget.objects.values_list('category_id', 'spent'))
+
+    def test_create_and_list(self):
+        data = self.create_budget(500, self.mercado)
+        self.assertEqual(data['category_name'], 'Mercado')
+        self.assertEqual(data['limit'], '500.00')
+        self.assertEqual(data['spent'], '120.00')
+        self.assertEqual(data['remaining'], '380.00')
+        self.assertEqual(data['start_date'], date(2025, 3, 1))
+        self.assertEqual(data['end_date'], date(2025, 3, 31))
+        self.create_budget(1000)
+
+        resp = self.client.get('/api/budgets/', {'year': 2025, 'month': 3})
+        self.assertEqual(
+            [(item['category_name'], item['spent']) for item in resp.data],
+            [('Geral', '150.00'), ('Mercado', '120.00')],
+        )
+
+        # Um orçamento por categoria e mês, e só com categorias do usuário
+        resp = self.client.post('/api/budgets/', {'amount_limit': 10, 'month': 3, 'year': 2025}, format='json')
+        self.assertEqual(resp.status_code, 400)
+        other = Category.objects.create(user=User.objects.create_user(username='outro'), name='Alheia')
+        resp = self.client.post('/api/budgets/', {
+            'amount_limit': 10, 'category': other.pk, 'month': 3, 'year': 2025,
+        }, format='json')
+        self.assertEqual(resp.status_code, 400)
+
+    def test_running_total_follows_writes(self):
+        self.create_budget(500, self.mercado)
+        self.create_budget(1000)
+
+        transaction = Transaction.objects.create(user=self.user, value=-80, date=date(2025, 3, 9), category=self.lazer)
+        self.assertEqual(self.spent(), {self.mercado.pk: Decimal('120'), None: Decimal('230')})
+
+        transaction.category = self.mercado
+        transaction.value = -50
+        transaction.save()
+        self.assertEqual(self.spent(), {self.mercado.pk: Decimal('170'), None: Decimal('200')})
+
+        transaction.date = date(2025, 4, 9)
+        transaction.save()
+        self.assertEqual(self.spent(), {self.mercado.pk: Decimal('120'), None: Decimal('150')})
+
+        Transaction.objects.filter(value=-120).get().delete()
+        self.assertEqual(self.spent(), {self.mercado.pk: Decimal('0'), None: Decimal('30')})
+
+        resp = self.client.post('/api/transactions/bulk/', [
+            {'value': -10, 'date': '2025-03-10', 'category': self.mercado.pk},
+            {'value': -15, 'date': '2025-03-11'},
+        ], format='json')
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(self.spent(), {self.mercado.pk: Decimal('10'), None: Decimal('55')})
+
+    def test_refresh_locks_budget_before_summing(self):
+        budget = self.create_budget(500, self.mercado)
+        select_for_update = QuerySet.select_for_update
+        locked = []
+
+        def lock(queryset, *args, **kwargs):
+            locked.append(queryset.model)
+            return select_for_update(queryset, *args, **kwargs)
+
+        with mock.patch.object(QuerySet, 'select_for_update', autospec=True, side_effect=lock):
+            resp = self.client.patch(f"/api/budgets/{budget['id']}/", {'amount_limit': 600}, format='json')
+        self.assertEqual(resp.status_code, 200, resp.data)
+        self.assertEqual(resp.data['spent'], '120.00')
+        self.assertEqual(locked, [Budget])
+
+    def test_limit_check(self):
+        self.create_budget(200, self.mercado)
+
+        resp = self.client.post('/api/transactions/', {
+            'value': -81, 'date': '2025-03-20', 'category': self.mercado.pk,
+        }, format='json')
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn('Limite do orçamento excedido', str(resp.data))
+
+        # Outra categoria, outro mês e receitas não são afetados
+        for data in (
+            {'value': -500, 'date': '2025-03-20', 'category': self.lazer.pk},
+            {'value': -500, 'date': '2025-05-20', 'category': self.mercado.pk},
+            {'value': 500, 'date': '2025-03-20', 'category': self.mercado.pk},
+        ):
+            self.assertEqual(self.client.post('/api/transactions/', data, format='json').status_code, 201, data)
+
+        # Consultas fixas, independentes do número de transações do mês
+        Transaction.objects.bulk_create([
+            Transaction(user=self.user, value=1, date=date(2025, 3, 1 + i % 28), category=self.lazer)
+            for i in range(200)
+        ])
+        with CaptureQueriesContext(connection) as small:
+            self.client.post('/api/transactions/', {
+                'value': -80, 'date': '2025-03-21', 'category': self.mercado.pk,
+            }, format='json')
+        self.assertEqual(self.spent(), {self.mercado.pk: Decimal('200')})
+        budget_queries = [query for query in small.captured_queries if 'core_budget' in query['sql']]
+        self.assertEqual(len(budget_queries), 2)
+
 class ReportsAPITestCase (TestCase):
     """
     Testes para os relatórios (ex: despesas por categoria)
@@ -155,7 +308,7 @@ class ReportsAPITestCase (TestCase):
         )
 
         resp = self.client.post(
-            '/api/login/',
+            '/api/token/',
              {'username': 'teste', 'password': '123456'},
             format='json'
         )
@@ -183,10 +336,1819 @@ class ReportsAPITestCase (TestCase):
         """
 
         resp = self.client.get(
-            '/api/reports/expenses_by_category/?start=2025-03-01&end=2025-03-31'
+            '/api/reports/expenses-by-category/?start=2025-03-01&end=2025-03-31'
         )
 
         self.assertEqual(resp.status_code, 200)
         self.assertEqual(len(resp.data), 1)
         self.assertEqual(resp.data[0]['category'], 'Alimentação')
-        self.assertEqual(float(resp.data[0]['total_expenses']), 300.00)
\ No newline at end of file
+        self.assertEqual(float(resp.data[0]['total_expenses']), 300.00)
+
+    def test_report_keeps_empty_emotional_trigger(self):
+        """
+        Gatilho vazio continua saindo como "" (e não null) no relatório por gatilho
+        """
+        self.client.post('/api/transactions/', {
+            'value': -50, 'date': '2025-03-12', 'emotional_trigger': ''
+        }, format='json')
+
+        resp = self.client.get('/api/reports/expenses-by-emotion/')
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(
+            {item['emotional_trigger']: float(item['total_spent']) for item in resp.data},
+            {'Necessidade Básica': 300.00, '': 50.00},
+        )
+
+    def test_report_totals_rendered_alike(self):
+        """
+        Receitas e despesas por categoria chegam como Decimal ao renderer e saem como número
+        """
+        self.client.post('/api/transactions/', {
+            'value': '1500.25', 'date': '2025-03-01', 'category': self.category_id
+        }, format='json')
+
+        incomes = self.client.get('/api/reports/incomes-by-category/')
+        expenses = self.client.get('/api/reports/expenses-by-category/')
+        self.assertIsInstance(incomes.data[0]['total_incomes'], Decimal)
+        self.assertIsInstance(expenses.data[0]['total_expenses'], Decimal)
+        self.assertEqual(incomes.json(), [{'category': 'Alimentação', 'total_incomes': 1500.25}])
+        self.assertEqual(expenses.json(), [{'category': 'Alimentação', 'total_expenses': 300.0}])
+
+class DailyRollupTestCase(TestCase):
+    """
+    O agregado diário deve acompanhar as escritas em Transaction
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='rollup', password='12345678')
+        self.category = Category.objects.create(user=self.user, name='Mercado')
+
+    def bucket(self, day, category=None, trigger='Necessidade Básica'):
+        return DailyRollup.objects.get(user=self.user, day=day, category=category, emotional_trigger=trigger)
+
+    def test_create_update_delete(self):
+        trans = Transaction.objects.create(user=self.user, value=-50, date=date(2025, 3, 5), category=self.category)
+        Transaction.objects.create(user=self.user, value=200, date=date(2025, 3, 5), category=self.category)
+
+        bucket = self.bucket(date(2025, 3, 5), self.category)
+        self.assertEqual(bucket.income, Decimal('200'))
+        self.assertEqual(bucket.expense, Decimal('-50'))
+        self.assertEqual(bucket.count, 2)
+
+        trans.date = date(2025, 3, 6)
+        trans.emotional_trigger = None
+        trans.save()
+        self.assertEqual(self.bucket(date(2025, 3, 5), self.category).expense, Decimal('0'))
+        self.assertEqual(self.bucket(date(2025, 3, 6), self.category, '').expense, Decimal('-50'))
+
+        trans.delete()
+        self.assertFalse(DailyRollup.objects.filter(day=date(2025, 3, 6)).exists())
+        self.assertEqual(rollups.find_drift(self.user.pk), [])
+
+    def test_category_delete_moves_to_uncategorized(self):
+        Transaction.objects.create(user=self.user, value=-30, date=date(2025, 3, 5), category=self.category)
+        Transaction.objects.create(user=self.user, value=-20, date=date(2025, 3, 5))
+
+        self.category.delete()
+
+        bucket = self.bucket(date(2025, 3, 5))
+        self.assertEqual(bucket.expense, Decimal('-50'))
+        self.assertEqual(bucket.count, 2)
+        self.assertEqual(rollups.find_drift(self.user.pk), [])
+
+    def test_concurrent_bucket_creation(self):
+        DailyRollup.objects.create(user=self.user, day=date(2025, 3, 5), emotional_trigger='', expense=-10, count=1, expense_count=1)
+        first = QuerySet.first
+        calls = []
+
+        def stale_first(queryset):
+            # A primeira leitura não vê o balde criado pela escrita concorrente
+            calls.append(queryset)
+            return None if len(calls) == 1 else first(queryset)
+
+        bucket = (self.user.pk, date(2025, 3, 5), None, '')
+        with db_transaction.atomic(), mock.patch.object(QuerySet, 'first', stale_first):
+            rollups.apply_delta(bucket, Decimal('0'), Decimal('-10'), 1, 1, 0)
+        row = self.bucket(date(2025, 3, 5), trigger='')
+        self.assertEqual((row.expense, row.count), (Decimal('-20'), 2))
+        self.assertEqual(len(calls), 2)
+
+        with self.assertRaises(IntegrityError), db_transaction.atomic():
+            DailyRollup.objects.create(user=self.user, day=date(2025, 3, 5), emotional_trigger='', count=1)
+
+    def test_rebuild_command_fixes_drift(self):
+        Transaction.objects.create(user=self.user, value=-30, date=date(2025, 3, 5))
+        # Escritas em massa não passam pelos signals
+        Transaction.objects.filter(user=self.user).update(value=-40)
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_rollups', '--check', stdout=StringIO())
+
+        call_command('rebuild_rollups', stdout=StringIO())
+        call_command('rebuild_rollups', '--check', stdout=StringIO())
+        self.assertEqual(self.bucket(date(2025, 3, 5)).expense, Decimal('-40'))
+
+    def test_reports_read_from_rollup(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        Transaction.objects.create(user=self.user, value=-100, date=date(2025, 3, 5), category=self.category)
+        Transaction.objects.create(user=self.user, value=-200, date=date(2025, 3, 10), category=self.category)
+        Transaction.objects.create(user=self.user, value=500, date=date(2025, 3, 10))
+
+        resp = client.get('/api/reports/monthly-flow/', {'year': 2025, 'month': 3})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual([item['day'] for item in resp.data], ['05', '10'])
+        self.assertEqual(resp.data[1]['receita'], Decimal('500'))
+        self.assertEqual(resp.data[1]['despesa'], Decimal('200'))
+
+        resp = client.get('/api/reports/category-expenses/', {'year': 2025, 'month': 3})
+        self.assertEqual(resp.data, [{'category_name': 'Mercado', 'total_spent': Decimal('300')}])
+
+        resp = client.get('/api/reports/emotional-expenses/', {'year': 2025, 'month': 3})
+        self.assertEqual(resp.data, [{'emotional_trigger': 'Necessidade Básica', 'total_spent': Decimal('300')}])
+
+
+class DashboardAPITestCase(TestCase):
+    """
+    O endpoint do dashboard deve reunir os relatórios do mês em uma consulta
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='dash', password='12345678')
+        self.client.force_authenticate(self.user)
+        mercado = Category.objects.create(user=self.user, name='Mercado')
+        lazer = Category.objects.create(user=self.user, name='Lazer')
+
+        Transaction.objects.create(user=self.user, value=1000, date=date(2025, 3, 1))
+        Transaction.objects.create(user=self.user, value=-100, date=date(2025, 3, 5), category=mercado)
+        Transaction.objects.create(user=self.user, value=-250, date=date(2025, 3, 5), category=lazer,
+                                   emotional_trigger='Impulso Emocional')
+        Transaction.objects.create(user=self.user, value=-40, date=date(2025, 3, 20))
+        Transaction.objects.create(user=self.user, value=-999, date=date(2025, 4, 1), category=mercado)
+
+    def test_dashboard_matches_individual_reports(self):
+        params = {'year': 2025, 'month': 3}
+        # marca d'água (ETag) + consulta agrupada
+        with self.assertNumQueries(2):
+            resp = self.client.get('/api/reports/dashboard/', params)
+        self.assertEqual(resp.status_code, 200)
+
+        self.assertEqual(resp.data['summary'], {
+            'receitas': Decimal('1000'), 'despesas': Decimal('390'), 'saldo': Decimal('610')
+        })
+        self.assertEqual(resp.data['monthly_flow'], self.client.get('/api/reports/monthly-flow/', params).data)
+        self.assertEqual(resp.data['category_expenses'], self.client.get('/api/reports/category-expenses/', params).data)
+        self.assertEqual(resp.data['emotional_expenses'], self.client.get('/api/reports/emotional-expenses/', params).data)
+
+    def test_invalid_params(self):
+        resp = self.client.get('/api/reports/dashboard/', {'year': 'abc'})
+        self.assertEqual(resp.status_code, 400)
+
+
+class PivotAPITestCase(TestCase):
+    """
+    O pivot deve calcular qualquer combinação de dimensões e medidas em uma
+    única consulta agrupada
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='pivot', password='12345678')
+        self.client.force_authenticate(self.user)
+        self.mercado = Category.objects.create(user=self.user, name='Mercado')
+        self.lazer = Category.objects.create(user=self.user, name='Lazer')
+
+        Transaction.objects.create(user=self.user, value=1000, date=date(2025, 3, 1), category=self.mercado)
+        Transaction.objects.create(user=self.user, value=-100, date=date(2025, 3, 1), category=self.mercado)
+        Transaction.objects.create(user=self.user, value=-50, date=date(2025, 3, 9), category=self.mercado)
+        Transaction.objects.create(user=self.user, value=-250, date=date(2025, 3, 5), category=self.lazer,
+                                   emotional_trigger='Impulso Emocional')
+        Transaction.objects.create(user=self.user, value=-40, date=date(2025, 4, 2), emotional_trigger=None)
+
+    def rows(self, resp):
+        columns = resp.data['columns']
+        return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+    def test_category_by_sign(self):
+        params = {'dimensions': 'category,sign', 'measures': 'sum,count,avg', 'start': '2025-03-01', 'end': '2025-04-01'}
+        # marca d'água (ETag) + consulta agrupada
+        with self.assertNumQueries(2):
+            resp = self.client.get('/api/reports/pivot/', params)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data['rows'], 3)
+        self.assertEqual(self.rows(resp), [
+            {'category': self.mercado.pk, 'category_name': 'Mercado', 'sign': 'income',
+             'sum': Decimal('1000'), 'count': 1, 'avg': Decimal('1000.00')},
+            {'category': self.mercado.pk, 'category_name': 'Mercado', 'sign': 'expense',
+             'sum': Decimal('-150'), 'count': 2, 'avg': Decimal('-75.00')},
+            {'category': self.lazer.pk, 'category_name': 'Lazer', 'sign': 'expense',
+             'sum': Decimal('-250'), 'count': 1, 'avg': Decimal('-250.00')},
+        ])
+
+    def test_zero_value_is_not_income(self):
+        Transaction.objects.create(user=self.user, value=0, date=date(2025, 3, 5), category=self.lazer)
+        params = {'dimensions': 'category,sign', 'measures': 'sum,count', 'start': '2025-03-01', 'end': '2025-04-01'}
+        self.assertNotIn(
+            {'category': self.lazer.pk, 'category_name': 'Lazer', 'sign': 'income', 'sum': Decimal('0'), 'count': 1},
+            self.rows(self.client.get('/api/reports/pivot/', params)),
+        )
+
+        resp = self.client.get('/api/reports/pivot/', {'dimensions': 'category', 'sign': 'income', 'measures': 'count'})
+        self.assertEqual(self.rows(resp), [{'category': self.mercado.pk, 'category_name': 'Mercado', 'count': 1}])
+        self.assertEqual(rollups.find_drift(self.user.pk), [])
+
+    def test_matches_per_dimension_reports(self):
+        resp = self.client.get('/api/reports/pivot/', {
+            'dimensions': 'category', 'sign': 'expense', 'top': 5,
+            'start': '2025-03-01', 'end': '2025-04-01',
+        })
+        expected = self.client.get('/api/reports/category-expenses/', {'year': 2025, 'month': 3}).data
+        self.assertEqual(
+            [{'category_name': row['category_name'], 'total_spent': abs(row['sum'])} for row in self.rows(resp)],
+            expected,
+        )
+
+        resp = self.client.get('/api/reports/pivot/', {'dimensions': 'emotional_trigger,month', 'measures': 'count'})
+        self.assertEqual(self.rows(resp), [
+            {'emotional_trigger': 'Impulso Emocional', 'month': date(2025, 3, 1), 'count': 1},
+            {'emotional_trigger': 'Necessidade Básica', 'month': date(2025, 3, 1), 'count': 3},
+            {'emotional_trigger': None, 'month': date(2025, 4, 1), 'count': 1},
+        ])
+
+    def test_filters_and_totals(self):
+        resp = self.client.get('/api/reports/pivot/', {'measures': 'sum,count'})
+        self.assertEqual(self.rows(resp), [{'sum': Decimal('560'), 'count': 5}])
+
+        resp = self.client.get('/api/reports/pivot/', {'category': 'none', 'sign': 'expense'})
+        self.assertEqual(self.rows(resp), [{'sum': Decimal('-40')}])
+
+        resp = self.client.get('/api/reports/pivot/', {
+            'dimensions': 'day', 'sign': 'expense', 'emotional_trigger': 'Necessidade Básica',
+        })
+        self.assertEqual(resp.data['columns']['day'], [date(2025, 3, 1), date(2025, 3, 9)])
+
+    def test_invalid_params(self):
+        for params in (
+            {'dimensions': 'cor'},
+            {'dimensions': 'day,month'},
+            {'measures': 'median'},
+            {'sign': 'ambos'},
+            {'top': '0'},
+            {'start': '2025-13-01'},
+            {'measures': 'count', 'sort': 'sum'},
+        ):
+            self.assertEqual(self.client.get('/api/reports/pivot/', params).status_code, 400, params)
+
+
+class BalanceAPITestCase(TestCase):
+    """
+    Saldo acumulado dia a dia, com saldo de abertura vindo dos checkpoints
+    mensais
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='saldo', password='12345678')
+        self.client.force_authenticate(self.user)
+        self.category = Category.objects.create(user=self.user, name='Mercado')
+
+        Transaction.objects.create(user=self.user, value=500, date=date(2024, 11, 20), category=self.category)
+        Transaction.objects.create(user=self.user, value=-200, date=date(2025, 1, 10), category=self.category)
+        Transaction.objects.create(user=self.user, value=3000, date=date(2025, 3, 1), category=self.category)
+        Transaction.objects.create(user=self.user, value=-100, date=date(2025, 3, 1), emotional_trigger=None)
+        Transaction.objects.create(user=self.user, value=-50, date=date(2025, 3, 3), category=self.category)
+
+    def test_daily_series(self):
+        resp = self.client.get('/api/reports/balance/', {'start': '2025-02-28', 'end': '2025-03-05'})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data['opening_balance'], Decimal('300'))
+        self.assertEqual(resp.data['closing_balance'], Decimal('3150'))
+        self.assertEqual(
+            [(row['date'], row['receita'], row['despesa'], row['saldo']) for row in resp.data['series']],
+            [
+                (date(2025, 2, 28), Decimal('0.00'), Decimal('0.00'), Decimal('300')),
+                (date(2025, 3, 1), Decimal('3000'), Decimal('100'), Decimal('3200')),
+                (date(2025, 3, 2), Decimal('0.00'), Decimal('0.00'), Decimal('3200')),
+                (date(2025, 3, 3), Decimal('0'), Decimal('50'), Decimal('3150')),
+                (date(2025, 3, 4), Decimal('0.00'), Decimal('0.00'), Decimal('3150')),
+            ],
+        )
+
+    def test_checkpoints_and_bounded_queries(self):
+        params = {'start': '2025-03-01', 'end': '2025-04-01'}
+        self.client.get('/api/reports/balance/', params)
+        self.assertEqual(
+            list(BalanceCheckpoint.objects.filter(user=self.user).order_by('month').values_list('month', 'balance')),
+            [
+                (date(2024, 11, 1), Decimal('0')),
+                (date(2024, 12, 1), Decimal('500')),
+                (date(2025, 1, 1), Decimal('500')),
+                (date(2025, 2, 1), Decimal('300')),
+                (date(2025, 3, 1), Decimal('300')),
+            ],
+        )
+
+        # marca d'água (ETag) + checkpoint do mês + janela sobre os agregados
+        cache.clear()
+        with self.assertNumQueries(3):
+            resp = self.client.get('/api/reports/balance/', params)
+        self.assertEqual(resp.data['closing_balance'], Decimal('3150'))
+
+    def test_backdated_write_invalidates_checkpoints(self):
+        params = {'start': '2025-03-01', 'end': '2025-03-02'}
+        self.client.get('/api/reports/balance/', params)
+        Transaction.objects.create(user=self.user, value=-80, date=date(2024, 12, 15), category=self.category)
+        self.assertEqual(
+            list(BalanceCheckpoint.objects.filter(user=self.user).values_list('month', flat=True)),
+            [date(2024, 11, 1), date(2024, 12, 1)],
+        )
+
+        resp = self.client.get('/api/reports/balance/', params)
+        self.assertEqual(resp.data['opening_balance'], Decimal('220'))
+        self.assertEqual(resp.data['closing_balance'], Decimal('3120'))
+
+    def test_concurrent_write_discards_new_checkpoints(self):
+        bulk_create = BalanceCheckpoint.objects.bulk_create
+
+        def write_during_read(objs, **kwargs):
+            bulk_create(objs, **kwargs)
+            # Escrita de outra requisição entre o cálculo e a gravação
+            watermarks.touch(self.user.pk)
+
+        with mock.patch.object(BalanceCheckpoint.objects, 'bulk_create', side_effect=write_during_read):
+            self.assertEqual(balances.month_opening_balance(self.user.pk, date(2025, 3, 1)), Decimal('300'))
+        self.assertFalse(BalanceCheckpoint.objects.filter(user=self.user).exists())
+
+    def test_invalid_params(self):
+        for params in (
+            {'start': '2025-13-01', 'end': '2025-14-01'},
+            {'start': '2025-03-01', 'end': '2025-02-01'},
+            {'start': '2000-01-01', 'end': '2025-01-01'},
+        ):
+            self.assertEqual(self.client.get('/api/reports/balance/', params).status_code, 400, params)
+
+    def test_future_months_are_not_stored(self):
+        self.assertEqual(balances.month_opening_balance(self.user.pk, date(2030, 6, 1)), Decimal('3150'))
+        # Só até o último mês com movimentação (março de 2025)
+        self.assertEqual(
+            BalanceCheckpoint.objects.filter(user=self.user).order_by('-month').values_list('month', flat=True)[0],
+            date(2025, 3, 1),
+        )
+
+        resp = self.client.get('/api/reports/balance/', {'start': '9990-01-01', 'end': '9990-01-02'})
+        self.assertEqual(resp.status_code, 400)
+
+
+class QueryPlanTestCase(TestCase):
+    """
+    Nenhuma consulta dos relatórios ou da listagem pode fazer varredura
+    sequencial nas tabelas de transações e agregados
+    """
+    endpoints = [
+        ('/api/monthly-summary/', {}),
+        ('/api/reports/expenses-by-category/', {}),
+        ('/api/reports/incomes-by-category/', {}),
+        ('/api/reports/expenses-by-emotion/', {}),
+        ('/api/reports/monthly-flow/', {'year': 2025, 'month': 3}),
+        ('/api/reports/category-expenses/', {'year': 2025, 'month': 3}),
+        ('/api/reports/emotional-expenses/', {'year': 2025, 'month': 3}),
+        ('/api/reports/dashboard/', {'year': 2025, 'month': 3}),
+        ('/api/reports/trend/', {'start': '2024-01-01', 'end': '2026-01-01', 'granularity': 'week'}),
+        ('/api/reports/pivot/', {'dimensions': 'category,sign,week', 'start': '2025-01-01', 'measures': 'sum,avg'}),
+        ('/api/transactions/', {}),
+        ('/api/transactions/', {'start': '2025-03-01', 'end': '2025-03-31'}),
+        ('/api/transactions/', {'pagination': 'cursor'}),
+        ('/api/transactions/', {'count': 'estimate'}),
+    ]
+    tables = ('core_transaction', 'core_dailyrollup')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create_user(username=f'plan{i}', password='12345678') for i in range(3)]
+        triggers = [choice for choice, _ in Transaction.EMOTIONAL_TRIGGER_CHOICES]
+        for user in cls.users:
+            categories = [Category.objects.create(user=user, name=f'Cat {i}') for i in range(4)]
+            Transaction.objects.bulk_create([
+                Transaction(
+                    user=user,
+                    value=(i % 7 - 5) * 10,
+                    date=date(2024 + i % 2, i % 12 + 1, i % 28 + 1),
+                    category=categories[i % 4],
+                    emotional_trigger=triggers[i % len(triggers)],
+                )
+                for i in range(300)
+            ])
+        rollups.rebuild([user.pk for user in cls.users])
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                # Com poucas linhas o planejador prefere Seq Scan; o que importa
+                # aqui é se existe um índice capaz de atender a consulta
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute('EXPLAIN ' + sql)
+            else:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return '\n'.join(str(row[-1]) for row in cursor.fetchall())
+
+    def is_sequential_scan(self, plan):
+        for table in self.tables:
+            if connection.vendor == 'postgresql':
+                if re.search(rf'Seq Scan on {table}\b', plan):
+                    return True
+            elif re.search(rf'\bSCAN {table}\b', plan):
+                return True
+        return False
+
+    def test_report_queries_use_indexes(self):
+        client = APIClient()
+        client.force_authenticate(self.users[0])
+        for url, params in self.endpoints:
+            with CaptureQueriesContext(connection) as ctx:
+                resp = client.get(url, params)
+            self.assertEqual(resp.status_code, 200, url)
+
+            statements = [
+                query['sql'] for query in ctx.captured_queries
+                if query['sql'].startswith('SELECT') and any(table in query['sql'] for table in self.tables)
+            ]
+            self.assertTrue(statements, url)
+            for sql in statements:
+                plan = self.explain(sql)
+                self.assertFalse(self.is_sequential_scan(plan), f'{url}: {sql}\n{plan}')
+
+
+class TrendAPITestCase(TestCase):
+    """
+    Relatórios filtrados por intervalos de datas semiabertos
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='trend', password='12345678')
+        self.client.force_authenticate(self.user)
+        Transaction.objects.create(user=self.user, value=-10, date=date(2023, 12, 31))
+        Transaction.objects.create(user=self.user, value=-20, date=date(2024, 1, 1))
+        Transaction.objects.create(user=self.user, value=300, date=date(2024, 1, 2))
+        Transaction.objects.create(user=self.user, value=-40, date=date(2025, 2, 28))
+        Transaction.objects.create(user=self.user, value=-50, date=date(2025, 3, 1))
+
+    def test_monthly_granularity_across_years(self):
+        resp = self.client.get('/api/reports/trend/', {'start': '2024-01-01', 'end': '2025-03-01'})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data, [
+            {'period': date(2024, 1, 1), 'receita': Decimal('300'), 'despesa': Decimal('20'), 'saldo': Decimal('280')},
+            {'period': date(2025, 2, 1), 'receita': Decimal('0'), 'despesa': Decimal('40'), 'saldo': Decimal('-40')},
+        ])
+
+    def test_weekly_granularity(self):
+        resp = self.client.get('/api/reports/trend/', {'start': '2023-12-25', 'end': '2024-01-08', 'granularity': 'week'})
+        # 2023-12-31 é domingo: pertence à semana iniciada em 2023-12-25
+        self.assertEqual([item['period'] for item in resp.data], [date(2023, 12, 25), date(2024, 1, 1)])
+
+    def test_invalid_params(self):
+        self.assertEqual(self.client.get('/api/reports/trend/', {'start': '2024-01-01'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/reports/trend/', {
+            'start': '2024-01-01', 'end': '2024-02-01', 'granularity': 'year'
+        }).status_code, 400)
+
+    def test_month_views_use_full_month(self):
+        resp = self.client.get('/api/reports/monthly-flow/', {'year': 2025, 'month': 2})
+        self.assertEqual(resp.data, [{'day': '28', 'receita': Decimal('0'), 'despesa': Decimal('40')}])
+        self.assertEqual(self.client.get('/api/reports/monthly-flow/', {'year': 2025, 'month': 13}).status_code, 400)
+
+    def test_expenses_by_category_end_is_inclusive(self):
+        resp = self.client.get('/api/reports/expenses-by-category/', {'start': '2024-01-01', 'end': '2025-02-28'})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data, [{'category': 'Sem Categoria', 'total_expenses': Decimal('60')}])
+
+
+class ReportCacheTestCase(TestCase):
+    """
+    Relatórios ficam em cache até a próxima escrita do usuário
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='cache', password='12345678')
+        self.other = User.objects.create_user(username='other', password='12345678')
+        self.client.force_authenticate(self.user)
+        self.category = Category.objects.create(user=self.user, name='Mercado')
+        Transaction.objects.create(user=self.user, value=-100, date=date(2025, 3, 5), category=self.category)
+        self.params = {'year': 2025, 'month': 3}
+
+    def get(self):
+        return self.client.get('/api/reports/category-expenses/', self.params)
+
+    def test_hit_after_miss(self):
+        self.assertEqual(self.get().data[0]['total_spent'], Decimal('100'))
+        # Somente a marca d'água do GET condicional
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get().data[0]['total_spent'], Decimal('100'))
+        self.assertEqual(cache_stats()['hits'], 1)
+        self.assertEqual(cache_stats()['misses'], 1)
+
+    def test_transaction_and_category_writes_invalidate(self):
+        self.get()
+        self.client.post('/api/transactions/', {
+            'value': -50, 'date': '2025-03-06', 'category': self.category.pk
+        }, format='json')
+        self.assertEqual(self.get().data[0]['total_spent'], Decimal('150'))
+
+        self.client.patch(f'/api/categories/{self.category.pk}/', {'name': 'Feira'}, format='json')
+        self.assertEqual(self.get().data[0]['category_name'], 'Feira')
+
+    def test_writes_from_other_workers_invalidate(self):
+        self.get()
+        # Outro worker, com o próprio cache em memória, grava uma transação:
+        # aqui só a marca d'água no banco muda
+        with mock.patch.object(watermarks, 'touch'):
+            Transaction.objects.create(user=self.user, value=-50, date=date(2025, 3, 6), category=self.category)
+        ChangeWatermark.objects.filter(user=self.user).update(version=F('version') + 1, updated_at=timezone.now())
+        self.assertEqual(self.get().data[0]['total_spent'], Decimal('150'))
+        self.assertEqual(cache_stats()['misses'], 2)
+
+    def test_other_users_writes_keep_cache(self):
+        self.get()
+        Transaction.objects.create(user=self.other, value=-10, date=date(2025, 3, 5))
+        with self.assertNumQueries(1):
+            self.get()
+
+    def test_params_are_part_of_the_key(self):
+        self.get()
+        resp = self.client.get('/api/reports/category-expenses/', {'year': 2025, 'month': 4})
+        self.assertEqual(resp.data, [])
+
+    def test_stats_are_staff_only(self):
+        self.assertEqual(self.client.get('/api/reports/cache-stats/').status_code, 403)
+        self.user.is_staff = True
+        self.user.save()
+        self.assertEqual(self.client.get('/api/reports/cache-stats/').status_code, 200)
+
+
+class TransactionPaginationTestCase(TestCase):
+    """
+    Modos de paginação por cursor e com contagem estimada
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='pages', password='12345678')
+        self.client.force_authenticate(self.user)
+        self.category = Category.objects.create(user=self.user, name='Mercado')
+        # Várias transações por dia para exercitar o desempate por id
+        Transaction.objects.bulk_create([
+            Transaction(user=self.user, value=-i, date=date(2025, 1, 1 + i // 3),
+                        category=self.category if i % 2 else None)
+            for i in range(25)
+        ])
+        self.expected = list(
+            Transaction.objects.filter(user=self.user).order_by('-date', '-id').values_list('id', flat=True)
+        )
+
+    def walk(self, url, params, key='next'):
+        ids, pages = [], 0
+        resp = self.client.get(url, params)
+        while True:
+            self.assertEqual(resp.status_code, 200)
+            ids.extend(item['id'] for item in resp.data['results'])
+            pages += 1
+            if not resp.data[key]:
+                return ids, pages, resp
+            resp = self.client.get(resp.data[key])
+
+    def test_cursor_walks_every_row_once(self):
+        ids, pages, last = self.walk('/api/transactions/', {'pagination': 'cursor', 'page_size': 10})
+        self.assertEqual(ids, self.expected)
+        self.assertEqual(pages, 3)
+        self.assertNotIn('count', last.data)
+
+        # E volta para trás a partir da última página
+        back = self.client.get(last.data['previous'])
+        self.assertEqual([item['id'] for item in back.data['results']], self.expected[10:20])
+
+    def test_cursor_keeps_filters(self):
+        ids, _, _ = self.walk('/api/transactions/', {
+            'pagination': 'cursor', 'page_size': 4, 'category': self.category.pk, 'end': '2025-01-05'
+        })
+        expected = list(
+            Transaction.objects.filter(user=self.user, category=self.category, date__lte=date(2025, 1, 5))
+            .order_by('-date', '-id').values_list('id', flat=True)
+        )
+        self.assertEqual(ids, expected)
+
+    def test_cursor_pages_do_not_count(self):
+        resp = self.client.get('/api/transactions/', {'pagination': 'cursor', 'page_size': 5})
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(resp.data['next'])
+        self.assertFalse([q for q in ctx.captured_queries if 'COUNT(' in q['sql']])
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get('/api/transactions/', {'cursor': 'lixo'}).status_code, 404)
+
+    def test_estimated_count_is_capped(self):
+        with mock.patch.object(EstimatedCountPaginator, 'count_cap', 10):
+            ids, pages, _ = self.walk('/api/transactions/', {'count': 'estimate'})
+            resp = self.client.get('/api/transactions/', {'count': 'estimate'})
+        self.assertEqual(ids, self.expected)
+        self.assertEqual(pages, 2)
+        self.assertFalse(resp.data['count_is_exact'])
+        self.assertGreaterEqual(resp.data['count'], 11)
+
+    def test_default_mode_unchanged(self):
+        resp = self.client.get('/api/transactions/')
+        self.assertEqual(resp.data['count'], 25)
+        self.assertEqual(len(resp.data['results']), 20)
+
+
+class BulkTransactionAPITestCase(TestCase):
+    """
+    Criação, atualização e remoção de transações em lote
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='bulk', password='12345678')
+        self.other = User.objects.create_user(username='intruso', password='12345678')
+        self.client.force_authenticate(self.user)
+        self.category = Category.objects.create(user=self.user, name='Mercado')
+        self.foreign = Category.objects.create(user=self.other, name='Alheia')
+
+    def test_bulk_create_batches_queries(self):
+        rows = [
+            {'value': -10 - i, 'date': f'2025-03-{i % 28 + 1:02d}', 'category': self.category.pk}
+            for i in range(300)
+        ]
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.post('/api/transactions/bulk/', rows, format='json')
+        self.assertEqual(resp.status_code, 201, resp.data)
+        self.assertEqual(resp.data['created'], 300)
+        # Número de consultas fixo, independente do tamanho do lote (no SQLite
+        # o INSERT é dividido em lotes de 999 parâmetros: 3 para 300 linhas)
+        self.assertLess(len(ctx.captured_queries), 16)
+
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 300)
+        self.assertEqual(Transaction.objects.filter(user=self.user).first().emotional_trigger, 'Necessidade Básica')
+        self.assertEqual(rollups.find_drift(self.user.pk), [])
+
+    def test_bulk_create_reports_row_errors_and_writes_nothing(self):
+        resp = self.client.post('/api/transactions/bulk/', [
+            {'value': -10, 'date': '2025-03-01'},
+            {'value': 'abc', 'date': '2025-03-01'},
+            {'value': -10, 'date': '2025-03-01', 'category': self.foreign.pk},
+        ], format='json')
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual([error['index'] for error in resp.data['errors']], [1])
+
+        resp = self.client.post('/api/transactions/bulk/', [
+            {'value': -10, 'date': '2025-03-01'},
+            {'value': -10, 'date': '2025-03-01', 'category': self.foreign.pk},
+        ], format='json')
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(resp.data['errors'][0]['index'], 1)
+        self.assertIn('category', resp.data['errors'][0]['errors'])
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_bulk_update_and_delete(self):
+        first = Transaction.objects.create(user=self.user, value=-10, date=date(2025, 3, 1))
+        second = Transaction.objects.create(user=self.user, value=-20, date=date(2025, 3, 2))
+        theirs = Transaction.objects.create(user=self.other, value=-30, date=date(2025, 3, 2))
+
+        resp = self.client.patch('/api/transactions/bulk/', [
+            {'id': first.pk, 'value': -15, 'category': self.category.pk},
+            {'id': second.pk, 'date': '2025-04-02'},
+        ], format='json')
+        self.assertEqual(resp.status_code, 200, resp.data)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.value, first.category_id), (Decimal('-15'), self.category.pk))
+        self.assertEqual(second.date, date(2025, 4, 2))
+        self.assertEqual(rollups.find_drift(self.user.pk), [])
+
+        resp = self.client.patch('/api/transactions/bulk/', [{'id': theirs.pk, 'value': 1}], format='json')
+        self.assertEqual(resp.status_code, 400)
+
+        resp = self.client.delete('/api/transactions/bulk/', {'ids': [first.pk, second.pk, theirs.pk]}, format='json')
+        self.assertEqual(resp.data, {'deleted': 2})
+        self.assertTrue(Transaction.objects.filter(pk=theirs.pk).exists())
+        self.assertFalse(DailyRollup.objects.filter(user=self.user).exists())
+        self.assertEqual(rollups.find_drift(self.other.pk), [])
+
+
+class ImportTransactionsTestCase(TestCase):
+    """
+    Importação de extratos CSV/OFX em lotes
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='import', password='12345678')
+        self.mercado = Category.objects.create(user=self.user, name='Mercado')
+
+    def test_csv_with_brazilian_format(self):
+        content = (
+            'Data;Valor;Descrição;Categoria\n'
+            '05/03/2025;-1.234,56;Aluguel;Moradia\n'
+            '06/03/2025;R$ 3000,00;Salário;\n'
+            '07/03/2025;abc;Inválida;\n'
+            '08/03/2025;-10,00;Feira;mercado\n'
+        )
+        importer = TransactionImporter(self.user, chunk_size=2)
+        summary = importer.run(parse_csv(StringIO(content)))
+
+        self.assertEqual((summary['imported'], summary['skipped'], summary['chunks']), (3, 1, 2))
+        self.assertEqual(summary['errors'][0]['line'], 4)
+        aluguel = Transaction.objects.get(description='Aluguel')
+        self.assertEqual((aluguel.value, aluguel.date), (Decimal('-1234.56'), date(2025, 3, 5)))
+        self.assertEqual(aluguel.category.name, 'Moradia')
+        self.assertEqual(Transaction.objects.get(description='Feira').category, self.mercado)
+        self.assertEqual(rollups.find_drift(self.user.pk), [])
+
+    def test_ofx_split_across_reads(self):
+        content = (
+            'OFXHEADER:100\n<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>'
+            '<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20250301120000[-3:BRT]<TRNAMT>-42.50<MEMO>Uber</STMTTRN>'
+            '<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20250302<TRNAMT>100.00<NAME>Pix recebido</STMTTRN>'
+            '</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>'
+        )
+        rows = list(parse_ofx(StringIO(content), chunk_size=7))
+        self.assertEqual(rows, [
+            (1, {'date': '20250301120000[-3:BRT]', 'value': '-42.50', 'description': 'Uber'}),
+            (2, {'date': '20250302', 'value': '100.00', 'description': 'Pix recebido'}),
+        ])
+
+    def test_command_and_endpoint(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, encoding='utf-8') as handle:
+            handle.write('date,value,description\n2025-03-01,-5.00,Café\n')
+        self.addCleanup(os.remove, handle.name)
+        out = StringIO()
+        call_command('import_transactions', handle.name, '--user', 'import', stdout=out)
+        self.assertIn('1 transação(ões) importada(s)', out.getvalue())
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        upload = SimpleUploadedFile('extrato.csv', 'date,value\n2025-03-02,-7.00\n'.encode())
+        resp = client.post('/api/transactions/import/', {'file': upload}, format='multipart')
+        self.assertEqual(resp.status_code, 200, resp.data)
+        self.assertEqual(resp.data['imported'], 1)
+
+        upload = SimpleUploadedFile('extrato.csv', b'foo,bar\n1,2\n')
+        resp = client.post('/api/transactions/import/', {'file': upload}, format='multipart')
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 2)
+
+
+    def test_malformed_csv_is_a_client_error(self):
+        # Campo acima do limite do módulo csv (131072 caracteres)
+        content = 'date,value,description\n2025-03-01,-5.00,Café\n2025-03-02,-1.00,"' + 'x' * 200000 + '"\n'
+        with self.assertRaisesMessage(ImportRowError, 'Linha 3: CSV malformado'):
+            list(parse_csv(StringIO(content)))
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        upload = SimpleUploadedFile('extrato.csv', content.encode())
+        resp = client.post('/api/transactions/import/', {'file': upload}, format='multipart')
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn('CSV malformado', resp.data['error'])
+
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, encoding='utf-8') as handle:
+            handle.write(content)
+        self.addCleanup(os.remove, handle.name)
+        with self.assertRaisesMessage(CommandError, 'CSV malformado'):
+            call_command('import_transactions', handle.name, '--user', 'import', stdout=StringIO())
+
+
+class ExportTransactionsTestCase(TestCase):
+    """
+    Exportação em fluxo de transações em CSV e NDJSON
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='export', password='12345678')
+        self.client.force_authenticate(self.user)
+        self.category = Category.objects.create(user=self.user, name='Mercado')
+        Transaction.objects.create(user=self.user, value=-10.5, date=date(2025, 3, 1), category=self.category,
+                                   description='Pão, leite')
+        Transaction.objects.create(user=self.user, value=100, date=date(2025, 4, 1), emotional_trigger=None)
+        other = User.objects.create_user(username='outro', password='12345678')
+        Transaction.objects.create(user=other, value=-1, date=date(2025, 3, 1))
+
+    def content(self, resp):
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.streaming)
+        return b''.join(resp.streaming_content).decode()
+
+    def test_csv(self):
+        resp = self.client.get('/api/transactions/export/', {'format': 'csv'})
+        self.assertEqual(resp['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.reader(StringIO(self.content(resp))))
+        self.assertEqual(rows[0], ['id', 'date', 'value', 'description', 'category', 'category_name', 'emotional_trigger'])
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[2][1:], ['2025-03-01', '-10.50', 'Pão, leite', str(self.category.pk), 'Mercado', 'Necessidade Básica'])
+
+    def test_ndjson_matches_list_and_filters(self):
+        resp = self.client.get('/api/transactions/export/', {'format': 'ndjson', 'start': '2025-03-15'})
+        lines = [json.loads(line) for line in self.content(resp).splitlines()]
+        listed = json.loads(self.client.get('/api/transactions/', {'start': '2025-03-15'}).content)['results']
+        self.assertEqual(lines, listed)
+
+    def test_export_does_not_build_models(self):
+        with mock.patch.object(Transaction, '__init__', side_effect=AssertionError('modelo instanciado')):
+            resp = self.client.get('/api/transactions/export/', {'format': 'ndjson'})
+            self.assertEqual(len(self.content(resp).splitlines()), 2)
+
+
+class TransactionSearchTestCase(TestCase):
+    """
+    Busca na descrição: filtro ?search= da listagem e transactions/search/
+    ordenado por relevância (FTS5 no SQLite)
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='busca', password='12345678')
+        self.client.force_authenticate(self.user)
+        self.transporte = Category.objects.create(user=self.user, name='Transporte')
+        self.uber = Transaction.objects.create(user=self.user, value=-25, date=date(2025, 3, 2),
+                                               description='UBER *TRIP', category=self.transporte)
+        self.uber_eats = Transaction.objects.create(user=self.user, value=-60, date=date(2025, 3, 9),
+                                                    description='Uber Eats pedido lanche')
+        self.mercado = Transaction.objects.create(user=self.user, value=-200, date=date(2025, 3, 5),
+                                                  description='Supermercado Pão de Açúcar')
+        Transaction.objects.create(user=self.user, value=-10, date=date(2025, 3, 6), description=None)
+        other = User.objects.create_user(username='outro', password='12345678')
+        Transaction.objects.create(user=other, value=-30, date=date(2025, 3, 2), description='UBER *TRIP')
+
+    def ids(self, resp):
+        return [item['id'] for item in resp.data['results']]
+
+    def test_ranked_and_paginated(self):
+        resp = self.client.get('/api/transactions/search/', {'q': 'uber trip'})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(self.ids(resp), [self.uber.pk])
+
+        resp = self.client.get('/api/transactions/search/', {'q': 'uber', 'page_size': 1})
+        self.assertEqual(resp.data['count'], 2)
+        self.assertTrue(resp.data['count_is_exact'])
+        # A descrição mais curta casa melhor (bm25)
+        self.assertEqual(self.ids(resp), [self.uber.pk])
+        self.assertIn('rank', resp.data['results'][0])
+        self.assertEqual(resp.data['results'][0]['category_name'], 'Transporte')
+        self.assertEqual(self.ids(self.client.get(resp.data['next'])), [self.uber_eats.pk])
+
+    def test_accents_prefixes_and_filters(self):
+        resp = self.client.get('/api/transactions/search/', {'q': 'pao acu'})
+        self.assertEqual(self.ids(resp), [self.mercado.pk])
+
+        resp = self.client.get('/api/transactions/search/', {'q': 'uber', 'category': self.transporte.pk})
+        self.assertEqual(self.ids(resp), [self.uber.pk])
+
+        resp = self.client.get('/api/transactions/', {'search': 'uber', 'start': '2025-03-05'})
+        self.assertEqual(self.ids(resp), [self.uber_eats.pk])
+
+    def test_writes_update_index(self):
+        self.uber.description = 'Taxi aeroporto'
+        self.uber.save()
+        Transaction.objects.bulk_create([
+            Transaction(user=self.user, value=-5, date=date(2025, 3, 7), description='Uber moto'),
+        ])
+        self.uber_eats.delete()
+        resp = self.client.get('/api/transactions/search/', {'q': 'uber'})
+        self.assertEqual([item['description'] for item in resp.data['results']], ['Uber moto'])
+
+    def test_invalid_query(self):
+        for q in ('', '   '):
+            self.assertEqual(self.client.get('/api/transactions/search/', {'q': q}).status_code, 400)
+        # Operadores do FTS5 são tratados como texto
+        resp = self.client.get('/api/transactions/search/', {'q': '"uber" OR NEAR(* -'})
+        self.assertEqual(resp.status_code, 200)
+
+
+class TransactionListFastPathTestCase(TestCase):
+    """
+    A listagem rápida deve produzir o mesmo JSON do TransactionSerializer
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='fast', password='12345678')
+        self.client.force_authenticate(self.user)
+        category = Category.objects.create(user=self.user, name='Alimentação')
+        values = [Decimal('-0.01'), Decimal('0'), Decimal('12.5'), Decimal('-99999999.99'), Decimal('1000')]
+        for i, value in enumerate(values):
+            Transaction.objects.create(
+                user=self.user, value=value, date=date(2025, 3, i + 1),
+                description=['Café "especial"', None, '', 'ção', 'x'][i],
+                category=category if i % 2 else None,
+                emotional_trigger=[None, '', 'Impulso Emocional', 'Conforto/Compulsão', 'Necessidade Básica'][i],
+            )
+
+    def test_byte_identical_json(self):
+        resp = self.client.get('/api/transactions/')
+        queryset = Transaction.objects.filter(user=self.user).order_by('-date', '-id')
+        expected = JSONRenderer().render({
+            'count': 5, 'next': None, 'previous': None,
+            'results': TransactionSerializer(queryset, many=True).data,
+        })
+        self.assertEqual(resp.content, expected)
+
+    def test_single_query_per_page(self):
+        for i in range(30):
+            category = Category.objects.create(user=self.user, name=f'Cat {i}')
+            Transaction.objects.create(user=self.user, value=-i, date=date(2025, 4, 1), category=category)
+        # marca d'água + count + página, sem uma consulta por categoria
+        with self.assertNumQueries(3):
+            resp = self.client.get('/api/transactions/')
+        self.assertEqual(len(resp.data['results']), 20)
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command('bench_serializers', '--repeat', '1', stdout=out)
+        self.assertIn('Ganho', out.getvalue())
+
+
+class ConditionalGetTestCase(TestCase):
+    """
+    ETag/Last-Modified derivados da marca d'água de alterações do usuário
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='etag', password='12345678')
+        self.client.force_authenticate(self.user)
+        self.category = Category.objects.create(user=self.user, name='Mercado')
+        Transaction.objects.create(user=self.user, value=-10, date=date(2025, 3, 1), category=self.category)
+
+    def test_not_modified_before_any_work(self):
+        for url in ['/api/reports/dashboard/', '/api/transactions/', '/api/categories/', '/api/reports/monthly-flow/']:
+            resp = self.client.get(url)
+            self.assertEqual(resp.status_code, 200)
+            etag = resp['ETag']
+            with self.assertNumQueries(1):
+                resp = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(resp.status_code, 304, url)
+            self.assertEqual(resp.content, b'')
+            self.assertEqual(resp['ETag'], etag)
+
+    def test_writes_change_the_etag(self):
+        etag = self.client.get('/api/transactions/')['ETag']
+        self.client.patch(f'/api/categories/{self.category.pk}/', {'name': 'Feira'}, format='json')
+        resp = self.client.get('/api/transactions/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotEqual(resp['ETag'], etag)
+
+        etag = resp['ETag']
+        self.client.post('/api/transactions/bulk/', [{'value': -1, 'date': '2025-03-02'}], format='json')
+        self.assertEqual(self.client.get('/api/transactions/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_if_modified_since(self):
+        second = timezone.now().replace(microsecond=0)
+        ChangeWatermark.objects.filter(user=self.user).update(updated_at=second)
+        resp = self.client.get('/api/reports/dashboard/')
+        self.assertEqual(
+            self.client.get('/api/reports/dashboard/', HTTP_IF_MODIFIED_SINCE=resp['Last-Modified']).status_code, 304
+        )
+
+        # Escrita no mesmo segundo do Last-Modified que o cliente tem
+        ChangeWatermark.objects.filter(user=self.user).update(
+            version=F('version') + 1, updated_at=second + datetime.timedelta(microseconds=500000)
+        )
+        self.assertEqual(
+            self.client.get('/api/reports/dashboard/', HTTP_IF_MODIFIED_SINCE=resp['Last-Modified']).status_code, 200
+        )
+
+    def test_etag_depends_on_path_and_query(self):
+        etag = self.client.get('/api/reports/dashboard/', {'year': 2025, 'month': 3})['ETag']
+        self.assertEqual(self.client.get('/api/reports/dashboard/?month=3&year=2025', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get('/api/reports/dashboard/', {'year': 2025, 'month': 2}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertEqual(self.client.get('/api/reports/monthly-flow/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_other_users_etag_does_not_match(self):
+        etag = self.client.get('/api/categories/')['ETag']
+        other = User.objects.create_user(username='other', password='12345678')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get('/api/categories/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_deleting_user_cascades_cleanly(self):
+        self.user.delete()
+        self.assertFalse(DailyRollup.objects.exists())
+        self.assertFalse(ChangeWatermark.objects.exists())
+
+
+class StatelessAuthenticationTestCase(TestCase):
+    """
+    O JWT autentica sem ler o usuário do banco; status e blacklist vêm do
+    cache do Django
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='sem-estado', password='12345678')
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(self.user)}'}
+
+    def test_no_query_per_request(self):
+        self.assertEqual(self.client.get('/api/', **self.auth).status_code, 200)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/', **self.auth).status_code, 200)
+
+        # O usuário leve serve para filtros e chaves estrangeiras
+        resp = self.client.post('/api/categories/', {'name': 'Mercado'}, content_type='application/json', **self.auth)
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(Category.objects.get(pk=resp.data['id']).user, self.user)
+        self.assertEqual(self.client.get('/api/categories/', **self.auth).data['count'], 1)
+
+        user = authentication.stateless_user(self.user.pk, authentication.get_user_status(self.user.pk))
+        self.assertEqual(user, self.user)
+        with self.assertRaises(TypeError):
+            user.save()
+
+    def test_status_changes(self):
+        self.client.get('/api/', **self.auth)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/', **self.auth).status_code, 401)
+
+        self.user.delete()
+        self.assertEqual(self.client.get('/api/', **self.auth).status_code, 401)
+
+    def test_changes_reach_every_worker(self):
+        self.client.get('/api/', **self.auth)
+        # A alteração feita por outro worker apaga o status do cache compartilhado
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        authentication.forget_user(self.user.pk)
+        self.assertEqual(self.client.get('/api/', **self.auth).status_code, 401)
+
+    def test_staff_from_status(self):
+        self.assertEqual(self.client.get('/api/reports/cache-stats/', **self.auth).status_code, 403)
+        self.user.is_staff = True
+        self.user.save()
+        self.assertEqual(self.client.get('/api/reports/cache-stats/', **self.auth).status_code, 200)
+
+    def test_refresh_and_blacklist(self):
+        refresh = str(RefreshToken.for_user(self.user))
+        resp = self.client.post('/api/token/refresh/', {'refresh': refresh}, content_type='application/json')
+        self.assertEqual(resp.status_code, 200)
+        # blacklist e status já consultados
+        with self.assertNumQueries(0):
+            resp = self.client.post('/api/token/refresh/', {'refresh': refresh}, content_type='application/json')
+        self.assertEqual(resp.status_code, 200)
+        self.client.get('/api/', HTTP_AUTHORIZATION=f"Bearer {resp.data['access']}")
+
+        resp = self.client.post('/api/token/blacklist/', {'refresh': refresh}, content_type='application/json')
+        self.assertEqual(resp.status_code, 200)
+        with self.assertNumQueries(0):
+            resp = self.client.post('/api/token/refresh/', {'refresh': refresh}, content_type='application/json')
+        self.assertEqual(resp.status_code, 401)
+
+        # Com o cache vazio (despejado ou reiniciado) a blacklist vem do banco
+        cache.clear()
+        resp = self.client.post('/api/token/refresh/', {'refresh': refresh}, content_type='application/json')
+        self.assertEqual(resp.status_code, 401)
+
+
+class AsyncReportsTestCase(TestCase):
+    """
+    As versões assíncronas dos relatórios devem responder o mesmo que as
+    síncronas, autenticando pelo JWT
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='assincrono', password='12345678')
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(self.user)}'}
+        mercado = Category.objects.create(user=self.user, name='Mercado')
+        Transaction.objects.create(user=self.user, value=1000, date=date(2025, 3, 1))
+        Transaction.objects.create(user=self.user, value=-100, date=date(2025, 3, 5), category=mercado)
+        Transaction.objects.create(user=self.user, value=-250, date=date(2025, 3, 5),
+                                   emotional_trigger='Impulso Emocional')
+        Transaction.objects.create(user=self.user, value=-40, date=date(2025, 4, 2), category=mercado)
+
+    def assertSameAsSync(self, sync_url, async_url, params):
+        expected = self.client.get(sync_url, params, **self.auth)
+        resp = self.client.get(async_url, params, **self.auth)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json(), expected.json())
+
+    def test_matches_sync_reports(self):
+        self.assertSameAsSync('/api/reports/dashboard/', '/api/reports/async/dashboard/',
+                              {'year': 2025, 'month': 3})
+        self.assertSameAsSync('/api/reports/trend/', '/api/reports/async/trend/',
+                              {'start': '2025-01-01', 'end': '2025-06-01', 'granularity': 'week'})
+        self.assertSameAsSync('/api/monthly-summary/', '/api/reports/async/monthly-summary/', {})
+        self.assertSameAsSync('/api/monthly-summary/', '/api/reports/async/monthly-summary/',
+                              {'year': 2025, 'month': 3})
+
+    def test_dashboard_single_query(self):
+        params = {'year': 2025, 'month': 3}
+        # marca d'água + consulta agrupada (status do usuário já em cache)
+        self.client.get('/api/reports/async/trend/', **self.auth)
+        with self.assertNumQueries(2):
+            self.client.get('/api/reports/async/dashboard/', params, **self.auth)
+
+    def test_conditional_get(self):
+        params = {'year': 2025, 'month': 3}
+        resp = self.client.get('/api/reports/async/dashboard/', params, **self.auth)
+        etag = resp['ETag']
+        resp = self.client.get('/api/reports/async/dashboard/', params, HTTP_IF_NONE_MATCH=etag, **self.auth)
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(resp['ETag'], etag)
+        resp = self.client.get('/api/reports/async/dashboard/', {'year': 2025, 'month': 4},
+                               HTTP_IF_NONE_MATCH=etag, **self.auth)
+        self.assertEqual(resp.status_code, 200)
+
+        Transaction.objects.create(user=self.user, value=500, date=date(2025, 3, 10))
+        resp = self.client.get('/api/reports/async/dashboard/', params, HTTP_IF_NONE_MATCH=etag, **self.auth)
+        self.assertEqual(resp.status_code, 200)
+
+    def test_requires_authentication(self):
+        self.assertEqual(self.client.get('/api/reports/async/dashboard/').status_code, 401)
+        resp = self.client.get('/api/reports/async/dashboard/', HTTP_AUTHORIZATION='Bearer invalido')
+        self.assertEqual(resp.status_code, 401)
+
+    def test_invalid_params(self):
+        resp = self.client.get('/api/reports/async/dashboard/', {'month': 13}, **self.auth)
+        self.assertEqual(resp.status_code, 400)
+        resp = self.client.get('/api/reports/async/trend/', {'granularity': 'year'}, **self.auth)
+        self.assertEqual(resp.status_code, 400)
+
+    def test_cached_until_next_write(self):
+        params = {'year': 2025, 'month': 3}
+        self.client.get('/api/reports/async/dashboard/', params, **self.auth)
+        # Somente a marca d'água: o status do usuário do token também já está em cache
+        with self.assertNumQueries(1):
+            self.client.get('/api/reports/async/dashboard/', params, **self.auth)
+
+        Transaction.objects.create(user=self.user, value=500, date=date(2025, 3, 10))
+        resp = self.client.get('/api/reports/async/dashboard/', params, **self.auth)
+        self.assertEqual(resp.json()['summary']['receitas'], 1500)
+
+
+class BenchmarkSuiteTestCase(TestCase):
+    """
+    Gerador de dados sintéticos e orçamento de consultas por rota
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command('seed_synthetic', users=1, transactions=400, days=90, seed=1, stdout=StringIO())
+        cls.user = User.objects.get(username='synthetic00000')
+
+    def test_seed_synthetic(self):
+        transactions = Transaction.objects.filter(user=self.user)
+        self.assertEqual(transactions.count(), 400)
+        self.assertTrue(transactions.filter(value__gt=0).exists())
+        triggers = set(transactions.values_list('emotional_trigger', flat=True))
+        self.assertGreater(len(triggers), 4)
+        self.assertEqual(rollups.find_drift(self.user.pk), [])
+
+        with self.assertRaises(CommandError):
+            call_command('seed_synthetic', users=1, transactions=10, stdout=StringIO())
+
+    def test_every_route_has_a_scenario(self):
+        for name in benchmarks.route_names():
+            self.assertTrue(name in benchmarks.SCENARIOS or name in benchmarks.SKIPPED, name)
+
+    def test_query_budgets(self):
+        results = benchmarks.run_suite(self.user, iterations=1)
+        self.assertEqual(benchmarks.check_budgets(results, benchmarks.load_budgets()), [])
+        # As rotas de escrita são medidas sem alterar o banco
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 400)
+
+
+class MetricsTestCase(TestCase):
+    """
+    Métricas por rota no formato do Prometheus, somadas entre os workers
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.settings_override = override_settings(METRICS_DIR=directory.name, METRICS_FLUSH_INTERVAL=0)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        metrics.registry.reset()
+        self.addCleanup(metrics.registry.reset)
+
+        self.user = User.objects.create_user(username='metricas', password='12345678')
+        self.staff = User.objects.create_user(username='operador', password='12345678', is_staff=True)
+        self.client = APIClient()
+
+    def test_staff_only(self):
+        self.assertEqual(self.client.get('/metrics/').status_code, 401)
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get('/metrics/').status_code, 403)
+        self.client.force_authenticate(self.staff)
+        resp = self.client.get('/metrics/', HTTP_ACCEPT='text/plain')
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp['Content-Type'].startswith('text/plain'))
+
+    def test_records_latency_and_queries_per_route(self):
+        self.client.force_authenticate(self.user)
+        for _ in range(2):
+            self.client.get('/api/reports/monthly-flow/', {'year': 2025, 'month': 3})
+        self.client.get('/api/rota-inexistente/')
+
+        self.client.force_authenticate(self.staff)
+        body = self.client.get('/metrics/').content.decode()
+        self.assertIn('http_request_duration_seconds_count{view="monthly-flow"} 2', body)
+        self.assertIn('http_request_duration_seconds_bucket{view="monthly-flow",le="+Inf"} 2', body)
+        self.assertIn('http_responses_total{view="monthly-flow",status="200"} 2', body)
+        self.assertIn('http_responses_total{view="<unresolved>",status="404"} 1', body)
+        queries = re.search(r'http_request_db_queries_sum\{view="monthly-flow"\} (\d+)', body)
+        self.assertGreater(int(queries.group(1)), 0)
+        self.assertIn('db_query_duration_seconds_total{view="monthly-flow"}', body)
+
+    async def test_async_routes(self):
+        middleware = metrics.MetricsMiddleware(self.async_get_response)
+        self.assertTrue(iscoroutinefunction(middleware))
+
+        auth = {'AUTHORIZATION': f'Bearer {AccessToken.for_user(self.user)}'}
+        resp = await self.async_client.get('/api/reports/async/dashboard/', {'year': 2025, 'month': 3}, headers=auth)
+        self.assertEqual(resp.status_code, 200)
+        series = metrics.registry.series['async-dashboard']
+        self.assertEqual(series['count'], 1)
+        # marca d'água + consulta agrupada, feitas na thread do sync_to_async
+        self.assertGreaterEqual(series['queries'], 2)
+
+    async def async_get_response(self, request):
+        return None
+
+    def test_aggregates_worker_files(self):
+        other = metrics.empty_series()
+        other['count'] = 3
+        other['latency_buckets'][0] = 3
+        other['query_buckets'][1] = 3
+        other['queries'] = 6
+        other['statuses'] = {'200': 3}
+        with open(os.path.join(metrics.registry.directory, '999999.json'), 'w') as worker_file:
+            json.dump({'dashboard': other}, worker_file)
+
+        self.client.force_authenticate(self.user)
+        self.client.get('/api/reports/dashboard/')
+        self.client.force_authenticate(self.staff)
+        body = self.client.get('/metrics/').content.decode()
+        self.assertIn('http_request_duration_seconds_count{view="dashboard"} 4', body)
+        self.assertIn('http_responses_total{view="dashboard",status="200"} 4', body)
+
+    def test_aggregates_pool_stats(self):
+        finished = subprocess.Popen(['true'])
+        finished.wait()
+        # Worker que já terminou: o arquivo dele é apagado e fica fora da soma
+        for pid in (os.getpid(), os.getppid(), finished.pid):
+            metrics.write_json(metrics.registry.pool_path(pid), {
+                'pool_size': 4, 'pool_available': 1, 'requests_waiting': 2,
+                'requests_wait_ms': 1500, 'requests_errors': 3, 'usage_ms': 10,
+            })
+        self.client.force_authenticate(self.staff)
+        body = self.client.get('/metrics/').content.decode()
+        self.assertFalse(os.path.exists(metrics.registry.pool_path(finished.pid)))
+        self.assertIn('db_pool_connections 8\n', body)
+        self.assertIn('db_pool_requests_waiting 4\n', body)
+        self.assertIn('db_pool_wait_seconds_total 3.0\n', body)
+        self.assertIn('# TYPE db_pool_timeouts_total counter\ndb_pool_timeouts_total 6\n', body)
+        self.assertNotIn('usage', body)
+
+
+class ConnectionPoolTestCase(TestCase):
+    """
+    Modo de conexão escolhido pela configuração e health check do banco
+    """
+    postgresql = {'ENGINE': 'django.db.backends.postgresql', 'NAME': 'financeiro', 'OPTIONS': {}}
+
+    def test_pool_config(self):
+        with mock.patch.object(db, 'pool_supported', return_value=True):
+            config = db.database_config(self.postgresql, pool=True, max_size=5, timeout=2.0)
+        self.assertEqual(config['CONN_MAX_AGE'], 0)
+        self.assertFalse(config['CONN_HEALTH_CHECKS'])
+        self.assertEqual(config['OPTIONS']['pool']['max_size'], 5)
+        self.assertEqual(config['OPTIONS']['pool']['timeout'], 2.0)
+        self.assertIs(config['OPTIONS']['pool']['check'], db.check_connection)
+        self.assertEqual(self.postgresql['OPTIONS'], {})
+
+    def test_persistent_fallback(self):
+        with mock.patch.object(db, 'pool_supported', return_value=False):
+            with self.assertWarns(UserWarning):
+                config = db.database_config(self.postgresql, pool=True, conn_max_age=60)
+        self.assertNotIn('pool', config['OPTIONS'])
+        self.assertEqual(config['CONN_MAX_AGE'], 60)
+        self.assertTrue(config['CONN_HEALTH_CHECKS'])
+
+        sqlite = db.database_config({'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}, pool=True)
+        self.assertNotIn('pool', sqlite['OPTIONS'])
+        self.assertEqual(db.pool_stats(), {})
+
+    def test_health(self):
+        resp = self.client.get('/health/')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json(), {'status': 'ok'})
+
+        with mock.patch.object(health, 'connections') as connections:
+            connections.__getitem__.return_value.cursor.side_effect = Exception('sem conexão')
+            with self.assertLogs('finance_mvp.health', 'ERROR'):
+                resp = self.client.get('/health/', HTTP_AUTHORIZATION='Bearer invalido')
+            self.assertEqual(resp.status_code, 503)
+            self.assertEqual(resp.json(), {'status': 'erro'})
+
+            staff = User.objects.create_user(username='operador', password='12345678', is_staff=True)
+            with self.assertLogs('finance_mvp.health', 'ERROR'):
+                resp = self.client.get('/health/', HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(staff)}')
+        self.assertEqual(resp.status_code, 503)
+        self.assertEqual(resp.json()['error'], 'sem conexão')
+
+
+class MonthlySnapshotTestCase(TestCase):
+    """
+    Resumo dos meses fechados: comando snapshot_months, leituras pelos
+    snapshots e invalidação nas escritas
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='snapshot', password='12345678')
+        self.client.force_authenticate(self.user)
+        self.current = snapshots.current_month()
+        self.last = (self.current - datetime.timedelta(days=1)).replace(day=1)
+        self.older = (self.last - datetime.timedelta(days=40)).replace(day=1)
+        Transaction.objects.create(user=self.user, value=3000, date=self.older + datetime.timedelta(days=4))
+        Transaction.objects.create(user=self.user, value=-500, date=self.older + datetime.timedelta(days=9))
+        Transaction.objects.create(user=self.user, value=-120, date=self.last + datetime.timedelta(days=2))
+        Transaction.objects.create(user=self.user, value=-80, date=self.current)
+        other = User.objects.create_user(username='outro', password='12345678')
+        Transaction.objects.create(user=other, value=-10, date=self.last)
+
+    def summary(self, month):
+        resp = self.client.get('/api/monthly-summary/', {'year': month.year, 'month': month.month})
+        self.assertEqual(resp.status_code, 200)
+        return resp.json()
+
+    def test_command_and_reads(self):
+        out = StringIO()
+        call_command('snapshot_months', processes=0, range_size=1, stdout=out)
+        self.assertIn('3 snapshot(s) gravado(s)', out.getvalue())
+        snapshot = MonthlySnapshot.objects.get(user=self.user, month=self.older)
+        self.assertEqual((snapshot.income, snapshot.expense, snapshot.count), (Decimal('3000.00'), Decimal('-500.00'), 2))
+        self.assertFalse(MonthlySnapshot.objects.filter(month=self.current).exists())
+
+        call_command('snapshot_months', processes=0, stdout=out)
+        self.assertIn('0 snapshot(s) gravado(s)', out.getvalue())
+
+        # Mês fechado lido do snapshot, sem somar os agregados diários
+        DailyRollup.objects.filter(user=self.user, day__lt=self.current).delete()
+        self.assertEqual(self.summary(self.older), {'receitas': 3000.0, 'despesas': 500.0, 'saldo': 2500.0})
+        self.assertEqual(self.summary(self.current), {'receitas': 0.0, 'despesas': 80.0, 'saldo': -80.0})
+
+        resp = self.client.get('/api/reports/monthly-history/', {
+            'start': f'{self.older:%Y-%m}', 'end': f'{self.current:%Y-%m}',
+        })
+        months = resp.json()['months']
+        self.assertEqual([item['month'] for item in months][0], f'{self.older:%Y-%m}')
+        self.assertEqual(months[-1], {'month': f'{self.last:%Y-%m}', 'receitas': 0.0, 'despesas': 120.0, 'saldo': -120.0})
+        # Os meses sem transações entre os dois voltam zerados, sem snapshot gravado
+        self.assertEqual(
+            {item['month'] for item in months if item['saldo'] != 0},
+            {f'{self.older:%Y-%m}', f'{self.last:%Y-%m}'},
+        )
+        self.assertEqual(MonthlySnapshot.objects.filter(user=self.user).count(), 2)
+
+        resp = self.client.get('/api/reports/monthly-history/', {'start': '2020-01', 'end': '2040-01'})
+        self.assertEqual(resp.status_code, 400)
+
+    def test_writes_invalidate(self):
+        self.assertEqual(self.summary(self.last)['despesas'], 120.0)
+        self.assertTrue(MonthlySnapshot.objects.filter(user=self.user, month=self.last).exists())
+
+        Transaction.objects.create(user=self.user, value=-30, date=self.last + datetime.timedelta(days=5))
+        self.assertFalse(MonthlySnapshot.objects.filter(user=self.user, month=self.last).exists())
+        self.assertEqual(self.summary(self.last)['despesas'], 150.0)
+
+        resp = self.client.post('/api/transactions/bulk/', [
+            {'value': '-50.00', 'date': str(self.last)},
+        ], format='json')
+        self.assertEqual(resp.status_code, 201, resp.data)
+        self.assertEqual(self.summary(self.last)['despesas'], 200.0)
+
+        rollups.rebuild([self.user.pk])
+        self.assertFalse(MonthlySnapshot.objects.filter(user=self.user).exists())
+
+    def test_reads_do_not_store_empty_months(self):
+        start = datetime.date(self.older.year - 2, self.older.month, 1)
+        resp = self.client.get('/api/reports/monthly-history/', {'start': f'{start:%Y-%m}', 'end': f'{self.older:%Y-%m}'})
+        self.assertEqual(len(resp.json()['months']), 24)
+        self.assertEqual(resp.json()['months'][0], {'month': f'{start:%Y-%m}', 'receitas': 0.0, 'despesas': 0.0, 'saldo': 0.0})
+        self.assertFalse(MonthlySnapshot.objects.filter(user=self.user).exists())
+
+    def test_concurrent_write_discards_snapshot(self):
+        totals = snapshots.monthly_totals
+
+        def write_meanwhile(queryset):
+            rows = list(totals(queryset))
+            watermarks.touch(self.user.pk)
+            return rows
+
+        with mock.patch.object(snapshots, 'monthly_totals', side_effect=write_meanwhile):
+            written = snapshots.snapshot_users(self.user.pk, self.user.pk + 1)
+        self.assertEqual(written, 0)
+        self.assertFalse(MonthlySnapshot.objects.filter(user=self.user).exists())
+
+
+class JobQueueTestCase(TestCase):
+    """
+    Fila de jobs no banco: API, execução pelo run_workers, novas tentativas e
+    recuperação de jobs abandonados
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='jobs', password='12345678')
+        self.client.force_authenticate(self.user)
+        self.category = Category.objects.create(user=self.user, name='Mercado')
+        Transaction.objects.create(user=self.user, value=-150, date=date(2025, 3, 2), category=self.category)
+        Transaction.objects.create(user=self.user, value=3000, date=date(2025, 3, 5))
+
+    def run_workers(self):
+        out = StringIO()
+        call_command('run_workers', processes=0, burst=True, stdout=out)
+        return out.getvalue()
+
+    def test_enqueue_and_run(self):
+        params = {'dimensions': 'category,sign', 'measures': 'sum,avg'}
+        resp = self.client.post('/api/jobs/', {'task': 'pivot', 'payload': params}, format='json')
+        self.assertEqual(resp.status_code, 202, resp.data)
+        self.assertEqual(resp.data['status'], Job.QUEUED)
+
+        self.assertIn('1 job(s) executado(s)', self.run_workers())
+        job = self.client.get(f"/api/jobs/{resp.data['id']}/").data
+        self.assertEqual((job['status'], job['progress'], job['attempts']), (Job.SUCCEEDED, 100, 1))
+        # Mesmo JSON da rota síncrona
+        report = self.client.get('/api/reports/pivot/', params)
+        self.assertEqual(job['result'], json.loads(report.content))
+
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user(username='outro', password='12345678'))
+        self.assertEqual(other.get(f"/api/jobs/{resp.data['id']}/").status_code, 404)
+        self.assertEqual(other.get('/api/jobs/').data['count'], 0)
+
+        resp = self.client.post('/api/jobs/', {'task': 'desconhecida'}, format='json')
+        self.assertEqual(resp.status_code, 400)
+        resp = self.client.post('/api/jobs/', {'task': 'pivot', 'payload': {'dimensions': 'x'}}, format='json')
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn('Dimensão inválida', resp.data['error'][0])
+
+    def test_background_import(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(JOBS_DIR=directory):
+            upload = SimpleUploadedFile('extrato.csv', 'date,value\n2025-03-02,-7.00\n2025-03-03,-8.00\n'.encode())
+            resp = self.client.post('/api/transactions/import/', {'file': upload, 'background': 'true'}, format='multipart')
+            self.assertEqual(resp.status_code, 202, resp.data)
+            self.assertEqual(resp.data['payload'], {'format': 'csv', 'encoding': 'utf-8-sig'})
+            self.assertEqual(len(os.listdir(directory)), 1)
+
+            self.run_workers()
+            job = Job.objects.get(pk=resp.data['id'])
+            self.assertEqual(job.status, Job.SUCCEEDED)
+            self.assertEqual(job.result['imported'], 2)
+            self.assertEqual(os.listdir(directory), [])
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 4)
+        self.assertEqual(rollups.find_drift(self.user.pk), [])
+
+    def test_expired_import_removes_upload(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(JOBS_DIR=directory):
+            upload = SimpleUploadedFile('extrato.csv', b'date,value\n2025-03-02,-7.00\n')
+            resp = self.client.post('/api/transactions/import/', {'file': upload, 'background': 'true'}, format='multipart')
+            self.assertEqual(len(os.listdir(directory)), 1)
+
+            # O processo foi encerrado no meio da tarefa, sem passar pelo finally
+            jobs.claim(1)
+            Job.objects.filter(pk=resp.data['id']).update(locked_until=timezone.now() - datetime.timedelta(seconds=1))
+            self.assertEqual(jobs.recover_expired(), 1)
+            self.assertEqual(Job.objects.get(pk=resp.data['id']).status, Job.FAILED)
+            self.assertEqual(os.listdir(directory), [])
+
+    @override_settings(JOBS_RETRY_DELAY=30)
+    def test_retry_and_failure(self):
+        calls = []
+
+        def flaky(context):
+            calls.append(context.job.attempts)
+            raise ValueError('falha temporária')
+
+        def invalid(context):
+            raise jobs.JobError('Arquivo inválido.')
+
+        with mock.patch.dict(jobs.TASKS, {
+            'flaky': jobs.Task('flaky', flaky, None, 2),
+            'invalid': jobs.Task('invalid', invalid, None, None),
+        }):
+            job = jobs.enqueue('flaky', user=self.user)
+            self.run_workers()
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+            self.assertIn('falha temporária', job.error)
+            # Espera antes da nova tentativa
+            self.assertGreater(job.run_at, timezone.now())
+            self.assertEqual(jobs.claim(1), [])
+
+            Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+            self.run_workers()
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+            self.assertEqual(calls, [1, 2])
+
+            job = jobs.enqueue('invalid', user=self.user)
+            self.run_workers()
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts, job.error), (Job.FAILED, 1, 'Arquivo inválido.'))
+
+        with self.assertRaises(ValueError):
+            jobs.enqueue('desconhecida')
+
+    def test_claim_and_recover_expired(self):
+        job = jobs.enqueue('rebuild_rollups', user=self.user, timeout=60)
+        (job_id, attempt, timeout), = jobs.claim(5, worker='teste')
+        self.assertEqual((job_id, attempt, timeout), (job.pk, 1, 60))
+        self.assertEqual(jobs.claim(5), [])
+
+        # O worker caiu: o prazo vence e o job volta para a fila
+        Job.objects.filter(pk=job.pk).update(locked_until=timezone.now() - datetime.timedelta(seconds=1))
+        self.assertEqual(jobs.recover_expired(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertIn('interrompido', job.error)
+
+        # Uma execução vencida não sobrescreve o resultado da seguinte
+        self.assertFalse(jobs.finish(job.pk, attempt, {'users': 1}))
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        self.run_workers()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.result), (Job.SUCCEEDED, 2, {'users': 1}))
+
+
+class ProfilingTestCase(TestCase):
+    """
+    Profiling sob demanda: só para staff, guardado em um buffer circular
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        override = override_settings(PROFILING_DIR=directory.name, PROFILING_MAX_ENTRIES=2)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.staff = User.objects.create_user(username='operador', password='12345678', is_staff=True)
+        self.user = User.objects.create_user(username='comum', password='12345678')
+        Transaction.objects.create(user=self.staff, value=-10, date=date(2025, 3, 5))
+        self.client = APIClient()
+
+    def token(self, user):
+        return {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(user)}'}
+
+    def test_ignored_for_non_staff(self):
+        resp = self.client.get('/api/reports/dashboard/', {'_profile': 1}, **self.token(self.user))
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotIn('X-Profile-Id', resp)
+        self.assertEqual(profiling.stored_profile_ids(), [])
+
+    def test_profile_is_stored(self):
+        resp = self.client.get(
+            '/api/reports/dashboard/', {'year': 2025, 'month': 3},
+            HTTP_X_PROFILE='1', **self.token(self.staff)
+        )
+        self.assertEqual(resp.status_code, 200)
+        profile_id = resp['X-Profile-Id']
+
+        detail = self.client.get(f'/profiles/{profile_id}/', **self.token(self.staff))
+        self.assertEqual(detail.status_code, 200)
+        self.assertEqual(detail.data['view'], 'dashboard')
+        self.assertEqual(detail.data['sql_count'], len(detail.data['sql']))
+        self.assertTrue(any('core_dailyrollup' in query['sql'] for query in detail.data['sql']))
+        self.assertTrue(detail.data['explain'])
+        self.assertIn('cumulative', detail.data['profile'])
+
+        self.assertEqual(self.client.get(f'/profiles/{profile_id}/', **self.token(self.user)).status_code, 403)
+        self.assertEqual(self.client.get('/profiles/../etc/', **self.token(self.staff)).status_code, 404)
+
+    async def test_async_routes(self):
+        middleware = profiling.ProfilingMiddleware(self.async_get_response)
+        self.assertTrue(iscoroutinefunction(middleware))
+
+        auth = {'AUTHORIZATION': f'Bearer {AccessToken.for_user(self.staff)}', 'X-PROFILE': '1'}
+        profiles = {}
+        for url in ['/api/reports/dashboard/', '/api/reports/async/dashboard/']:
+            resp = await self.async_client.get(url, {'year': 2025, 'month': 3}, headers=auth)
+            self.assertEqual(resp.status_code, 200)
+            profiles[url] = profile = profiling.load(resp['X-Profile-Id'])
+            self.assertTrue(any('core_dailyrollup' in query['sql'] for query in profile['sql']), url)
+        # A view síncrona roda na thread perfilada
+        self.assertIn('summarize', profiles['/api/reports/dashboard/']['profile'])
+
+    async def async_get_response(self, request):
+        return None
+
+    def test_ring_buffer_is_bounded(self):
+        ids = []
+        for _ in range(3):
+            resp = self.client.get('/api/transactions/', {'_profile': 1}, **self.token(self.staff))
+            ids.append(resp['X-Profile-Id'])
+        self.assertEqual(profiling.stored_profile_ids(), ids[1:])
+
+        listing = self.client.get('/profiles/', **self.token(self.staff))
+        self.assertEqual([item['id'] for item in listing.data], ids[:0:-1])
+
+
+class RenderingTestCase(TestCase):
+    """
+    O renderer JSON padrão (orjson) deve gerar o mesmo JSON do DRF, com ou sem o orjson
+    """
+
+    payload = {
+        'valor': Decimal('-10.50'),
+        'dia': date(2025, 3, 1),
+        'criado': datetime.datetime(2025, 3, 1, 12, 30, 0, 123456, tzinfo=datetime.timezone.utc),
+        'hora': datetime.time(8, 15),
+        'texto': 'Pão de açúcar \u2028',
+        'lista': [1, 2.5, None, True, ('a', Decimal('3'))],
+    }
+
+    def test_matches_drf_renderer(self):
+        expected = JSONRenderer().render(self.payload)
+        self.assertEqual(renderers.FastJSONRenderer().render(self.payload), expected)
+        with mock.patch.object(renderers, 'orjson', None):
+            self.assertEqual(renderers.FastJSONRenderer().render(self.payload), expected)
+
+    def test_falls_back_to_drf(self):
+        # Inteiros acima de 64 bits e indentação pedida no Accept
+        data = {'grande': 2 ** 70}
+        self.assertEqual(renderers.FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(
+            renderers.FastJSONRenderer().render(self.payload, 'application/json; indent=2'),
+            JSONRenderer().render(self.payload, 'application/json; indent=2'),
+        )
+
+    def test_default_renderer(self):
+        user = User.objects.create_user(username='renderer', password='12345678')
+        Transaction.objects.create(user=user, value=1000, date=date(2025, 3, 1))
+        client = APIClient()
+        client.force_authenticate(user)
+        resp = client.get('/api/reports/dashboard/', {'year': 2025, 'month': 3})
+        self.assertIsInstance(resp.accepted_renderer, renderers.FastJSONRenderer)
+        self.assertEqual(resp.content, JSONRenderer().render(resp.data))
+
+    @unittest.skipUnless(renderers.msgpack, 'msgpack não instalado')
+    def test_messagepack(self):
+        user = User.objects.create_user(username='msgpack', password='12345678')
+        Transaction.objects.create(user=user, value=-10.5, date=date(2025, 3, 1))
+        client = APIClient()
+        client.force_authenticate(user)
+        resp = client.get('/api/transactions/', HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(resp['Content-Type'], 'application/msgpack')
+        expected = client.get('/api/transactions/').json()
+        self.assertEqual(renderers.msgpack.unpackb(resp.content), expected)
+
+
+class ResponseCompressionTestCase(TestCase):
+    """
+    Respostas grandes e exportações são comprimidas conforme o Accept-Encoding
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='compressao', password='12345678')
+        Transaction.objects.bulk_create([
+            Transaction(user=self.user, value=-10 - i, date=date(2025, 3, 1), description=f'Compra {i}')
+            for i in range(30)
+        ])
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_large_list_is_gzipped(self):
+        plain = self.client.get('/api/transactions/')
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertGreater(len(plain.content), 1024)
+
+        resp = self.client.get('/api/transactions/', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(resp['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', resp['Vary'])
+        self.assertTrue(resp['ETag'].startswith('W/'))
+        self.assertEqual(json.loads(gzip.decompress(resp.content)), plain.json())
+
+    def test_small_response_is_not_compressed(self):
+        resp = self.client.get('/api/categories/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertNotIn('Content-Encoding', resp)
+
+    def test_export_stream_is_gzipped(self):
+        plain = b''.join(self.client.get('/api/transactions/export/', {'format': 'csv'}).streaming_content)
+        resp = self.client.get('/api/transactions/export/', {'format': 'csv'}, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(resp['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(resp.streaming_content)), plain)
+
+    def test_brotli_preferred_when_installed(self):
+        resp = self.client.get('/api/transactions/', HTTP_ACCEPT_ENCODING='gzip, br')
+        if compression.brotli is None:
+            self.assertEqual(resp['Content-Encoding'], 'gzip')
+        else:
+            self.assertEqual(resp['Content-Encoding'], 'br')
+            self.assertEqual(json.loads(compression.brotli.decompress(resp.content)),
+                             self.client.get('/api/transactions/').json())
+        self.assertEqual(compression.accepted_encodings('gzip;q=1.0, br;q=0'), {'gzip'})
+
+
+@override_settings(SYNC_OVERLAP=0)
+class SyncTestCase(TestCase):
+    """
+    Sync incremental: só o que mudou desde o cursor, com exclusões e em páginas
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='sync', password='12345678')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.category = Category.objects.create(user=self.user, name='Mercado')
+        self.first = Transaction.objects.create(user=self.user, value=-10, date=date(2025, 3, 1), category=self.category)
+        self.second = Transaction.objects.create(user=self.user, value=100, date=date(2025, 3, 2))
+        other = User.objects.create_user(username='outro', password='12345678')
+        Transaction.objects.create(user=other, value=-1, date=date(2025, 3, 1))
+
+    def sync(self, cursor=None):
+        resp = self.client.get('/api/sync/', {'since': cursor} if cursor else {})
+        self.assertEqual(resp.status_code, 200)
+        return resp.json()
+
+    def test_full_then_incremental(self):
+        full = self.sync()
+        self.assertTrue(full['reset'])
+        self.assertFalse(full['has_more'])
+        self.assertEqual([row['id'] for row in full['transactions']], [self.first.pk, self.second.pk])
+        self.assertEqual(full['transactions'][0]['category_name'], 'Mercado')
+        self.assertEqual(full['categories'], [{'id': self.category.pk, 'name': 'Mercado'}])
+
+        created = Transaction.objects.create(user=self.user, value=-5, date=date(2025, 3, 3))
+        self.second.value = 150
+        self.second.save()
+        deleted_id = self.first.pk
+        self.first.delete()
+        changes = self.sync(full['cursor'])
+        self.assertFalse(changes['reset'])
+        self.assertEqual({row['id'] for row in changes['transactions']}, {created.pk, self.second.pk})
+        self.assertEqual(changes['categories'], [])
+        self.assertEqual(changes['deleted'], {'transactions': [deleted_id], 'categories': []})
+
+        self.assertEqual(self.sync(changes['cursor'])['transactions'], [])
+
+    def test_pages(self):
+        # bulk_update grava o mesmo updated_at em todas: o cursor desempata pelo id
+        Transaction.objects.bulk_create([
+            Transaction(user=self.user, value=-i, date=date(2025, 3, 5)) for i in range(1, 4)
+        ])
+        ids = list(Transaction.objects.filter(user=self.user).values_list('pk', flat=True))
+        self.client.patch('/api/transactions/bulk/', [{'id': pk, 'description': 'Lote'} for pk in ids], format='json')
+
+        seen, pages, cursor = [], [], None
+        with override_settings(SYNC_PAGE_SIZE=2):
+            while True:
+                page = self.sync(cursor)
+                pages.append(page)
+                seen += [row['id'] for row in page['transactions']]
+                cursor = page['cursor']
+                if not page['has_more']:
+                    break
+        self.assertEqual(sorted(seen), sorted(ids))
+        self.assertEqual(len(pages), 3)
+        self.assertEqual([len(page['categories']) for page in pages], [1, 0, 0])
+        self.assertEqual(self.sync(cursor)['transactions'], [])
+
+    def test_bulk_and_category_writes(self):
+        cursor = self.sync()['cursor']
+        self.client.patch('/api/transactions/bulk/', [{'id': self.second.pk, 'value': '200.00'}], format='json')
+        self.client.delete('/api/transactions/bulk/', {'ids': [self.first.pk]}, format='json')
+        changes = self.sync(cursor)
+        self.assertEqual([row['id'] for row in changes['transactions']], [self.second.pk])
+        self.assertEqual(changes['transactions'][0]['value'], '200.00')
+        self.assertEqual(changes['deleted']['transactions'], [self.first.pk])
+
+        # Renomear ou apagar a categoria altera as transações dela
+        third = Transaction.objects.create(user=self.user, value=-3, date=date(2025, 3, 3), category=self.category)
+        cursor = changes['cursor']
+        self.client.patch(f'/api/categories/{self.category.pk}/', {'name': 'Feira'}, format='json')
+        changes = self.sync(cursor)
+        self.assertEqual([(row['id'], row['category_name']) for row in changes['transactions']], [(third.pk, 'Feira')])
+
+        self.client.delete(f'/api/categories/{self.category.pk}/')
+        changes = self.sync(changes['cursor'])
+        self.assertEqual([(row['id'], row['category']) for row in changes['transactions']], [(third.pk, None)])
+        self.assertEqual(changes['deleted']['categories'], [self.category.pk])
+
+    def test_expired_and_invalid_cursor(self):
+        self.first.delete()
+        old = sync.encode_cursor(sync.Cursor(timezone.now() - datetime.timedelta(days=91), 0, None))
+        changes = self.sync(old)
+        self.assertTrue(changes['reset'])
+        self.assertEqual([row['id'] for row in changes['transactions']], [self.second.pk])
+        self.assertEqual(changes['deleted']['transactions'], [])
+
+        self.assertEqual(self.client.get('/api/sync/', {'since': 'abc'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/sync/', {'since': '1.2'}).status_code, 400)
+
+        Tombstone.objects.update(deleted_at=timezone.now() - datetime.timedelta(days=91))
+        call_command('prune_tombstones', stdout=StringIO())
+        self.assertFalse(Tombstone.objects.exists())
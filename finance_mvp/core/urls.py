@@ -1,9 +1,13 @@
 from django.urls import path, include
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView, TokenBlacklistView
 from rest_framework.routers import DefaultRouter
+from . import async_views
 from .views import (
     CategoryViewSet,
+    BudgetViewSet,
+    JobViewSet,
     MonthlySummaryView,    
+    MonthlyHistoryView,
     ExpensesByCategoryView,
     EmotionalSpendingView,
     IncomesByCategoryView,
@@ -13,13 +17,21 @@ from .views import (
     MonthlyFlowView,
     NeedsVsWantsView,
     CategoryExpenseView,
-    EmotionalExpenseView
+    EmotionalExpenseView,
+    DashboardView,
+    TrendView,
+    PivotView,
+    BalanceView,
+    ReportCacheStatsView,
+    SyncView,
    
 )
 router = DefaultRouter()
 router.register(r'categories', CategoryViewSet, basename='category')
 router.register(r'transactions', TransactionViewSet, basename='transaction')
 router.register(r'users', UserViewSet, basename='user')
+router.register(r'budgets', BudgetViewSet, basename='budget')
+router.register(r'jobs', JobViewSet, basename='job')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -29,8 +41,12 @@ urlpatterns = [
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('token/blacklist/', TokenBlacklistView.as_view(),name='token_blacklist'),
 
+    # Sync incremental para o cache local do cliente
+    path('sync/', SyncView.as_view(), name='sync'),
+
 
     path('monthly-summary/', MonthlySummaryView.as_view(), name='monthly-summary'),
+    path('reports/monthly-history/', MonthlyHistoryView.as_view(), name='monthly-history'),
     path('reports/expenses-by-category/', ExpensesByCategoryView.as_view(), name="expenses-by-category"),
     path('reports/incomes-by-category/', IncomesByCategoryView.as_view(), name='incomes-by-category'),
     path('reports/expenses-by-emotion/', EmotionalSpendingView.as_view(), name='emotional-spending'),
@@ -38,4 +54,14 @@ urlpatterns = [
     path('reports/monthly-flow/', MonthlyFlowView.as_view(), name='monthly-flow'),
     path('reports/category-expenses/', CategoryExpenseView.as_view(), name='category-expenses'),
     path('reports/emotional-expenses/', EmotionalExpenseView.as_view(), name='emotional-expenses'),
+    path('reports/dashboard/', DashboardView.as_view(), name='dashboard'),
+    path('reports/trend/', TrendView.as_view(), name='trend'),
+    path('reports/pivot/', PivotView.as_view(), name='pivot'),
+    path('reports/balance/', BalanceView.as_view(), name='balance'),
+    path('reports/cache-stats/', ReportCacheStatsView.as_view(), name='report-cache-stats'),
+
+    # Relatórios assíncronos (ORM assíncrono, para deploy em ASGI)
+    path('reports/async/monthly-summary/', async_views.monthly_summary, name='async-monthly-summary'),
+    path('reports/async/dashboard/', async_views.dashboard, name='async-dashboard'),
+    path('reports/async/trend/', async_views.trend, name='async-trend'),
 ]   
\ No newline at end of file
@@ -1,23 +1,40 @@
 from django.db.models import Sum, Value, Case, When, F, DecimalField
-from django.db.models.functions import Coalesce, TruncDay
+from django.db.models.functions import Coalesce, TruncDay, TruncWeek, TruncMonth
 from django.shortcuts import render
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction as db_transaction
 
 # Create your views here.
 
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from rest_framework import generics, permissions, serializers, viewsets, status
-from rest_framework.decorators import api_view, permission_classes
-from django.http import JsonResponse
+from rest_framework import generics, mixins, permissions, serializers, viewsets, status
+from rest_framework.decorators import action, api_view, permission_classes
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from django.utils import timezone
-from .models import Transaction, Category
+from .models import Transaction, Category, DailyRollup, Budget, Job, Tombstone
+import codecs
+import csv
 import datetime
+import json
+from decimal import Decimal
+from . import balances, budgets, jobs, rollups, search, snapshots, sync
+from .cache import cached_report, cache_stats
+from .importers import PARSERS, ImportRowError, TransactionImporter, guess_format
+from .signals import bulk_write
+from .watermarks import ConditionalGetMixin
+from .pagination import SearchPagination, TransactionPagination
+from .pivot import PivotError, parse_params as parse_pivot_params, pivot
+from .renderers import CSVRenderer, NDJSONRenderer
 from .serializers import (
     TransactionSerializer,
+    TransactionBulkSerializer,
+    TransactionListSerializer,
     UserSerializer,
     CategorySerializer,
+    BudgetSerializer,
+    JobSerializer,
     )
 from django.contrib.auth.models import User
 from django_filters import rest_framework as filters
@@ -25,6 +42,34 @@ from django_filters.rest_framework import DjangoFilterBackend
 
 
 
+def month_range(year, month):
+    """Retorna o intervalo semiaberto [primeiro dia do mês, primeiro dia do mês seguinte)."""
+    month_start = datetime.date(year, month, 1)
+    month_end = datetime.date(year + month // 12, month % 12 + 1, 1)
+    return month_start, month_end
+
+
+def parse_date_range(start_str, end_str, inclusive=False):
+    """
+    Converte datas 'YYYY-MM-DD' em um intervalo semiaberto [start, end).
+    Com inclusive=True o dia final informado também entra no intervalo.
+    Filtrar por intervalo (em vez de date__year/date__month) permite usar os índices.
+    """
+    start = datetime.datetime.strptime(start_str, "%Y-%m-%d").date()
+    end = datetime.datetime.strptime(end_str, "%Y-%m-%d").date()
+    if inclusive:
+        end += datetime.timedelta(days=1)
+    if start >= end:
+        raise ValueError("start deve ser anterior a end")
+    return start, end
+
+
+class EchoBuffer:
+    """Objeto tipo arquivo que devolve o que recebe, para o csv.writer em fluxo."""
+    def write(self, value):
+        return value
+
+
 class CategoryListCreateView (generics.ListCreateAPIView): 
     serializer_class = CategorySerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -78,7 +123,7 @@ class CreateUserView(generics.CreateAPIView):
     serializer_class = UserSerializer
     permission_classes= [permissions.AllowAny]
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = CategorySerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -98,58 +143,365 @@ class TransactionViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+class BudgetViewSet(viewsets.ModelViewSet):
+    """
+    Orçamentos mensais do usuário, com o gasto atual. Filtros: ?year=&month=.
+    """
+    serializer_class = BudgetSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    # Poucos orçamentos por usuário; o frontend espera a lista completa
+    pagination_class = None
+
+    def get_queryset(self):
+        queryset = Budget.objects.filter(user=self.request.user).select_related('category')
+        for field in ('year', 'month'):
+            value = self.request.query_params.get(field)
+            if value:
+                try:
+                    queryset = queryset.filter(**{field: int(value)})
+                except ValueError:
+                    raise serializers.ValidationError({"error": f"{field} inválido."})
+        return queryset.order_by('-year', '-month', 'category__name')
+
+    # O gasto é calculado na mesma transação que grava o orçamento
+    @db_transaction.atomic
+    def perform_create(self, serializer):
+        budgets.refresh_budget(serializer.save(user=self.request.user))
+
+    @db_transaction.atomic
+    def perform_update(self, serializer):
+        budgets.refresh_budget(serializer.save())
+
+
+class JobViewSet(mixins.CreateModelMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Jobs em background do usuário (core/jobs.py). POST enfileira uma tarefa
+    (pivot, com os parâmetros de reports/pivot/ no payload, ou
+    rebuild_rollups) e responde 202; status, progress e result são
+    acompanhados em jobs/<id>/.
+    """
+    serializer_class = JobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return Job.objects.filter(user=self.request.user).order_by('-id')
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        job = jobs.enqueue(serializer.validated_data['task'], serializer.validated_data['payload'], user=request.user)
+        return Response(self.get_serializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+
 class TransactionFilter(filters.FilterSet):
     start= filters.DateFilter(field_name="date", lookup_expr='gte')
     end = filters.DateFilter(field_name="date", lookup_expr="lte")
     category = filters.NumberFilter(field_name='category__id')
     emotion = filters.CharFilter(field_name="emotional_trigger", lookup_expr="iexact")
+    search = filters.CharFilter(method='filter_search')
 
     class Meta:
         model = Transaction
-        fields= ['start', 'end', 'category', 'emotion']
+        fields= ['start', 'end', 'category', 'emotion', 'search']
 
-class TransactionViewSet(viewsets.ModelViewSet):
+    def filter_search(self, queryset, name, value):
+        # Só filtra; a ordenação por relevância fica em transactions/search/
+        return search.search(queryset, value) if value.strip() else queryset
+
+class TransactionViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = TransactionSerializer
     permission_classes= [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
     filterset_class = TransactionFilter
+    pagination_class = TransactionPagination
 
     def get_queryset(self):
-        return Transaction.objects.filter(user=self.request.user).order_by('-date')
+        # '-id' desempata transações do mesmo dia e segue o índice (user, -date, -id)
+        return (
+            Transaction.objects.filter(user=self.request.user)
+            .select_related('category')
+            .order_by('-date', '-id')
+        )
+
+    def list(self, request, *args, **kwargs):
+        """
+        Caminho rápido da listagem: uma consulta com JOIN na categoria trazendo
+        apenas as colunas usadas (.values()) e serialização pré-compilada, com
+        o mesmo JSON do TransactionSerializer.
+        """
+        queryset = self.filter_queryset(self.get_queryset()).values(*TransactionListSerializer.columns)
+        page = self.paginate_queryset(queryset)
+        serializer = TransactionListSerializer()
+        if page is not None:
+            return self.get_paginated_response(serializer.serialize(page))
+        return Response(serializer.serialize(queryset))
     
    
     def perform_create(self, serializer):
-        """Sobrescreve o método de criação para validar o orçamento."""
-        transaction = serializer.save(user=self.request.user)
+        """
+        Sobrescreve o método de criação para validar o orçamento. O gasto do
+        mês já está em Budget.spent, então a verificação é uma única consulta
+        às linhas de orçamento, travadas até a despesa ser gravada.
+        """
+        data = serializer.validated_data
+        category = data.get('category')
+        with db_transaction.atomic():
+            budgets.check_limit(
+                self.request.user.pk,
+                data['date'],
+                category.pk if category else None,
+                data['value'],
+            )
+            serializer.save(user=self.request.user)
+
+    @action(detail=False, methods=['get'], url_path='search', url_name='search', pagination_class=SearchPagination)
+    def search_transactions(self, request, *args, **kwargs):
+        """
+        Busca na descrição (?q=...), com os mesmos filtros da listagem, em
+        ordem de relevância. Cada item traz o `rank` da busca.
+        """
+        text = search.normalize(request.query_params.get('q', ''))
+        if not text:
+            return Response({"error": "Informe o termo de busca em q."}, status=400)
+
+        queryset = search.search(self.filter_queryset(self.get_queryset()), text)
+        rows = queryset.order_by('-rank', '-date', '-id').values(*TransactionListSerializer.columns, 'rank')
+        page = self.paginate_queryset(rows)
+        serializer = TransactionListSerializer()
+        results = []
+        for row in page:
+            item = serializer.to_representation(row)
+            item['rank'] = round(row['rank'] or 0.0, 4)
+            results.append(item)
+        return self.get_paginated_response(results)
+
+    bulk_max_rows = 5000
+    bulk_fields = ['value', 'date', 'description', 'category', 'emotional_trigger']
+
+    @action(detail=False, methods=['post', 'patch', 'delete'], url_path='bulk')
+    def bulk(self, request, *args, **kwargs):
+        """
+        Operações em lote: POST cria, PATCH atualiza (cada item com 'id') e
+        DELETE remove ({"ids": [...]}). O lote é validado por inteiro e gravado
+        em uma única transação; havendo erro em qualquer linha nada é gravado e
+        a resposta traz os erros por índice.
+        """
+        if request.method == 'DELETE':
+            return self.bulk_delete(request)
+
+        rows = request.data
+        if not isinstance(rows, list) or not rows:
+            return Response({"error": "Envie uma lista de transações."}, status=400)
+        if len(rows) > self.bulk_max_rows:
+            return Response({"error": f"Máximo de {self.bulk_max_rows} transações por lote."}, status=400)
+
+        partial = request.method == 'PATCH'
+        items, errors = self.validate_bulk(rows, partial)
+        if partial and not errors:
+            existing = self.get_queryset().in_bulk([item.get('id') for item in items])
+            for index, item in enumerate(items):
+                if item.get('id') not in existing:
+                    errors.append({'index': index, 'errors': {'id': ['Transação não encontrada.']}})
+        if errors:
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        user = request.user
+        with db_transaction.atomic():
+            if partial:
+                days = set()
+                changed = []
+                now = timezone.now()
+                for item in items:
+                    instance = existing[item['id']]
+                    days.add(instance.date)
+                    for field, value in self.bulk_attrs(item).items():
+                        setattr(instance, field, value)
+                    days.add(instance.date)
+                    # bulk_update não preenche o auto_now
+                    instance.updated_at = now
+                    changed.append(instance)
+                Transaction.objects.bulk_update(changed, [*self.bulk_fields, 'updated_at'], batch_size=1000)
+                rollups.refresh_days(user.pk, days)
+                return Response({'updated': len(changed)})
+
+            created = Transaction.objects.bulk_create(
+                [Transaction(user=user, **self.bulk_attrs(item)) for item in items],
+                batch_size=1000,
+            )
+            rollups.refresh_days(user.pk, {item['date'] for item in items})
+        return Response(
+            {'created': len(created), 'ids': [obj.pk for obj in created]},
+            status=status.HTTP_201_CREATED
+        )
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_file(self, request, *args, **kwargs):
+        """
+        Importa um extrato CSV ou OFX enviado no campo 'file'. O arquivo é lido
+        como fluxo e gravado em lotes; a resposta traz o resumo da importação.
+        Com background=true a importação vira um job e a resposta (202) traz o job.
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({"error": "Envie o arquivo no campo 'file'."}, status=400)
+
+        file_format = request.data.get('format') or guess_format(upload.name)
+        if file_format not in PARSERS:
+            return Response({"error": "Formato inválido. Use csv ou ofx."}, status=400)
+        encoding = request.data.get('encoding') or 'utf-8-sig'
+        try:
+            stream = codecs.getreader(encoding)(upload)
+        except LookupError:
+            return Response({"error": "Codificação inválida."}, status=400)
+
+        if request.data.get('background') in ('1', 'true', 'True'):
+            # A importação roda no run_workers; o cliente acompanha em jobs/<id>/
+            job = jobs.enqueue(
+                'import_transactions',
+                {'path': jobs.save_upload(upload, f'.{file_format}'), 'format': file_format, 'encoding': encoding},
+                user=request.user,
+            )
+            return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+        importer = TransactionImporter(request.user)
+        try:
+            summary = importer.run(PARSERS[file_format](stream))
+        except (ImportRowError, UnicodeDecodeError) as exc:
+            return Response({"error": f"Falha ao importar: {exc}", **importer.summary()}, status=400)
+        return Response(summary)
+
+    export_columns = ['id', 'date', 'value', 'description', 'category', 'category_name', 'emotional_trigger']
+    export_chunk_size = 2000
+
+    @action(detail=False, methods=['get'], url_path='export', renderer_classes=[CSVRenderer, NDJSONRenderer])
+    def export(self, request, *args, **kwargs):
+        """
+        Exporta as transações filtradas (mesmos filtros da listagem) em CSV ou
+        NDJSON (?format=csv|ndjson). As linhas saem de um cursor no servidor
+        como tuplas, sem instanciar modelos nem serializers, e são enviadas
+        em fluxo: a memória usada não depende do tamanho do histórico.
+        """
+        rows = (
+            self.filter_queryset(self.get_queryset())
+            .values_list('id', 'date', 'value', 'description', 'category_id', 'category__name', 'emotional_trigger')
+            .iterator(chunk_size=self.export_chunk_size)
+        )
+        if request.accepted_renderer.format == 'ndjson':
+            content, extension = self.export_ndjson(rows), 'ndjson'
+        else:
+            content, extension = self.export_csv(rows), 'csv'
+
+        response = StreamingHttpResponse(
+            content,
+            content_type=f'{request.accepted_renderer.media_type}; charset=utf-8'
+        )
+        response['Content-Disposition'] = f'attachment; filename="transacoes.{extension}"'
+        return response
+
+    def export_csv(self, rows):
+        buffer = EchoBuffer()
+        writer = csv.writer(buffer)
+        yield writer.writerow(self.export_columns)
+        for pk, day, value, description, category_id, category_name, trigger in rows:
+            yield writer.writerow([pk, day.isoformat(), value, description, category_id, category_name, trigger])
+
+    def export_ndjson(self, rows):
+        for pk, day, value, description, category_id, category_name, trigger in rows:
+            # Mesmo formato da listagem: valor como string decimal
+            yield json.dumps({
+                'id': pk,
+                'date': day.isoformat(),
+                'value': str(value),
+                'description': description,
+                'category': category_id,
+                'category_name': category_name,
+                'emotional_trigger': trigger,
+            }, ensure_ascii=False) + '\n'
+
+    def bulk_attrs(self, item):
+        # Campos do item validado como atributos do modelo (sem o id)
+        attrs = {field: value for field, value in item.items() if field != 'id'}
+        if 'category' in attrs:
+            attrs['category_id'] = attrs.pop('category')
+        return attrs
+
+    def validate_bulk(self, rows, partial):
+        items, errors = [], []
+        for index, row in enumerate(rows):
+            serializer = TransactionBulkSerializer(data=row, partial=partial)
+            if not serializer.is_valid():
+                errors.append({'index': index, 'errors': serializer.errors})
+                continue
+            item = serializer.validated_data
+            if partial and 'id' not in item:
+                errors.append({'index': index, 'errors': {'id': ['Este campo é obrigatório.']}})
+            items.append(item)
+        if errors:
+            return items, errors
+
+        # Posse das categorias verificada com uma consulta para o lote todo
+        category_ids = {item['category'] for item in items if item.get('category') is not None}
+        if category_ids:
+            owned = set(
+                Category.objects.filter(user=self.request.user, id__in=category_ids).values_list('id', flat=True)
+            )
+            for index, item in enumerate(items):
+                if item.get('category') is not None and item['category'] not in owned:
+                    errors.append({'index': index, 'errors': {'category': ['Categoria inválida.']}})
+        return items, errors
+
+    def bulk_delete(self, request):
+        ids = request.data.get('ids') if isinstance(request.data, dict) else None
+        if not isinstance(ids, list) or not ids:
+            return Response({"error": "Envie a lista de ids em 'ids'."}, status=400)
+        if len(ids) > self.bulk_max_rows:
+            return Response({"error": f"Máximo de {self.bulk_max_rows} transações por lote."}, status=400)
+
+        queryset = self.get_queryset().filter(id__in=ids)
+        with db_transaction.atomic():
+            rows = list(queryset.values_list('id', 'date'))
+            with bulk_write():
+                deleted, _ = queryset.delete()
+            rollups.refresh_days(request.user.pk, {day for _, day in rows})
+            sync.record_deleted(request.user.pk, Tombstone.TRANSACTION, [pk for pk, _ in rows])
+        return Response({'deleted': deleted})
         
         
-class MonthlySummaryView(APIView):
+class MonthlySummaryView(ConditionalGetMixin, APIView):
+    """
+    Receitas, despesas e saldo do mês (?year=&month=, padrão: mês corrente).
+    Meses fechados vêm do MonthlySnapshot (core/snapshots.py).
+    """
     permission_classes = [permissions.IsAuthenticated]
 
+    @cached_report
     def get(self, request):
         user = request.user
         now = timezone.now()
-        year = now.year
-        month = now.month
+        try:
+            # Intervalo semiaberto [início do mês, início do mês seguinte)
+            month_start, month_end = month_range(
+                int(request.query_params.get('year', now.year)),
+                int(request.query_params.get('month', now.month)),
+            )
+        except (ValueError, TypeError):
+            return Response({"error": "Parâmetros de ano e mês inválidos."}, status=400)
 
-        # Ajustamos o início e fim do mês
-        month_start = datetime.date(year, month, 1)
-        # Para o fim, poderíamos usar calendar, mas simplificando:
-        next_month = month_start.replace(day=28) + datetime.timedelta(days=4)
-        month_end = next_month - datetime.timedelta(days=next_month.day)
+        if month_start < snapshots.current_month():
+            snapshot, = snapshots.history(user.pk, month_start, month_end)
+            return Response(snapshots.summary(snapshot))
 
-        transactions = Transaction.objects.filter(
+        totals = DailyRollup.objects.filter(
             user = user,
-            date__range=[month_start,month_end]
+            day__gte=month_start,
+            day__lt=month_end
+        ).aggregate(
+            receitas=Coalesce(Sum('income'), 0, output_field=DecimalField()),
+            despesas=Coalesce(Sum('expense'), 0, output_field=DecimalField()),
         )
 
-        receitas = transactions.filter(value__gte=0).aggregate(
-            total=Coalesce(Sum('value'),0, output_field=DecimalField())
-        )['total']
-
-        despesas= transactions.filter(value__lt=0).aggregate(
-            total=Coalesce(Sum('value'), 0, output_field=DecimalField())
-        )['total']
+        receitas = totals['receitas']
+        despesas = totals['despesas']
 
         saldo = receitas + despesas
 
@@ -161,30 +513,65 @@ class MonthlySummaryView(APIView):
         return Response(summary_data)
 
 
-class ExpensesByCategoryView(APIView):
+class MonthlyHistoryView(ConditionalGetMixin, APIView):
+    """
+    Resumo de cada mês fechado em ?start=YYYY-MM&end=YYYY-MM (end exclusivo;
+    padrão: os 12 meses anteriores ao corrente), lido do MonthlySnapshot.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    max_months = 120
+
+    @cached_report
+    def get(self, request, *args, **kwargs):
+        until = snapshots.current_month()
+        try:
+            end = self.parse_month(request.query_params.get('end')) or until
+            start = self.parse_month(request.query_params.get('start')) or datetime.date(end.year - 1, end.month, 1)
+        except ValueError:
+            return Response({"error": "Meses inválidos: use YYYY-MM."}, status=400)
+        if start >= end:
+            return Response({"error": "start deve ser anterior a end."}, status=400)
+        if (end.year - start.year) * 12 + end.month - start.month > self.max_months:
+            return Response({"error": f"Período máximo de {self.max_months} meses."}, status=400)
+
+        months = [
+            {'month': f'{snapshot.month:%Y-%m}', **snapshots.summary(snapshot)}
+            for snapshot in snapshots.history(request.user.pk, start, end)
+        ]
+        return Response({'months': months})
+
+    def parse_month(self, raw):
+        if not raw:
+            return None
+        return datetime.datetime.strptime(raw, '%Y-%m').date()
+
+
+class ExpensesByCategoryView(ConditionalGetMixin, APIView):
     permission_classes = [IsAuthenticated]
 
+    @cached_report
     def get(self, request):
         # 1) ler parâmetros de data (Ex: ?start=2025-03-01&end=2025-03-31)
         start_str = request.query_params.get('start') #string
         end_str = request.query_params.get('end')
 
-        # 2) Base QuerySet: despesas (value__lt=0) do usuário logado
-        qs = Transaction.objects.filter(
+        # 2) Base QuerySet: baldes diários com despesas do usuário logado
+        qs = DailyRollup.objects.filter(
             user = request.user,
-            value__lt=0 # < 0 => despesas
+            expense__lt=0 # < 0 => despesas
         )
 
-        # 3) Se o usuário passou start e end, filtramos date__range
+        # 3) Se o usuário passou start e end, filtramos o período (end inclusivo)
         if start_str and end_str:
-            # Converter strings para objeto datetime.date
-            start_date = datetime.strptime(start_str, "%Y-%m-%d").date()
-            end_date = datetime.strptime(end_str, "%Y-%m-%d").date()
+            try:
+                start_date, end_date = parse_date_range(start_str, end_str, inclusive=True)
+            except ValueError:
+                return Response({"error": "Parâmetros de data inválidos."}, status=400)
 
-            qs = qs.filter(date__range=[start_date, end_date])
+            qs = qs.filter(day__gte=start_date, day__lt=end_date)
 
-        # 4) Agrupamento por categoria, somando 'value'
-        data = qs.values('category__name').annotate(total=Sum('value'))
+        # 4) Agrupamento por categoria, somando as despesas
+        data = qs.values('category__name').annotate(total=Sum('expense'))
 
         # `data` terá algo como:
         # [{'category__name': 'Alimentação', 'total': -1200},
@@ -204,45 +591,48 @@ class ExpensesByCategoryView(APIView):
         return Response(results)
     
 
-class IncomesByCategoryView(APIView):
+class IncomesByCategoryView(ConditionalGetMixin, APIView):
     permission_classes = [IsAuthenticated]
 
+    @cached_report
     def get(self, request):
         start_str = request.query_params.get('start')
         end_str = request.query_params.get('end')
 
-        qs = Transaction.objects.filter(
+        qs = DailyRollup.objects.filter(
             user = request.user,
-            value__gt= 0 # > 0 => receitas
+            income__gt= 0 # > 0 => receitas
         )
 
         if start_str and end_str:
-            start_date = datetime.strptime(start_str, "%Y-%m-%d").date()
-            end_date = datetime.strptime(end_str, "%Y-%m-%d").date()
-            qs = qs.filter(date__range=[start_date, end_date])
+            try:
+                start_date, end_date = parse_date_range(start_str, end_str, inclusive=True)
+            except ValueError:
+                return Response({"error": "Parâmetros de data inválidos."}, status=400)
+            qs = qs.filter(day__gte=start_date, day__lt=end_date)
 
-        data = qs.values('category__name').annotate(total = Sum('value'))
+        data = qs.values('category__name').annotate(total = Sum('income'))
 
         results = []
 
         for item in data:
             category_name = item['category__name'] or 'Sem Categoria'
-            total_value = float(item['total']) # Já é positivo
             results.append({
                 'category': category_name,
-                'total_incomes': total_value
+                'total_incomes': item['total'] # Já é positivo
             })
 
         return Response(results)
     
 
-class ExpensesByEmotionalTriggerView(APIView):
+class ExpensesByEmotionalTriggerView(ConditionalGetMixin, APIView):
     permission_classes = [IsAuthenticated]
 
+    @cached_report
     def get(self, request):
-        qs = Transaction.objects.filter(user = request.user, value__lt=0)
+        qs = DailyRollup.objects.filter(user = request.user, expense__lt=0)
         data = (
-            qs.values('emotional_trigger').annotate(total=Sum('value'))
+            qs.values('emotional_trigger').annotate(total=Sum('expense'))
         )
 
         # retorna total como valor positivo para facilitar exibição
@@ -257,32 +647,34 @@ class ExpensesByEmotionalTriggerView(APIView):
 
         return Response(results)
 
-class MonthlyFlowView (APIView):
+class MonthlyFlowView(ConditionalGetMixin, APIView):
     permission_classes = [permissions.IsAuthenticated]
 
+    @cached_report
     def get(self, request, *args, **kwargs):
         user = request.user
         try:
             # Pega os parâmetros da URL, com o ano/mês atual como padrão
-            year = int(request.query_params.get('year', timezone.now().year))
-            month = int(request.query_params.get('month', timezone.now().month))
+            month_start, month_end = month_range(
+                int(request.query_params.get('year', timezone.now().year)),
+                int(request.query_params.get('month', timezone.now().month)),
+            )
         except (ValueError, TypeError):
             return Response({"error": "Parâmetros de ano e mês inválidos."}, status=400)
         
-        # Filtra transações do usuário no mês e ano especificados
-        transactions = Transaction.objects.filter(
+        # Filtra os agregados diários do usuário no mês e ano especificados
+        rollups = DailyRollup.objects.filter(
             user=user,
-            date__year=year,
-            date__month=month
+            day__gte=month_start,
+            day__lt=month_end
         )
 
         daily_data = (
-            transactions
-            .annotate(day_date=TruncDay('date'))
-            .values('day_date')
+            rollups
+            .values(day_date=F('day'))
             .annotate(
-                receita=Sum(Case(When(value__gt=0, then=F('value')), default=0, output_field=DecimalField())),
-                despesa=Sum(Case(When(value__lt=0, then=F('value')), default=0, output_field=DecimalField()))
+                receita=Sum('income'),
+                despesa=Sum('expense')
             )
             .order_by('day_date')
         )
@@ -296,19 +688,20 @@ class MonthlyFlowView (APIView):
             })
 
         return Response(formatted_data)
-class EmotionalSpendingView(APIView):
+class EmotionalSpendingView(ConditionalGetMixin, APIView):
     """
     View para calcular o total de gastos por gatilho emocional.
     """
     permission_classes = [IsAuthenticated]
 
+    @cached_report
     def get(self, request, *args, **kwargs):
-        # Agrupa as transações por 'emotional_trigger' e soma os valores
+        # Agrupa os agregados diários por 'emotional_trigger' e soma as despesas
         data = (
-            Transaction.objects
-            .filter(user=request.user, value__lt=0)  # CORRIGIDO: Filtra por valor negativo
+            DailyRollup.objects
+            .filter(user=request.user, expense__lt=0)
             .values('emotional_trigger')
-            .annotate(total_spent=Sum('value'))  # CORRIGIDO: Soma o campo 'value'
+            .annotate(total_spent=Sum('expense'))
             .order_by('-total_spent')
         )
         
@@ -339,27 +732,30 @@ class NeedsVsWantsView(APIView):
         )
         return Response(data)
     
-class CategoryExpenseView(APIView):
+class CategoryExpenseView(ConditionalGetMixin, APIView):
     """
     Retorna o top 5 de despesas agrupado por categoria para um determinado mês e ano.
     """
     permission_classes = [permissions.IsAuthenticated]
 
+    @cached_report
     def get(self, request, *args, **kwargs):
         user = request.user
         try:
-            year = int(request.query_params.get('year', timezone.now().year))
-            month = int(request.query_params.get('month', timezone.now().month))
+            month_start, month_end = month_range(
+                int(request.query_params.get('year', timezone.now().year)),
+                int(request.query_params.get('month', timezone.now().month)),
+            )
         except (ValueError, TypeError):
             return Response({"error": "Parâmetros de ano e mês inválidos."}, status=400)
 
-        expenses = Transaction.objects.filter(
+        expenses = DailyRollup.objects.filter(
             user=user, 
-            value__lt=0,
-            date__year=year,
-            date__month=month
+            expense__lt=0,
+            day__gte=month_start,
+            day__lt=month_end
         ).values('category__name').annotate(
-            total_spent=Sum(F('value'))
+            total_spent=Sum(F('expense'))
         ).order_by('total_spent')[:5]
 
         formatted_expenses = []
@@ -374,29 +770,32 @@ class CategoryExpenseView(APIView):
 
 
 # 3. NOVA VIEW (ADICIONAR)
-class EmotionalExpenseView(APIView):
+class EmotionalExpenseView(ConditionalGetMixin, APIView):
     """
     Retorna o top 5 de despesas agrupado por gatilho emocional para um determinado mês e ano.
     """
     permission_classes = [permissions.IsAuthenticated]
 
+    @cached_report
     def get(self, request, *args, **kwargs):
         user = request.user
         try:
-            year = int(request.query_params.get('year', timezone.now().year))
-            month = int(request.query_params.get('month', timezone.now().month))
+            month_start, month_end = month_range(
+                int(request.query_params.get('year', timezone.now().year)),
+                int(request.query_params.get('month', timezone.now().month)),
+            )
         except (ValueError, TypeError):
             return Response({"error": "Parâmetros de ano e mês inválidos."}, status=400)
 
-        expenses = Transaction.objects.filter(
+        expenses = DailyRollup.objects.filter(
             user=user, 
-            value__lt=0,
-            date__year=year,
-            date__month=month
-        ).exclude(emotional_trigger__isnull=True).exclude(emotional_trigger='').values(
+            expense__lt=0,
+            day__gte=month_start,
+            day__lt=month_end
+        ).exclude(emotional_trigger='').values(
             'emotional_trigger'
         ).annotate(
-            total_spent=Sum(F('value'))
+            total_spent=Sum(F('expense'))
         ).order_by('total_spent')[:5]
 
         formatted_expenses = []
@@ -406,4 +805,219 @@ class EmotionalExpenseView(APIView):
                 'total_spent': abs(expense['total_spent'])
             })
 
-        return Response(formatted_expenses)
\ No newline at end of file
+        return Response(formatted_expenses)
+
+
+class DashboardView(ConditionalGetMixin, APIView):
+    """
+    Retorna em uma única resposta os dados do dashboard para um mês e ano:
+    resumo (receitas/despesas/saldo), fluxo diário e o top 5 de despesas por
+    categoria e por gatilho emocional. Tudo é calculado a partir de uma única
+    consulta agrupada sobre os agregados diários.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    top_size = 5
+
+    @cached_report
+    def get(self, request, *args, **kwargs):
+        try:
+            month_start, month_end = month_range(
+                int(request.query_params.get('year', timezone.now().year)),
+                int(request.query_params.get('month', timezone.now().month)),
+            )
+        except (ValueError, TypeError):
+            return Response({"error": "Parâmetros de ano e mês inválidos."}, status=400)
+
+        return Response(self.summarize(self.buckets(request.user, month_start, month_end)))
+
+    @staticmethod
+    def buckets(user, month_start, month_end):
+        """A consulta agrupada do mês (também usada pela versão assíncrona)."""
+        return (
+            DailyRollup.objects.filter(
+                user=user,
+                day__gte=month_start,
+                day__lt=month_end
+            )
+            .values('day', 'category__name', 'emotional_trigger')
+            .annotate(receita=Sum('income'), despesa=Sum('expense'))
+            .order_by('day')
+        )
+
+    @classmethod
+    def summarize(cls, buckets):
+        receitas = despesas = Decimal('0')
+        flow = {}
+        by_category = {}
+        by_emotion = {}
+        for item in buckets:
+            receitas += item['receita']
+            despesas += item['despesa']
+
+            day = flow.setdefault(item['day'], {'receita': Decimal('0'), 'despesa': Decimal('0')})
+            day['receita'] += item['receita']
+            day['despesa'] += item['despesa']
+
+            if item['despesa'] < 0:
+                category_name = item['category__name'] or 'Sem Categoria'
+                by_category[category_name] = by_category.get(category_name, 0) + item['despesa']
+                if item['emotional_trigger']:
+                    trigger = item['emotional_trigger']
+                    by_emotion[trigger] = by_emotion.get(trigger, 0) + item['despesa']
+
+        return {
+            'summary': {
+                'receitas': receitas,
+                'despesas': abs(despesas),
+                'saldo': receitas + despesas,
+            },
+            'monthly_flow': [
+                {'day': day.strftime('%d'), 'receita': totals['receita'], 'despesa': abs(totals['despesa'])}
+                for day, totals in flow.items()
+            ],
+            'category_expenses': [
+                {'category_name': name, 'total_spent': abs(total)}
+                for name, total in cls.top(by_category)
+            ],
+            'emotional_expenses': [
+                {'emotional_trigger': trigger, 'total_spent': abs(total)}
+                for trigger, total in cls.top(by_emotion)
+            ],
+        }
+
+    @classmethod
+    def top(cls, totals):
+        # Despesas são negativas: as maiores são as de menor valor
+        return sorted(totals.items(), key=lambda item: item[1])[:cls.top_size]
+
+
+class TrendView(ConditionalGetMixin, APIView):
+    """
+    Série temporal de receitas e despesas em um período arbitrário.
+    Parâmetros: ?start=YYYY-MM-DD&end=YYYY-MM-DD (end exclusivo) e
+    granularity=day|week|month (padrão: month).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    truncs = {
+        'day': TruncDay,
+        'week': TruncWeek,
+        'month': TruncMonth,
+    }
+
+    @cached_report
+    def get(self, request, *args, **kwargs):
+        trunc = self.truncs.get(request.query_params.get('granularity', 'month'))
+        if trunc is None:
+            return Response({"error": "Granularidade inválida. Use day, week ou month."}, status=400)
+        try:
+            start, end = parse_date_range(
+                request.query_params.get('start', ''),
+                request.query_params.get('end', ''),
+            )
+        except ValueError:
+            return Response({"error": "Parâmetros de data inválidos."}, status=400)
+
+        data = (
+            DailyRollup.objects.filter(
+                user=request.user,
+                day__gte=start,
+                day__lt=end
+            )
+            .annotate(period=trunc('day'))
+            .values('period')
+            .annotate(receita=Sum('income'), despesa=Sum('expense'))
+            .order_by('period')
+        )
+
+        results = [
+            {
+                'period': item['period'],
+                'receita': item['receita'],
+                'despesa': abs(item['despesa']),
+                'saldo': item['receita'] + item['despesa'],
+            }
+            for item in data
+        ]
+        return Response(results)
+
+
+class BalanceView(ConditionalGetMixin, APIView):
+    """
+    Saldo acumulado dia a dia em um período: ?start=YYYY-MM-DD&end=YYYY-MM-DD
+    (end exclusivo; padrão: mês corrente). O saldo considera todo o histórico
+    anterior ao período. Períodos que terminam mais de `horizon_years` anos
+    depois do mês corrente são recusados.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    max_days = 3660
+    horizon_years = 10
+
+    @cached_report
+    def get(self, request, *args, **kwargs):
+        if 'start' in request.query_params or 'end' in request.query_params:
+            try:
+                start, end = parse_date_range(
+                    request.query_params.get('start', ''),
+                    request.query_params.get('end', ''),
+                )
+            except ValueError:
+                return Response({"error": "Parâmetros de data inválidos."}, status=400)
+        else:
+            today = timezone.localdate()
+            start, end = month_range(today.year, today.month)
+
+        if (end - start).days > self.max_days:
+            return Response({"error": f"Período máximo de {self.max_days} dias."}, status=400)
+        today = timezone.localdate()
+        if end > datetime.date(today.year + self.horizon_years, today.month, 1):
+            return Response(
+                {"error": f"O período deve terminar em até {self.horizon_years} anos a partir do mês corrente."},
+                status=400,
+            )
+
+        return Response(balances.daily_balance(request.user.pk, start, end))
+
+
+class PivotView(ConditionalGetMixin, APIView):
+    """
+    Cubo de receitas/despesas em uma única consulta agrupada (ver core/pivot.py).
+    Parâmetros: dimensions=category,emotional_trigger,sign,day|week|month;
+    measures=sum,count,avg; filtros start/end (end exclusivo), category (ids ou
+    'none'), emotional_trigger (ou 'none') e sign=income|expense; top=N e
+    sort=<medida> para os N maiores grupos.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    @cached_report
+    def get(self, request, *args, **kwargs):
+        try:
+            options = parse_pivot_params(request.query_params)
+        except PivotError as exc:
+            return Response({"error": str(exc)}, status=400)
+        return Response(pivot(request.user, **options))
+
+
+class SyncView(APIView):
+    """
+    Transações e categorias criadas, alteradas ou apagadas desde ?since=<cursor>
+    (sem cursor: todas), para o cliente manter uma cópia local (core/sync.py).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        since = request.query_params.get('since')
+        try:
+            cursor = sync.decode_cursor(since) if since else None
+        except sync.SyncError as exc:
+            return Response({"error": str(exc)}, status=400)
+        return Response(sync.changes(request.user.pk, cursor))
+
+
+class ReportCacheStatsView(APIView):
+    """
+    Contadores de acertos/falhas do cache de relatórios (somente staff).
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response(cache_stats())
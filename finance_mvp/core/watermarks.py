@@ -0,0 +1,111 @@
+"""
+Marca d'água de alterações por usuário e GET condicional (ETag/Last-Modified).
+
+`touch` é chamado em toda escrita que muda os dados de um usuário: incrementa
+o ChangeWatermark no banco, que também entra na chave do cache de relatórios
+(core/cache.py). As views com `ConditionalGetMixin` respondem 304 a
+If-None-Match/If-Modified-Since antes de rodar qualquer agregação ou
+serializer, com uma única busca pela chave primária.
+O ETag inclui o caminho e os parâmetros da requisição: cada rota e cada
+combinação de filtros tem o seu.
+"""
+import hashlib
+import math
+
+from django.db import IntegrityError, transaction as db_transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.http import http_date, parse_http_date_safe, parse_etags, urlencode
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+
+from .models import ChangeWatermark
+
+
+def touch(user_id):
+    """Registra uma alteração nos dados do usuário."""
+    now = timezone.now()
+    updated = ChangeWatermark.objects.filter(user_id=user_id).update(version=F('version') + 1, updated_at=now)
+    if not updated:
+        try:
+            with db_transaction.atomic():
+                ChangeWatermark.objects.create(user_id=user_id, version=1, updated_at=now)
+        except IntegrityError:
+            # Criado por uma escrita concorrente
+            ChangeWatermark.objects.filter(user_id=user_id).update(version=F('version') + 1, updated_at=now)
+
+
+def read_watermark(user_id):
+    """(version, updated_at) do usuário, ou None se ele nunca escreveu."""
+    return ChangeWatermark.objects.filter(user_id=user_id).values_list('version', 'updated_at').first()
+
+
+def conditional_validators(request, user_id, watermark):
+    """
+    (ETag, Last-Modified) da requisição, a partir da marca d'água
+    (version, updated_at) do usuário (None: nenhuma escrita ainda).
+    """
+    version, updated_at = watermark or (0, None)
+    today = timezone.localdate()
+    # Relatórios sem parâmetros dependem do dia corrente (ex: mês atual),
+    # então a data entra no ETag e o Last-Modified nunca é anterior a hoje
+    start_of_day = timezone.make_aware(timezone.datetime.combine(today, timezone.datetime.min.time()))
+    last_modified = max(updated_at, start_of_day) if updated_at else start_of_day
+    query = urlencode(sorted(request.GET.lists()), doseq=True)
+    digest = hashlib.md5(f'{request.path}?{query}'.encode()).hexdigest()[:16]
+    return f'W/"{user_id}-{version}-{today.isoformat()}-{digest}"', last_modified
+
+
+def is_not_modified(request, validators):
+    etag, last_modified = validators
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        return etag in parse_etags(if_none_match) or if_none_match.strip() == '*'
+    if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since') or '')
+    # O Last-Modified enviado é truncado no segundo: arredondar para cima evita
+    # o 304 para uma escrita feita no mesmo segundo da versão que o cliente tem
+    return if_modified_since is not None and math.ceil(last_modified.timestamp()) <= if_modified_since
+
+
+def set_validators(response, validators):
+    etag, last_modified = validators
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified.timestamp())
+    # O navegador guarda a resposta, mas revalida sempre com o ETag
+    response['Cache-Control'] = 'private, no-cache'
+    response['Vary'] = 'Accept, Authorization'
+
+
+class NotModified(APIException):
+    status_code = 304
+    default_detail = ''
+
+
+class ConditionalGetMixin:
+    """
+    Mixin para APIViews/ViewSets com dados de um único usuário: adiciona
+    ETag e Last-Modified derivados da marca d'água do usuário e responde 304
+    quando o cliente já tem a versão atual.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.validators = self.watermark = None
+        if request.method not in ('GET', 'HEAD') or not request.user.is_authenticated:
+            return
+
+        self.watermark = read_watermark(request.user.pk)
+        self.validators = conditional_validators(request, request.user.pk, self.watermark)
+        if is_not_modified(request, self.validators):
+            raise NotModified()
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return Response(status=304)
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if getattr(self, 'validators', None) and response.status_code in (200, 304):
+            set_validators(response, self.validators)
+        return response
@@ -0,0 +1,205 @@
+"""
+Pools de processos dos comandos `run_workers` (ver core/jobs.py) e
+`snapshot_months` (ver core/snapshots.py).
+
+Cada processo do pool recebe ids de jobs por uma fila própria e avisa na fila
+`done` quando termina. O processo principal busca novos jobs só quando há
+processo livre, acompanha o prazo de cada execução e, quando ele vence (ou o
+processo morre), encerra e substitui o processo e registra a falha do job.
+
+Este módulo não importa os models no topo: com o início por "spawn" (Windows,
+macOS) o processo filho importa o módulo antes de chamar django.setup().
+"""
+import multiprocessing
+import os
+import queue
+import signal
+import socket
+import time
+
+import django
+from django.apps import apps
+from django.db import close_old_connections, connections
+
+
+def child_main(inbox, done, slot):
+    # Ctrl+C chega a todo o grupo de processos; quem para o pool é o processo principal
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if not apps.ready:
+        django.setup()
+    from . import jobs
+
+    while True:
+        item = inbox.get()
+        if item is None:
+            break
+        job_id, attempt = item
+        close_old_connections()
+        try:
+            jobs.execute(job_id, attempt)
+        finally:
+            done.put((slot, job_id))
+
+
+def setup_child():
+    """Inicialização dos processos do multiprocessing.Pool do snapshot_months."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if not apps.ready:
+        django.setup()
+
+
+def snapshot_range(args):
+    """Snapshots dos usuários com id em [first_id, last_id), em um processo do pool."""
+    first_id, last_id, since, rebuild = args
+    from . import snapshots
+
+    close_old_connections()
+    return first_id, last_id, snapshots.snapshot_users(first_id, last_id, since, rebuild)
+
+
+class Slot:
+    def __init__(self, index):
+        self.index = index
+        self.process = None
+        self.inbox = None
+        self.job = None  # (id, tentativa, prazo em time.monotonic())
+
+
+class WorkerPool:
+    """
+    `processes` processos executando jobs da fila. Com processes=0 os jobs
+    rodam no próprio processo, sem controle de timeout (desenvolvimento).
+    """
+
+    def __init__(self, processes, poll_interval=1.0, log=None):
+        self.processes = processes
+        self.poll_interval = poll_interval
+        self.log = log or (lambda message: None)
+        self.name = f'{socket.gethostname()}:{os.getpid()}'
+        self.context = multiprocessing.get_context()
+        self.done = None
+        self.slots = []
+        self.stopping = False
+
+    def stop(self, *args):
+        """Para de buscar jobs; os que estão rodando terminam normalmente."""
+        self.stopping = True
+
+    def run(self, burst=False, max_jobs=None):
+        """
+        Executa jobs até `stop()`. Com `burst`, para quando não há mais jobs
+        prontos; `max_jobs` limita quantos jobs são iniciados.
+        """
+        from . import jobs
+
+        if self.processes < 1:
+            return self.run_inline(burst, max_jobs)
+
+        self.done = self.context.Queue()
+        self.slots = [Slot(index) for index in range(self.processes)]
+        for slot in self.slots:
+            self.start(slot)
+
+        started = 0
+        try:
+            while True:
+                self.check_deadlines()
+                free = [slot for slot in self.slots if slot.job is None]
+                limit = len(free) if max_jobs is None else min(len(free), max_jobs - started)
+                claimed = []
+                if not self.stopping and limit > 0:
+                    jobs.recover_expired()
+                    claimed = jobs.claim(limit, worker=self.name)
+                for slot, (job_id, attempt, timeout) in zip(free, claimed):
+                    slot.job = (job_id, attempt, time.monotonic() + timeout)
+                    slot.inbox.put((job_id, attempt))
+                    self.log(f'Job {job_id} (tentativa {attempt}) iniciado no processo {slot.process.pid}')
+                started += len(claimed)
+
+                busy = any(slot.job for slot in self.slots)
+                finished = self.stopping or (max_jobs is not None and started >= max_jobs) or (burst and not claimed)
+                if finished and not busy:
+                    break
+                if not claimed:
+                    self.wait(self.poll_interval)
+                else:
+                    self.wait(0)
+        finally:
+            self.shutdown()
+        return started
+
+    def run_inline(self, burst, max_jobs):
+        from . import jobs
+
+        started = 0
+        while not self.stopping and (max_jobs is None or started < max_jobs):
+            jobs.recover_expired()
+            claimed = jobs.claim(1, worker=self.name)
+            if not claimed:
+                if burst:
+                    break
+                time.sleep(self.poll_interval)
+                continue
+            job_id, attempt, _timeout = claimed[0]
+            self.log(f'Job {job_id} (tentativa {attempt}) iniciado')
+            jobs.execute(job_id, attempt)
+            self.log(f'Job {job_id} terminado')
+            started += 1
+        return started
+
+    def start(self, slot):
+        # O processo filho abre as próprias conexões com o banco
+        connections.close_all()
+        slot.inbox = self.context.Queue()
+        slot.process = self.context.Process(
+            target=child_main, args=(slot.inbox, self.done, slot.index), daemon=True
+        )
+        slot.process.start()
+        slot.job = None
+
+    def wait(self, timeout):
+        """Recebe os avisos de jobs terminados (espera até `timeout` pelo primeiro)."""
+        block = timeout > 0
+        while True:
+            try:
+                index, job_id = self.done.get(block=block, timeout=timeout if block else None)
+            except queue.Empty:
+                return
+            slot = self.slots[index]
+            if slot.job and slot.job[0] == job_id:
+                slot.job = None
+                self.log(f'Job {job_id} terminado')
+            block = False
+
+    def check_deadlines(self):
+        from . import jobs
+
+        now = time.monotonic()
+        for slot in self.slots:
+            if slot.job is None:
+                if not slot.process.is_alive():
+                    self.start(slot)
+                continue
+            job_id, attempt, deadline = slot.job
+            if slot.process.is_alive() and now < deadline:
+                continue
+            if slot.process.is_alive():
+                slot.process.terminate()
+                slot.process.join(5)
+                error = 'Tempo limite de execução excedido.'
+            else:
+                error = f'O processo do worker terminou inesperadamente (código {slot.process.exitcode}).'
+            self.log(f'Job {job_id}: {error}')
+            jobs.fail(job_id, attempt, error)
+            self.start(slot)
+
+    def shutdown(self):
+        for slot in self.slots:
+            if slot.process is not None and slot.process.is_alive():
+                slot.inbox.put(None)
+        for slot in self.slots:
+            if slot.process is not None:
+                slot.process.join(5)
+                if slot.process.is_alive():
+                    slot.process.terminate()
+        self.slots = []
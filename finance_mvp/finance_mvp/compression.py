@@ -0,0 +1,104 @@
+"""
+Compressão das respostas (gzip ou brotli) conforme o Accept-Encoding.
+
+Só são comprimidas as respostas com pelo menos COMPRESSION_MIN_SIZE bytes
+(listagens, relatórios grandes) e as em fluxo (exportação de transações), que
+são comprimidas em blocos de COMPRESSION_STREAM_BUFFER bytes, sem juntar o
+arquivo inteiro na memória. O brotli é usado quando o cliente aceita `br` e o
+pacote brotli está instalado; senão, gzip pelo GZipMiddleware do Django.
+"""
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def accepted_encodings(header):
+    """Codificações do Accept-Encoding com q > 0."""
+    encodings = set()
+    for item in header.split(','):
+        name, _, params = item.partition(';')
+        quality = params.strip()
+        if quality.startswith('q='):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        encodings.add(name.strip().lower())
+    return encodings
+
+
+def buffered(sequence, size):
+    """Junta os pedaços do fluxo (uma linha por pedaço na exportação) em blocos de `size` bytes."""
+    buffer = []
+    length = 0
+    for chunk in sequence:
+        buffer.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield b''.join(buffer)
+            buffer = []
+            length = 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def brotli_sequence(sequence, quality):
+    compressor = brotli.Compressor(quality=quality)
+    for chunk in sequence:
+        data = compressor.process(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+class CompressionMiddleware(GZipMiddleware):
+
+    def process_response(self, request, response):
+        if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+        if response.has_header('Content-Encoding'):
+            return response
+
+        encodings = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if response.streaming and not response.is_async and encodings & {'gzip', 'br'}:
+            # Cada pedaço é comprimido e enviado com flush: pedaços pequenos comprimem mal
+            response.streaming_content = buffered(response.streaming_content, settings.COMPRESSION_STREAM_BUFFER)
+        if brotli is None or 'br' not in encodings:
+            return super().process_response(request, response)
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        quality = settings.COMPRESSION_BROTLI_QUALITY
+        if response.streaming:
+            if response.is_async:
+                original_iterator = response.streaming_content
+
+                async def brotli_wrapper():
+                    compressor = brotli.Compressor(quality=quality)
+                    async for chunk in original_iterator:
+                        data = compressor.process(chunk) + compressor.flush()
+                        if data:
+                            yield data
+                    yield compressor.finish()
+
+                response.streaming_content = brotli_wrapper()
+            else:
+                response.streaming_content = brotli_sequence(response.streaming_content, quality)
+            del response.headers['Content-Length']
+        else:
+            compressed_content = brotli.compress(response.content, quality=quality)
+            if len(compressed_content) >= len(response.content):
+                return response
+            response.content = compressed_content
+            response.headers['Content-Length'] = str(len(response.content))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'br'
+        return response
@@ -0,0 +1,79 @@
+"""
+Conexões com o banco: pool nativo do psycopg ou conexões persistentes.
+
+Com DB_POOL=true em PostgreSQL, e o psycopg 3 com psycopg_pool instalados
+(`psycopg[pool]`), cada worker mantém um pool de DB_POOL_MIN_SIZE a
+DB_POOL_MAX_SIZE conexões. Cada conexão é testada antes de ser entregue
+(pre-ping), e quem espera mais que DB_POOL_TIMEOUT segundos recebe erro em vez
+de abrir mais conexões. Sem pool, as conexões ficam abertas por CONN_MAX_AGE
+segundos e são testadas no início de cada requisição (CONN_HEALTH_CHECKS).
+
+`pool_stats` expõe os contadores do pool (espera, esgotamento, conexões
+perdidas) para as métricas e o health check.
+"""
+import warnings
+
+from django.db import connections
+
+
+POSTGRESQL_ENGINES = ('django.db.backends.postgresql', 'django.db.backends.postgresql_psycopg2')
+
+
+def pool_supported():
+    try:
+        import psycopg  # noqa: F401
+        import psycopg_pool  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def check_connection(connection):
+    """Pre-ping do pool: descarta a conexão se ela não responder."""
+    from psycopg_pool import ConnectionPool
+    ConnectionPool.check_connection(connection)
+
+
+def database_config(database, pool=False, conn_max_age=600, min_size=2, max_size=10, timeout=10.0,
+                    max_idle=600.0, max_lifetime=3600.0):
+    """
+    Completa o dicionário de DATABASES['default'] com o modo de conexão:
+    pool nativo quando pedido e disponível, conexões persistentes com
+    health check caso contrário.
+    """
+    database = dict(database)
+    options = dict(database.get('OPTIONS') or {})
+    postgresql = database.get('ENGINE') in POSTGRESQL_ENGINES
+
+    if pool and postgresql and not pool_supported():
+        warnings.warn('DB_POOL ignorado: instale psycopg[pool] (psycopg 3). Usando conexões persistentes.')
+        pool = False
+
+    if pool and postgresql:
+        options['pool'] = {
+            'min_size': min_size,
+            'max_size': max_size,
+            'timeout': timeout,
+            'max_idle': max_idle,
+            'max_lifetime': max_lifetime,
+            'check': check_connection,
+        }
+        # O pool já reaproveita e testa as conexões
+        database['CONN_MAX_AGE'] = 0
+        database['CONN_HEALTH_CHECKS'] = False
+    else:
+        options.pop('pool', None)
+        database['CONN_MAX_AGE'] = conn_max_age
+        database['CONN_HEALTH_CHECKS'] = conn_max_age != 0
+
+    database['OPTIONS'] = options
+    return database
+
+
+def pool_stats(alias='default'):
+    """Contadores do pool do processo atual ({} sem pool)."""
+    connection = connections[alias]
+    if connection.vendor != 'postgresql' or not connection.settings_dict['OPTIONS'].get('pool'):
+        return {}
+    pool = connection.pool
+    return pool.get_stats() if pool is not None else {}
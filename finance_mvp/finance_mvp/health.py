@@ -0,0 +1,64 @@
+"""
+Health check do banco, usado pela rota `health/` e pelo `main.py`.
+
+A consulta passa pela conexão do Django, então usa o pool quando ele está
+ligado (e mede também a espera por uma conexão livre). A rota é pública, mas
+só staff recebe o erro do banco, a latência e os contadores do pool; o erro vai
+também para o log.
+"""
+import logging
+import time
+
+from django.db import connections
+from rest_framework import permissions
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
+
+from .db import pool_stats
+
+
+logger = logging.getLogger(__name__)
+
+
+def check_database(alias='default'):
+    """Executa SELECT 1 e devolve o resultado com a latência e os contadores do pool."""
+    started = time.perf_counter()
+    try:
+        with connections[alias].cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+    except Exception as exc:
+        logger.error('Health check do banco %s falhou: %s', alias, exc)
+        result = {'status': 'erro', 'error': str(exc)}
+    else:
+        result = {'status': 'ok'}
+    result['latency_ms'] = round((time.perf_counter() - started) * 1000, 2)
+    try:
+        result['pool'] = pool_stats(alias)
+    except Exception as exc:
+        result['pool'] = {'error': str(exc)}
+    return result
+
+
+class HealthView(APIView):
+    """200 com o banco respondendo, 503 caso contrário (detalhes só para staff)."""
+    authentication_classes = [*api_settings.DEFAULT_AUTHENTICATION_CLASSES, SessionAuthentication]
+    permission_classes = [permissions.AllowAny]
+
+    def perform_authentication(self, request):
+        # Autenticação só ao decidir os detalhes: um token inválido não derruba o health check
+        pass
+
+    def get(self, request, *args, **kwargs):
+        result = check_database()
+        status = 200 if result['status'] == 'ok' else 503
+        try:
+            staff = request.user.is_staff
+        except AuthenticationFailed:
+            staff = False
+        if not staff:
+            result = {'status': result['status']}
+        return Response(result, status=status)
@@ -0,0 +1,347 @@
+"""
+Métricas de requisições e de SQL por rota, no formato de exposição do Prometheus.
+
+`MetricsMiddleware` mede cada requisição (latência, número de consultas e tempo
+gasto no banco) e acumula os valores em memória, por nome de rota resolvida
+(`monthly-flow`, `category-expenses`, ...). Cada processo grava seus contadores
+em METRICS_DIR/<pid>.json no máximo a cada METRICS_FLUSH_INTERVAL segundos;
+a view `metrics` soma os arquivos de todos os workers. O middleware funciona em
+WSGI e em ASGI (rotas assíncronas de core/async_views.py). Junto vão os
+contadores do pool de conexões do processo (finance_mvp/db.py), em
+METRICS_DIR/pool/<pid>.json; os arquivos de workers que já terminaram são
+apagados ao coletar, para que as conexões deles não entrem nos totais.
+"""
+import atexit
+import bisect
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+from rest_framework import permissions, renderers
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
+
+from .db import pool_stats
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+
+UNRESOLVED = '<unresolved>'
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Contadores do psycopg_pool (get_stats) -> (métrica, tipo, ajuda, escala)
+POOL_METRICS = {
+    'pool_size': ('db_pool_connections', 'gauge', 'Conexões abertas no pool.', 1),
+    'pool_available': ('db_pool_connections_available', 'gauge', 'Conexões livres no pool.', 1),
+    'requests_waiting': ('db_pool_requests_waiting', 'gauge', 'Pedidos esperando uma conexão livre.', 1),
+    'requests_num': ('db_pool_requests_total', 'counter', 'Pedidos de conexão ao pool.', 1),
+    'requests_queued': ('db_pool_requests_queued_total', 'counter', 'Pedidos que precisaram esperar.', 1),
+    'requests_wait_ms': ('db_pool_wait_seconds_total', 'counter', 'Tempo total de espera por conexão.', 0.001),
+    'requests_errors': ('db_pool_timeouts_total', 'counter', 'Pedidos que esgotaram o tempo de espera (pool cheio).', 1),
+    'connections_lost': ('db_pool_connections_lost_total', 'counter', 'Conexões descartadas pelo health check.', 1),
+    'connections_errors': ('db_pool_connection_errors_total', 'counter', 'Falhas ao abrir conexões.', 1),
+}
+
+
+def empty_series():
+    return {
+        'count': 0,
+        'duration': 0.0,
+        'latency_buckets': [0] * (len(LATENCY_BUCKETS) + 1),
+        'queries': 0,
+        'query_buckets': [0] * (len(QUERY_BUCKETS) + 1),
+        'sql_time': 0.0,
+        'statuses': {},
+    }
+
+
+def merge_series(target, source):
+    target['count'] += source['count']
+    target['duration'] += source['duration']
+    target['queries'] += source['queries']
+    target['sql_time'] += source['sql_time']
+    for key in ('latency_buckets', 'query_buckets'):
+        target[key] = [a + b for a, b in zip(target[key], source[key])]
+    for status, count in source['statuses'].items():
+        target['statuses'][status] = target['statuses'].get(status, 0) + count
+
+
+class Registry:
+    """Contadores do processo atual, gravados periodicamente em disco."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.series = {}
+        self.pid = None
+        self.last_flush = 0.0
+
+    def reset(self):
+        with self.lock:
+            self.series = {}
+            self.pid = None
+            self.last_flush = 0.0
+
+    @property
+    def directory(self):
+        return settings.METRICS_DIR
+
+    def path(self, pid):
+        return os.path.join(self.directory, f'{pid}.json')
+
+    def pool_path(self, pid):
+        return os.path.join(self.directory, 'pool', f'{pid}.json')
+
+    def ensure_process(self):
+        # Após um fork (workers do gunicorn) cada processo começa do arquivo do
+        # seu pid, se existir, para que os contadores nunca diminuam
+        pid = os.getpid()
+        if self.pid == pid:
+            return
+        self.pid = pid
+        self.series = {}
+        try:
+            with open(self.path(pid), encoding='utf-8') as metrics_file:
+                self.series = json.load(metrics_file)
+        except (OSError, ValueError):
+            pass
+
+    def observe(self, view, status, duration, queries, sql_time):
+        with self.lock:
+            self.ensure_process()
+            series = self.series.get(view)
+            if series is None:
+                series = self.series[view] = empty_series()
+            series['count'] += 1
+            series['duration'] += duration
+            series['latency_buckets'][bisect.bisect_left(LATENCY_BUCKETS, duration)] += 1
+            series['queries'] += queries
+            series['query_buckets'][bisect.bisect_left(QUERY_BUCKETS, queries)] += 1
+            series['sql_time'] += sql_time
+            status = str(status)
+            series['statuses'][status] = series['statuses'].get(status, 0) + 1
+
+            if time.monotonic() - self.last_flush >= settings.METRICS_FLUSH_INTERVAL:
+                self._flush()
+
+    def flush(self):
+        with self.lock:
+            if self.pid is not None:
+                self._flush()
+
+    def _flush(self):
+        self.last_flush = time.monotonic()
+        write_json(self.path(self.pid), self.series)
+        stats = pool_stats()
+        if stats:
+            write_json(self.pool_path(self.pid), stats)
+
+    def collect(self):
+        """Soma os contadores gravados por todos os processos."""
+        self.flush()
+        totals = {}
+        for path in glob.glob(os.path.join(self.directory, '*.json')):
+            try:
+                with open(path, encoding='utf-8') as metrics_file:
+                    process_series = json.load(metrics_file)
+            except (OSError, ValueError):
+                continue
+            for view, series in process_series.items():
+                merge_series(totals.setdefault(view, empty_series()), series)
+        return totals
+
+    def collect_pool(self):
+        """Soma os contadores do pool de conexões dos processos vivos."""
+        self.flush()
+        totals = {}
+        for path in glob.glob(os.path.join(self.directory, 'pool', '*.json')):
+            pid = os.path.basename(path)[:-len('.json')]
+            if pid.isdigit() and not process_alive(int(pid)):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    # Removido por outro worker
+                    pass
+                continue
+            try:
+                with open(path, encoding='utf-8') as pool_file:
+                    stats = json.load(pool_file)
+            except (OSError, ValueError):
+                continue
+            for key, value in stats.items():
+                if key in POOL_METRICS:
+                    totals[key] = totals.get(key, 0) + value
+        return totals
+
+
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Existe, mas é de outro usuário
+        return True
+    return True
+
+
+def write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w', encoding='utf-8') as metrics_file:
+        json.dump(data, metrics_file)
+    os.replace(temporary, path)
+
+
+registry = Registry()
+atexit.register(registry.flush)
+
+
+class QueryTimer:
+    """execute_wrapper que conta as consultas e soma o tempo gasto nelas."""
+
+    def __init__(self):
+        self.count = 0
+        self.elapsed = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.elapsed += time.perf_counter() - started
+            self.count += 1
+
+
+def add_execute_wrapper(wrapper):
+    for connection in connections.all():
+        connection.execute_wrappers.append(wrapper)
+
+
+def remove_execute_wrapper(wrapper):
+    for connection in connections.all():
+        if wrapper in connection.execute_wrappers:
+            connection.execute_wrappers.remove(wrapper)
+
+
+class MetricsMiddleware:
+    """Registra latência, consultas SQL e tempo de SQL por nome de rota."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timer = QueryTimer()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        self.observe(request, response, time.perf_counter() - started, timer)
+        return response
+
+    async def __acall__(self, request):
+        timer = QueryTimer()
+        started = time.perf_counter()
+        # As conexões são por thread e o ORM roda na thread do sync_to_async
+        # (thread_sensitive, a mesma em toda a requisição): o timer vai nelas
+        await sync_to_async(add_execute_wrapper)(timer)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(remove_execute_wrapper)(timer)
+        self.observe(request, response, time.perf_counter() - started, timer)
+        return response
+
+    def observe(self, request, response, duration, timer):
+        match = getattr(request, 'resolver_match', None)
+        view = (match.url_name if match else None) or UNRESOLVED
+        registry.observe(view, response.status_code, duration, timer.count, timer.elapsed)
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_metrics(totals, pool=None):
+    lines = []
+
+    def histogram(name, help_text, buckets, key, sum_key):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} histogram')
+        for view, series in sorted(totals.items()):
+            label = f'view="{_escape(view)}"'
+            cumulative = 0
+            for bound, count in zip(buckets + ('+Inf',), series[key]):
+                cumulative += count
+                le = bound if bound == '+Inf' else _number(float(bound))
+                lines.append(f'{name}_bucket{{{label},le="{le}"}} {cumulative}')
+            lines.append(f'{name}_sum{{{label}}} {_number(series[sum_key])}')
+            lines.append(f'{name}_count{{{label}}} {series["count"]}')
+
+    histogram(
+        'http_request_duration_seconds', 'Latência das requisições por rota.',
+        LATENCY_BUCKETS, 'latency_buckets', 'duration',
+    )
+    histogram(
+        'http_request_db_queries', 'Consultas SQL por requisição, por rota.',
+        QUERY_BUCKETS, 'query_buckets', 'queries',
+    )
+
+    lines.append('# HELP http_responses_total Respostas por rota e status HTTP.')
+    lines.append('# TYPE http_responses_total counter')
+    for view, series in sorted(totals.items()):
+        for status, count in sorted(series['statuses'].items()):
+            lines.append(f'http_responses_total{{view="{_escape(view)}",status="{status}"}} {count}')
+
+    lines.append('# HELP db_query_duration_seconds_total Tempo total gasto em SQL por rota.')
+    lines.append('# TYPE db_query_duration_seconds_total counter')
+    for view, series in sorted(totals.items()):
+        lines.append(f'db_query_duration_seconds_total{{view="{_escape(view)}"}} {_number(series["sql_time"])}')
+
+    for key, (name, kind, help_text, scale) in POOL_METRICS.items():
+        if pool and key in pool:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            lines.append(f'{name} {_number(pool[key] * scale)}')
+
+    return '\n'.join(lines) + '\n'
+
+
+class PrometheusRenderer(renderers.BaseRenderer):
+    media_type = 'text/plain'
+    format = 'prometheus'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Só as respostas de erro passam por aqui; as métricas já saem prontas
+        return json.dumps(data, ensure_ascii=False).encode(self.charset)
+
+
+class MetricsView(APIView):
+    """Métricas de todos os workers no formato do Prometheus (somente staff)."""
+    authentication_classes = [*api_settings.DEFAULT_AUTHENTICATION_CLASSES, SessionAuthentication]
+    permission_classes = [permissions.IsAdminUser]
+    renderer_classes = [PrometheusRenderer, renderers.JSONRenderer]
+
+    def get(self, request, *args, **kwargs):
+        return HttpResponse(render_metrics(registry.collect(), registry.collect_pool()), content_type=CONTENT_TYPE)
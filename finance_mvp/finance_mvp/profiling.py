@@ -0,0 +1,271 @@
+"""
+Modo de profiling sob demanda, somente para staff.
+
+Uma requisição para uma rota do app `core` com o cabeçalho `X-Profile: 1` (ou
+o parâmetro `?_profile=1`) feita por um usuário staff é executada sob o
+cProfile, com todas as consultas SQL registradas com seus tempos e o EXPLAIN
+(ANALYZE no PostgreSQL) das consultas mais lentas. O resultado vai para um
+buffer circular em disco (PROFILING_DIR, no máximo PROFILING_MAX_ENTRIES
+arquivos) e o id volta no cabeçalho `X-Profile-Id`; os perfis são lidos em
+`profiles/` e `profiles/<id>/`.
+
+Em ASGI a requisição perfilada roda inteira em uma thread do sync_to_async:
+as views síncronas e as consultas do ORM (também as das views assíncronas)
+voltam para essa thread e entram no perfil. O código das views assíncronas
+roda no event loop e fica fora do cProfile.
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import time
+import uuid
+from contextlib import ExitStack
+
+from asgiref.sync import async_to_sync, iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.http import Http404
+from django.urls import Resolver404, resolve
+from django.utils import timezone
+from rest_framework import permissions
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
+
+
+HEADER = 'X-Profile'
+QUERY_PARAM = '_profile'
+PROFILED_MODULE_PREFIX = 'core.'
+PROFILE_ID = re.compile(r'^\d+-[0-9a-f]{8}$')
+
+
+def profiling_requested(request):
+    return request.headers.get(HEADER) == '1' or request.GET.get(QUERY_PARAM) == '1'
+
+
+def is_staff_request(request):
+    """Staff pela sessão do admin ou pelas autenticações do DRF (JWT)."""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user.is_staff
+    for authentication_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        try:
+            result = authentication_class().authenticate(request)
+        except APIException:
+            return False
+        if result is not None:
+            return result[0].is_staff
+    return False
+
+
+def core_route(request):
+    try:
+        match = resolve(request.path_info)
+    except Resolver404:
+        return None
+    if not match.func.__module__.startswith(PROFILED_MODULE_PREFIX):
+        return None
+    return match
+
+
+class QueryRecorder:
+    """execute_wrapper que guarda cada consulta com a duração."""
+
+    def __init__(self, alias):
+        self.alias = alias
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'alias': self.alias,
+                'sql': sql,
+                'params': params,
+                'many': many,
+                'duration_ms': (time.perf_counter() - started) * 1000,
+            })
+
+
+def explain(query):
+    """Plano de uma consulta SELECT já executada (EXPLAIN ANALYZE no PostgreSQL)."""
+    connection = connections[query['alias']]
+    if connection.vendor == 'postgresql':
+        prefix = connection.ops.explain_query_prefix(analyze=True, buffers=True)
+    else:
+        prefix = connection.ops.explain_query_prefix()
+    with connection.cursor() as cursor:
+        cursor.execute(f"{prefix} {query['sql']}", query['params'])
+        return '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+
+
+def profile_summary(profiler, limit):
+    stream = io.StringIO()
+    pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(limit)
+    return stream.getvalue()
+
+
+def profile_path(profile_id):
+    return os.path.join(settings.PROFILING_DIR, f'{profile_id}.json')
+
+
+def stored_profile_ids():
+    try:
+        names = os.listdir(settings.PROFILING_DIR)
+    except FileNotFoundError:
+        return []
+    # Os ids começam pelo timestamp em ns, então a ordem alfabética é a cronológica
+    return sorted(name[:-5] for name in names if name.endswith('.json') and PROFILE_ID.match(name[:-5]))
+
+
+def store(profile):
+    """Grava o perfil e remove os mais antigos além de PROFILING_MAX_ENTRIES."""
+    os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+    path = profile_path(profile['id'])
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w', encoding='utf-8') as profile_file:
+        json.dump(profile, profile_file, ensure_ascii=False, default=str)
+    os.replace(temporary, path)
+
+    ids = stored_profile_ids()
+    for old_id in ids[:max(len(ids) - settings.PROFILING_MAX_ENTRIES, 0)]:
+        try:
+            os.remove(profile_path(old_id))
+        except FileNotFoundError:
+            # Removido por outro worker
+            pass
+
+
+def load(profile_id):
+    if not PROFILE_ID.match(profile_id):
+        return None
+    try:
+        with open(profile_path(profile_id), encoding='utf-8') as profile_file:
+            return json.load(profile_file)
+    except (OSError, ValueError):
+        return None
+
+
+class ProfilingMiddleware:
+    """Executa sob profiling as requisições staff que pedirem (ver docstring do módulo)."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not profiling_requested(request):
+            return self.get_response(request)
+        match = core_route(request)
+        if match is None or not is_staff_request(request):
+            return self.get_response(request)
+        return self.profile(request, match, self.get_response)
+
+    async def __acall__(self, request):
+        if not profiling_requested(request):
+            return await self.get_response(request)
+        match = core_route(request)
+        if match is None or not await sync_to_async(is_staff_request)(request):
+            return await self.get_response(request)
+        return await sync_to_async(self.profile)(request, match, async_to_sync(self.get_response))
+
+    def profile(self, request, match, get_response):
+        recorders = [QueryRecorder(connection.alias) for connection in connections.all()]
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection, recorder in zip(connections.all(), recorders):
+                stack.enter_context(connection.execute_wrapper(recorder))
+            profiler.enable()
+            try:
+                response = get_response(request)
+            finally:
+                profiler.disable()
+        duration_ms = (time.perf_counter() - started) * 1000
+
+        queries = [query for recorder in recorders for query in recorder.queries]
+        profile = self.build(request, match, response, duration_ms, queries, profiler)
+        store(profile)
+        response[f'{HEADER}-Id'] = profile['id']
+        return response
+
+    def build(self, request, match, response, duration_ms, queries, profiler):
+        slowest = sorted(
+            (query for query in queries if not query['many'] and query['sql'].lstrip().upper().startswith('SELECT')),
+            key=lambda query: query['duration_ms'],
+            reverse=True,
+        )[:settings.PROFILING_EXPLAIN_COUNT]
+        explains = []
+        for query in slowest:
+            try:
+                plan = explain(query)
+            except Exception as exc:
+                # A transação da requisição pode ter sido abortada, por exemplo
+                plan = f'EXPLAIN falhou: {exc}'
+            explains.append({'sql': query['sql'], 'duration_ms': query['duration_ms'], 'plan': plan})
+
+        return {
+            'id': f'{time.time_ns()}-{uuid.uuid4().hex[:8]}',
+            'created_at': timezone.now().isoformat(),
+            'method': request.method,
+            'path': request.get_full_path(),
+            'view': match.url_name,
+            'status': response.status_code,
+            'duration_ms': duration_ms,
+            'sql_count': len(queries),
+            'sql_time_ms': sum(query['duration_ms'] for query in queries),
+            'sql': [
+                {
+                    'alias': query['alias'],
+                    'sql': query['sql'],
+                    'params': repr(query['params']),
+                    'duration_ms': query['duration_ms'],
+                }
+                for query in queries[:settings.PROFILING_MAX_QUERIES]
+            ],
+            'explain': explains,
+            'profile': profile_summary(profiler, settings.PROFILING_STATS_LIMIT),
+        }
+
+
+class StaffOnlyMixin:
+    authentication_classes = [*api_settings.DEFAULT_AUTHENTICATION_CLASSES, SessionAuthentication]
+    permission_classes = [permissions.IsAdminUser]
+
+
+class ProfileListView(StaffOnlyMixin, APIView):
+    """Perfis guardados, do mais recente para o mais antigo (somente staff)."""
+
+    def get(self, request, *args, **kwargs):
+        summaries = []
+        for profile_id in reversed(stored_profile_ids()):
+            profile = load(profile_id)
+            if profile is None:
+                continue
+            summaries.append({
+                key: profile[key]
+                for key in ('id', 'created_at', 'method', 'path', 'view', 'status', 'duration_ms', 'sql_count', 'sql_time_ms')
+            })
+        return Response(summaries)
+
+
+class ProfileDetailView(StaffOnlyMixin, APIView):
+    """Um perfil completo (somente staff)."""
+
+    def get(self, request, profile_id, *args, **kwargs):
+        profile = load(profile_id)
+        if profile is None:
+            raise Http404
+        return Response(profile)
@@ -14,7 +14,11 @@ from pathlib import Path
 from datetime import timedelta
 from decouple import config
 import dj_database_url
+import importlib.util
 import os
+import tempfile
+
+from finance_mvp.db import database_config
 
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -37,8 +41,16 @@ ALLOWED_HOSTS = config('ALLOWED_HOSTS', default='127.0.0.1, localhost').split(',
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=2),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
+    'TOKEN_REFRESH_SERIALIZER': 'core.authentication.TokenRefreshSerializer',
+    'TOKEN_BLACKLIST_SERIALIZER': 'core.authentication.TokenBlacklistSerializer',
 }
 
+# Tempo (s) que o status dos usuários (ativo, staff) e o resultado das consultas
+# à blacklist ficam no cache (core/authentication.py). Com REDIS_URL as
+# alterações valem na hora em todos os workers; sem ele, cada processo tem o
+# seu cache e os demais workers as veem em até AUTH_CACHE_TTL segundos
+AUTH_CACHE_TTL = config('AUTH_CACHE_TTL', default=30, cast=int)
+
 CORS_ALLOW_HEADERS = [
     'accept',
     'accept-encoding',
@@ -69,24 +81,33 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'finance_mvp.metrics.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware', 
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'finance_mvp.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'finance_mvp.profiling.ProfilingMiddleware',
 ]
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'core.authentication.StatelessJWTAuthentication',
     ),
 
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE':20,
+    # JSON com orjson (core/renderers.py); MessagePack se o pacote msgpack estiver instalado
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.FastJSONRenderer',
+        *(['core.renderers.MessagePackRenderer'] if importlib.util.find_spec('msgpack') else []),
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
 ROOT_URLCONF = 'finance_mvp.urls'
@@ -127,13 +148,101 @@ default_db_config  = {
 DATABASES = {
     'default': dj_database_url.config(
         default= config('DATABASE_URL', default=None),
-        conn_max_age=600
+        conn_max_age=config('CONN_MAX_AGE', default=600, cast=int)
     )
 }
 
 if not DATABASES['default']:
     DATABASES = default_db_config
 
+# Pool de conexões por worker (ver finance_mvp/db.py e o README). No
+# PostgreSQL, com DB_POOL=true, cada processo abre até DB_POOL_MAX_SIZE
+# conexões: o total é esse valor vezes o número de workers.
+DATABASES['default'] = database_config(
+    DATABASES['default'],
+    pool=config('DB_POOL', default=False, cast=bool),
+    conn_max_age=config('CONN_MAX_AGE', default=600, cast=int),
+    min_size=config('DB_POOL_MIN_SIZE', default=2, cast=int),
+    max_size=config('DB_POOL_MAX_SIZE', default=10, cast=int),
+    timeout=config('DB_POOL_TIMEOUT', default=10.0, cast=float),
+    max_idle=config('DB_POOL_MAX_IDLE', default=600.0, cast=float),
+    max_lifetime=config('DB_POOL_MAX_LIFETIME', default=3600.0, cast=float),
+)
+
+
+# Cache
+# Em produção use um backend compartilhado entre os workers (REDIS_URL);
+# sem ele cada processo usa seu próprio cache em memória.
+
+REDIS_URL = config('REDIS_URL', default=None)
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Tempo máximo (s) que uma resposta de relatório fica no cache. As respostas
+# já são invalidadas a cada escrita do usuário, então pode ser longo.
+REPORT_CACHE_TIMEOUT = config('REPORT_CACHE_TIMEOUT', default=3600, cast=int)
+
+
+# Sync incremental (core/sync.py, rota sync/)
+# As exclusões ficam guardadas por SYNC_TOMBSTONE_DAYS dias (comando
+# prune_tombstones); clientes com cursor mais antigo recebem tudo de novo.
+
+SYNC_PAGE_SIZE = config('SYNC_PAGE_SIZE', default=1000, cast=int)
+SYNC_OVERLAP = config('SYNC_OVERLAP', default=30, cast=int)
+SYNC_TOMBSTONE_DAYS = config('SYNC_TOMBSTONE_DAYS', default=90, cast=int)
+
+
+# Compressão das respostas (finance_mvp/compression.py)
+# gzip, ou brotli quando o pacote brotli está instalado e o cliente aceita.
+# Respostas menores que COMPRESSION_MIN_SIZE bytes saem sem compressão.
+
+COMPRESSION_MIN_SIZE = config('COMPRESSION_MIN_SIZE', default=1024, cast=int)
+COMPRESSION_BROTLI_QUALITY = config('COMPRESSION_BROTLI_QUALITY', default=5, cast=int)
+COMPRESSION_STREAM_BUFFER = config('COMPRESSION_STREAM_BUFFER', default=65536, cast=int)
+
+
+# Métricas (finance_mvp/metrics.py)
+# Cada worker grava seus contadores em METRICS_DIR, que deve ser o mesmo
+# diretório local para todos os workers da máquina e começar vazio a cada deploy.
+
+METRICS_DIR = config('METRICS_DIR', default=os.path.join(tempfile.gettempdir(), 'finance_mvp_metrics'))
+METRICS_FLUSH_INTERVAL = config('METRICS_FLUSH_INTERVAL', default=1.0, cast=float)
+
+
+# Fila de jobs (core/jobs.py, comando run_workers)
+# JOBS_DIR guarda os arquivos enviados para importação em background e precisa
+# ser visível para a web e para os workers (mesma máquina ou volume compartilhado).
+
+JOBS_DIR = config('JOBS_DIR', default=os.path.join(tempfile.gettempdir(), 'finance_mvp_jobs'))
+JOBS_WORKERS = config('JOBS_WORKERS', default=2, cast=int)
+JOBS_POLL_INTERVAL = config('JOBS_POLL_INTERVAL', default=1.0, cast=float)
+JOBS_DEFAULT_TIMEOUT = config('JOBS_DEFAULT_TIMEOUT', default=600, cast=int)
+JOBS_MAX_ATTEMPTS = config('JOBS_MAX_ATTEMPTS', default=3, cast=int)
+JOBS_RETRY_DELAY = config('JOBS_RETRY_DELAY', default=30, cast=int)
+JOBS_LEASE_GRACE = config('JOBS_LEASE_GRACE', default=60, cast=int)
+
+
+# Profiling sob demanda (finance_mvp/profiling.py)
+# Guarda no máximo PROFILING_MAX_ENTRIES perfis; os mais antigos são apagados.
+
+PROFILING_DIR = config('PROFILING_DIR', default=os.path.join(tempfile.gettempdir(), 'finance_mvp_profiles'))
+PROFILING_MAX_ENTRIES = config('PROFILING_MAX_ENTRIES', default=50, cast=int)
+PROFILING_MAX_QUERIES = config('PROFILING_MAX_QUERIES', default=1000, cast=int)
+PROFILING_EXPLAIN_COUNT = config('PROFILING_EXPLAIN_COUNT', default=3, cast=int)
+PROFILING_STATS_LIMIT = config('PROFILING_STATS_LIMIT', default=40, cast=int)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -17,7 +17,15 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from .health import HealthView
+from .metrics import MetricsView
+from .profiling import ProfileDetailView, ProfileListView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('health/', HealthView.as_view(), name='health'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
+    path('profiles/', ProfileListView.as_view(), name='profile-list'),
+    path('profiles/<str:profile_id>/', ProfileDetailView.as_view(), name='profile-detail'),
     path('api/', include('core.urls')),
 ]
@@ -1,34 +1,27 @@
-import psycopg2
-from dotenv import load_dotenv
+"""
+Health check do banco para o deploy: `python main.py`.
+
+Usa a mesma configuração do Django (DATABASE_URL / DB_*, DB_POOL), então a
+conexão passa pelo pool quando ele está ligado. Imprime o resultado em JSON e
+sai com código 0 se o banco respondeu, 1 caso contrário.
+"""
+import json
 import os
+import sys
 
-load_dotenv()
+import django
 
-USER= os.getenv("user")
-PASSWORD = os.getenv("password")
-HOST= os.getenv("host")
-PORT = os.getenv("port")
-DBNAME = os.getenv("dbname")
 
-try:
-    connection= psycopg2.connect(
-        user = USER,
-        password= PASSWORD,
-        host= HOST,
-        port = PORT,
-        dbname= DBNAME
-    )
-    print("Connection Successfull")
+def main():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'finance_mvp.settings')
+    django.setup()
 
-    cursor = connection.cursor()
+    from finance_mvp.health import check_database
 
-    cursor.execute("SELECT NOW();")
-    result = cursor.fetchone()
-    print("Current Time: ", result)
+    result = check_database()
+    print(json.dumps(result, ensure_ascii=False, indent=2, default=str))
+    return 0 if result['status'] == 'ok' else 1
 
-    cursor.close()
-    connection.close()
-    print("Connection Closed")
 
-except Exception as e:
-    print(f"Failed to connect: {e}")
+if __name__ == '__main__':
+    sys.exit(main())
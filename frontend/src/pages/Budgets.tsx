@@ -19,6 +19,7 @@ interface Budget {
   id: number;
   category_name: string;
   limit: number;
+  spent: number;
   start_date: string;
   end_date: string;
 }
@@ -70,9 +71,13 @@ export default function Budgets() {
                   </Grid>
                   <Grid sx={{xs:12, md:8}}>
                     <Box sx={{width:'100%'}}> 
-                      <LinearProgress variant='determinate' value={0}/>
+                      <LinearProgress
+                        variant='determinate'
+                        color={Number(budget.spent) > Number(budget.limit) ? 'error' : 'primary'}
+                        value={Math.min(100, Number(budget.spent) / Number(budget.limit) * 100)}
+                      />
                       <Typography variant='body2' color='text.secondary' sx={{mt:1}}>
-                        Gasto: R$ 0.00 de R$ {Number(budget.limit).toFixed(2)}
+                        Gasto: R$ {Number(budget.spent).toFixed(2)} de R$ {Number(budget.limit).toFixed(2)}
                       </Typography>
                     </Box>
                   </Grid>
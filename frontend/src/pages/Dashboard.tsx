@@ -53,16 +53,11 @@ export default function DashBoard() {
             try{
                  const params = { year, month };
 
-                // Chamadas para a API com os filtros
-                const monthlyFlowRes = await api.get('/reports/monthly-flow/', { params });
-                setMonthlyFlow(monthlyFlowRes.data);
-
-                // Assumindo que estas são as URLs corretas para os outros gráficos
-                const categoryExpensesRes = await api.get('/reports/category-expenses/', { params });
-                setCategoryExpenses(categoryExpensesRes.data);
-
-                const emotionalExpensesRes = await api.get('/reports/emotional-expenses/', { params });
-                setEmotionalExpenses(emotionalExpensesRes.data);
+                // Uma única chamada traz todos os dados do dashboard
+                const { data } = await api.get('/reports/dashboard/', { params });
+                setMonthlyFlow(data.monthly_flow);
+                setCategoryExpenses(data.category_expenses);
+                setEmotionalExpenses(data.emotional_expenses);
 
             } catch (error) {
                 console.error("Erro ao buscar dados do dashboard:", error);